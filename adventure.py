@@ -1,35 +1,36 @@
 from __future__ import annotations
-import json
-from typing import Optional
-
-import re   # for matching words in strings
+from typing import Any, Callable, Mapping, Optional
 
+from keyword_matcher import KeywordMatcher, word_pattern
+from command_index import CommandIndex
+from conditions import ConditionWatcher, MOVE_LIMIT
 from game_entities import Location, Item
+from game_state import GameState, ONGOING
+from world import World, SessionLocations, load_game_data
 from combat import Combat
+from game_io import GameIO, TerminalIO, run_sync
 from inventory import Inventory
 from proj1_event_logger import Event, EventList
-from event_handlers import (
-    handle_combat, handle_inventory_event, handle_npc_interaction,
-    handle_dialogue, handle_item_pickup, handle_location_event, handle_menu_order
-)
-from menu_handlers import handle_menu_command
+from event_store import StreamingEventList
+from event_handlers import handle_item_pickup, handle_trigger
+from menu_handlers import handle_menu_command, split_menu_choice, FREE_COMMANDS
+from journal import Journal
+from save_game import AutoSaver
+from triggers import TriggerTable
+from instrumentation import timed
 from game_updates import (
     display_time, display_location, update_game_state, check_win,
     print_objective
 )
 
-MENU = ["look", "inventory", "use", "score", "undo", "log", "quit"]
-DIALOGUE_CHECKS = ["$20", "powder", "review", "USB"]
-EVENT_HANDLERS = {
-    "pass out": handle_combat,
-    "overhear": handle_npc_interaction,
-    "attack the lions": handle_combat,
-    "gifts": handle_inventory_event,
-    "review": handle_inventory_event,
-    "menu": handle_menu_order,
-    "fall asleep": handle_inventory_event
-}
-LOCATION_CHECKS = {2, 8}
+UNDO_LIMIT = 100  # the most turns that can be undone in a game whose event log is streamed to a file
+MENU = ["look", "inventory", "use", "score", "undo", "redo", "log", "stats", "quit"]
+MENU_INDEX = CommandIndex(MENU)
+# Menu commands that must be typed in full, since a stray letter shouldn't end the game
+UNABBREVIATED = frozenset({"quit"})
+# What get_choice shows before and after the commands available at the current location
+MENU_HEADER = f"\n\nWhat to do? Choose from:  {MENU}\n\nAt this location, you can also:\n"
+ACTION_PROMPT = "\nEnter action: "
 
 
 class AdventureGame:
@@ -38,61 +39,122 @@ class AdventureGame:
     Instance Attributes:
         - _locations: a mapping of location IDs to location objects
         - _items: a list of all item objects
-        - player_state: a tuple representing the player's health, money, and score
+        - world: the world this game is played in, shared with every other game played in it
+        - state: everything about the game that changes from turn to turn, other than its money, event log and
+            commands
+        - player_state: a tuple representing the player's health, money, and score, read from state
         - game_state: a tuple representing the moves so far, current location ID,
-            whether the game is ongoing, and whether dialogue is ongoing
-        - puzzle_state: a tuple representing the state of the puzzles (book, orange, torch, shield)
+            whether the game is ongoing, and whether dialogue is ongoing, read from state
+        - puzzle_state: a tuple representing the state of the puzzles (book, orange, torch, shield), read from state
         - inventory: the player's inventory
         - event_log: a log of all events in the game
+        - event_log_file: the file the event log is streamed to, or None if it is only kept in memory
         - combat_system: the combat system used in the game
+        - io: where the game's output goes, and where its input and pauses come from
+        - journal: every change made to the game's state in each turn, so turns can be undone and redone
+        - keyword_matcher: matches item names in event results
+        - triggers: what happens when each command is carried out at each location, from the game data
+        - conditions: which of the world's conditions hold, kept up to date as the game's state changes
+        - autosave: saves the game after every turn, or None if it isn't saved
+        - on_turn: called with the game and the command at the end of every turn run plays, or None
 
     Representation Invariants:
         - all(location_id in self._locations for location_id in self._locations.keys())
         - all(item in self._items for item in self._items)
-        - self.game_state[1] in self._locations
-        - self.player_state[2] >= 0  # score
-        - self.player_state[1] >= 0  # money
-        - self.player_state[0] >= 0  # health
+        - self.state.location_id in self._locations
+        - self.state.score >= 0
+        - self.state.money >= 0
+        - self.state.health >= 0
     """
 
     # Private Instance Attributes (do NOT remove these two attributes):
     #   - _locations: a mapping from location id to Location object.
-    #                       This represents all the locations in the game.
+    #                       This represents all the locations in the game. Changes made during this game are
+    #                       kept here, and never in self.world.
     #   - _items: a list of Item objects, representing all items in the game.
 
-    _locations: dict[int, Location]
-    _items: dict[str, Item]
+    _locations: SessionLocations
+    _items: Mapping[str, Item]
+    world: World
 
-    player_state: tuple[int, int, int]  # (health, money, score)
-    game_state: tuple[int, int, bool, bool]  # (moves_so_far, current_location_id, ongoing, dialogue_ongoing)
-    puzzle_state: tuple[bool, bool, bool, bool]  # (book_correct, orange_correct, torch_correct, shield_correct)
+    state: GameState
 
     inventory: Inventory
     event_log: EventList
+    event_log_file: Optional[str]
     combat_system: Combat
-
-    def __init__(self, game_data_file: str, initial_location_id: int) -> None:
+    io: GameIO
+    journal: Journal
+    keyword_matcher: KeywordMatcher
+    triggers: TriggerTable
+    conditions: ConditionWatcher
+    autosave: Optional[AutoSaver]
+    on_turn: Optional[Callable[[AdventureGame, str], None]]
+
+    def __init__(self, game_data_file: str, initial_location_id: int, io: Optional[GameIO] = None,
+                 event_log_file: Optional[str] = None, save_file: Optional[str] = None) -> None:
         """
         Initialize a new text adventure game, based on the data in the given file, setting starting location of game
         at the given initial location ID.
         (note: you are allowed to modify the format of the file as you see fit)
+        If no io is given, the game is played in the terminal.
+        If an event log file is given, the event log is streamed to it, and only the last UNDO_LIMIT turns
+        can be undone, so that a long game uses a bounded amount of memory.
+        If a save file is given, the game is saved to it after every turn, and when the game is run, it carries
+        on from the game saved there, if there is one. The save is deleted once the game is won or lost, so that
+        the next game starts afresh, but kept when the player quits.
 
         Preconditions:
         - game_data_file is the filename of a valid game data JSON file
         - initial_location_id in self._locations
         """
-        self._locations, self._items = self._load_game_data(game_data_file)
-
-        self.player_state = (10, 0, 0)  # (health, money, score)
-        self.game_state = (0, initial_location_id, True, False)  # (moves_so_far, current_location_id, ongoing)
-        self.puzzle_state = (
-            False, False, False, False  # (book_correct, orange_correct, torch_correct, shield_correct)
+        self.io = io if io is not None else TerminalIO()
+        self.event_log_file = event_log_file
+        self.journal = Journal(None if event_log_file is None else UNDO_LIMIT)
+        self.autosave = None if save_file is None else AutoSaver(save_file)
+        self.on_turn = None
+
+        self.world = World.load(game_data_file)
+        self._locations, self._items = SessionLocations(self.world, self.journal), self.world.items
+        self.keyword_matcher = self.world.get_matcher(())
+        self.triggers = self.world.get_triggers()
+
+        self.state = GameState(initial_location_id)
+
+        self.conditions = ConditionWatcher(self.world.get_conditions(), self)
+        self.inventory, self.event_log, self.combat_system = (
+            Inventory(self.io, self.journal, self._item_changed), self._new_event_log(), Combat(self)
         )
-
-        self.inventory, self.event_log, self.combat_system = (Inventory(), EventList(), Combat(self))
+        self.conditions.refresh()
+
+    @property
+    def player_state(self) -> tuple[float, int, int]:
+        """The player's (health, money, score)."""
+        return self.state.health, self.state.money, self.state.score
+
+    @property
+    def game_state(self) -> tuple[int, int, bool, bool]:
+        """The game's (moves_so_far, current_location_id, ongoing, dialogue_ongoing)."""
+        return self.state.moves, self.state.location_id, self.state.ongoing, self.state.dialogue_ongoing
+
+    @property
+    def puzzle_state(self) -> tuple[bool, ...]:
+        """The game's (book_correct, orange_correct, torch_correct, shield_correct)."""
+        return self.state.puzzles()
+
+    def _item_changed(self, name: str, item: Item) -> None:
+        """Keep self.state.items in step with the inventory, where the given item has just been added or removed."""
+        self.state.items ^= 1 << item.item_id
+        self.conditions.item_changed(name)
+
+    def _new_event_log(self) -> EventList:
+        """Return a new, empty event log, streamed to self.event_log_file if there is one."""
+        if self.event_log_file is None:
+            return EventList(self.journal)
+        return StreamingEventList(self.event_log_file, self.journal)
 
     @staticmethod
-    def _load_game_data(filename: str) -> tuple[dict[int, Location], list[Item]]:
+    def _load_game_data(filename: str) -> tuple[dict[int, Location], dict[str, Item]]:
         """Load locations and items from a JSON file with the given filename and
         return a tuple consisting of (1) a dictionary of locations mapping each game location's ID to a Location object,
         and (2) a dictionary of all Item objects mapping item names to Item objects.
@@ -100,25 +162,7 @@ class AdventureGame:
         Preconditions:
         - filename is a valid JSON file containing game data
         """
-        with open(filename, 'r') as f:
-            data = json.load(f)  # This loads all the data from the JSON file
-
-        items = {}
-        for item in data['items']:
-            items[item['name']] = Item(
-                item['name'], item['description'], item['start_position'],
-                item['target_position'], item.get('target_points', 0)
-            )
-
-        locations = {}
-        for loc in data['locations']:
-            item_objects = [items[item_name] for item_name in loc['items']]
-            locations[loc['id']] = Location(
-                loc['id'], loc['name'], loc['brief_description'], loc['long_description'],
-                loc['available_commands'], item_objects
-            )
-
-        return locations, items
+        return load_game_data(filename)
 
     @staticmethod
     def _string_in_text(string: str, text: str) -> bool:
@@ -128,8 +172,22 @@ class AdventureGame:
         - string is a non-empty string
         - text is a non-empty string
         """
-        pattern = rf'(?<!\w){re.escape(string)}(?!\w)'
-        return bool(re.search(pattern, text, re.IGNORECASE))
+        return word_pattern(string).search(text) is not None
+
+    def restore_state(self, name: str, value: Any) -> None:
+        """Set the field of self.state with the given name to a value recorded in self.journal."""
+        old_value = getattr(self.state, name)
+        setattr(self.state, name, value)
+        self.conditions.state_changed(name, old_value, value)
+
+    def state_key(self) -> tuple:
+        """Return a hashable summary of everything about this game that can change what happens next: the
+        location, the player's state, the puzzles, the inventory and money, and the commands at every location.
+        Games with equal keys play out the same way from here, however many moves they took to get there.
+        """
+        state = self.state
+        return (state.location_id, state.flags & ~ONGOING, state.money, state.score, state.items, state.health,
+                self.inventory.get_money(), self._locations.fingerprint())
 
     def get_location(self, loc_id: Optional[int] = None) -> Location:
         """Return Location object associated with the provided location ID.
@@ -139,9 +197,10 @@ class AdventureGame:
         - loc_id is None or loc_id in self._locations
         """
         if loc_id is None:
-            return self._locations[self.game_state[1]]
+            return self._locations[self.state.location_id]
         return self._locations[loc_id]
 
+    @timed()
     def move(self, command: str) -> None:
         """Move player to the destination, if possible. Assumes valid command.
 
@@ -154,65 +213,127 @@ class AdventureGame:
             update_game_state(self, location_id=new_location_id)
             display_location(self)
         else:
-            print("Not a valid location.")
+            self.io.print("Not a valid location.")
 
-    def handle_event(self, command: str) -> None:
+    @timed()
+    async def handle_event(self, command: str) -> None:
         """Handle special events.
 
+        The command's trigger from the game data is carried out, if it has one: dialogues first, then the trigger
+        set off by every command at the location, if there is one, and then any other trigger. A command without
+        a trigger picks up the items its result mentions instead.
+
         Preconditions:
         - command is a valid command in the current location's available commands
         """
         result = ''
         location = self.get_location()
+        trigger = None
 
         if command in location.available_commands:
             result = location.available_commands[command]
-            print(result)
+            self.io.print(result)
             if not (
                 "go" in command or "talk to the people outside" in command
                 or "visit" in command or "computer" in command
             ):
                 del location.available_commands[command]
+            trigger = self.triggers.get(self.state.location_id, command)
 
-        if any(option in result for option in DIALOGUE_CHECKS):
-            update_game_state(self, dialogue_ongoing=True)
-            handle_dialogue(self, result)
+        if trigger is not None and trigger.dialogue:
+            await handle_trigger(self, trigger)
             return
 
-        if self.game_state[1] in LOCATION_CHECKS:
-            handle_location_event(self, self.game_state[1])
+        everywhere = self.triggers.get(self.state.location_id, None)
+        if everywhere is not None:
+            await handle_trigger(self, everywhere)
 
-        for key, func in EVENT_HANDLERS.items():
-            if self._string_in_text(key, result):
-                func(self, command, result)
-                return
+        if trigger is not None:
+            await handle_trigger(self, trigger)
+            return
 
-        for item_name, item in self._items.items():
-            if self._string_in_text(item_name, result):
-                handle_item_pickup(self, item_name, item)
+        for item_name in self.keyword_matcher.find_all(result):
+            handle_item_pickup(self, item_name, self._items[item_name])
 
-    def get_choice(self) -> str:
+    @timed()
+    async def get_choice(self) -> str:
         """Prompts player for input.
 
         Preconditions:
         - The game is ongoing and not in dialogue mode
         """
-        location = self.get_location()
-        print("\n\nWhat to do? Choose from: ", MENU)
-        print("\nAt this location, you can also:")
-        for action in location.available_commands:
-            print("-", action)
-
-        choice = input("\nEnter action: ").lower().strip()
-        while choice not in location.available_commands and choice not in MENU:
-            print("That was an invalid option; try again.")
-            choice = input("\nEnter action: ").lower().strip()
-
-        print(f"\n\n========\nYou decided to: {choice}\n\n\n")
-        update_game_state(self, moves=self.game_state[0] + 1)
+        listing = self.get_location().available_commands.listing()
+        line = (await self.io.input(MENU_HEADER + listing + ACTION_PROMPT)).lower().strip()
+        choice = self.resolve_choice(line)
+        while choice is None:
+            self.io.print("That was an invalid option; try again.")
+            suggestions = [] if self.io.render.discards else self.suggest_choices(line)
+            if suggestions:
+                self.io.print(f"Did you mean: {', '.join(suggestions)}?")
+            line = (await self.io.input(ACTION_PROMPT)).lower().strip()
+            choice = self.resolve_choice(line)
+
+        self.io.print(f"\n\n========\nYou decided to: {choice}\n\n\n")
         return choice
 
-    def handle_game_action(self, choice: str) -> None:
+    def is_valid_choice(self, choice: str) -> bool:
+        """Return whether the given choice is a menu command or a command available at the current location."""
+        return choice in self.get_location().available_commands or split_menu_choice(choice)[0] in MENU
+
+    def resolve_choice(self, line: str) -> Optional[str]:
+        """Return the choice the given line of input stands for: the line itself if it is a valid choice, or else
+        the only menu command or command available at the current location that starts with it, or None if there
+        isn't exactly one, or it is one of the UNABBREVIATED commands. Finding it takes time proportional to the
+        length of the line.
+        """
+        if self.is_valid_choice(line):
+            return line
+        completions = []
+        for index in (self.get_location().available_commands.index(), MENU_INDEX):
+            count = index.count(line)
+            if count > 1:
+                return None
+            if count == 1:
+                completions.append(index.complete(line))
+        if len(completions) != 1 or not line or completions[0] in UNABBREVIATED:
+            return None
+        return completions[0]
+
+    def suggest_choices(self, line: str, limit: int = 3) -> list[str]:
+        """Return up to limit menu commands or commands available at the current location that the given line of
+        input could be meant as: those it is a prefix of first, then those a small edit away from it, closest first.
+        """
+        suggestions = self.get_location().available_commands.index().suggest(line) + MENU_INDEX.suggest(line)
+        return [command for _, command in sorted(suggestions)[:limit]]
+
+    @timed("turn")
+    async def take_turn(self, choice: str) -> bool:
+        """Carry out the given menu command or game action, and return whether the player has won.
+
+        Every turn uses up a move and is recorded in self.journal, except for undo and redo, which move through
+        the turns already recorded, and stats.
+        Quitting ends the game at the end of the turn, without checking whether the player has won.
+
+        Preconditions:
+        - self.is_valid_choice(choice)
+        """
+        if split_menu_choice(choice)[0] in FREE_COMMANDS:
+            await handle_menu_command(self, choice)
+            return False
+
+        self.journal.begin_turn()
+        update_game_state(self, moves=self.state.moves + 1)
+        if split_menu_choice(choice)[0] in MENU:
+            await handle_menu_command(self, choice)
+        else:
+            await self.handle_game_action(choice)
+
+        won = self.state.ongoing and await check_win(self)
+        self.journal.end_turn()
+        return won
+
+    @timed()
+    async def handle_game_action(self, choice: str) -> None:
         """Handles non-menu input.
 
         Preconditions:
@@ -226,31 +347,66 @@ class AdventureGame:
         if "go" in choice:
             self.move(choice)
         else:
-            self.handle_event(choice)
-
-    def play(self) -> None:
-        """MAIN GAME LOOP"""
-        self.event_log = EventList()
+            await self.handle_event(choice)
 
-        print_objective()
+    async def run(self) -> str:
+        """MAIN GAME LOOP
 
-        while self.game_state[2] and self.game_state[0] < 60:
-            display_time(self)
+        Play the game until it ends, and return how it ended: "win", "lose" or "quit". The game is lost as soon
+        as a condition with the "lose" outcome holds, such as having taken MOVE_LIMIT moves, or when the player is
+        knocked out in combat.
+        """
+        self.event_log.close()
+        self.event_log = self._new_event_log()
 
-            if self.game_state[3]:
-                continue
-            else:
-                choice = self.get_choice()
+        print_objective(self)
+        if self.autosave is not None and self.autosave.resume(self):
+            self.io.print("Carrying on from your saved game.")
+        return await self.play_turns()
 
-            if choice in MENU and not self.game_state[3]:
-                handle_menu_command(self, choice)
+    async def play_turns(self) -> str:
+        """Play the game from the state it is in until it ends, and return how it ended, the way run does, but
+        without starting a new event log or showing the objective first.
+        """
+        try:
+            won = False
+            while not won and self.state.ongoing and not self.conditions.has_outcome("lose"):
+                display_time(self)
+
+                if self.state.dialogue_ongoing:
+                    continue
+                else:
+                    choice = await self.get_choice()
+
+                won = await self.take_turn(choice)
+                self.io.flush()
+                if self.on_turn is not None:
+                    self.on_turn(self, choice)
+                if self.autosave is not None:
+                    self.autosave.checkpoint(self)
+
+            if won:
+                outcome = "win"
+            elif not self.state.ongoing and self.state.health > 0:
+                return "quit"  # the save is kept, so the game can be carried on next time
             else:
-                self.handle_game_action(choice)
+                self.io.print("You lose, sorry!")
+                outcome = "lose"
+            if self.autosave is not None:
+                self.autosave.finish()
+            return outcome
+        finally:
+            self.io.flush()
+            if self.autosave is not None:
+                self.autosave.close()
 
-            if check_win(self):
-                quit()
+    def play(self) -> None:
+        """Play the game in this process until it ends, then exit.
 
-        print("You lose, sorry!")
+        Preconditions:
+        - self.io never suspends, like TerminalIO and FastIO (see run_sync)
+        """
+        run_sync(self.run())
         quit()
 
 
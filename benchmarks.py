@@ -0,0 +1,389 @@
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from typing import Callable, Optional
+
+from adventure import ACTION_PROMPT, AdventureGame
+from game_entities import Item
+from game_io import FastIO, run_sync
+from proj1_batch_simulation import run_script
+from event_store import StreamingEventList
+from fuzzer import Fuzzer
+from proj1_event_logger import Event, EventList
+from proj1_simulation import WALKTHROUGHS
+from save_game import AutoSaver, load, save
+from world import IndexedWorld, load_game_data
+from world_compiler import compile_game_data
+from world_generator import generate_world
+from world_index import WorldIndex, build_index
+
+GAME_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_data.json")
+LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "launcher.py")
+
+# The world sizes the scaling benchmark compares, in locations and items together
+SCALES = (10 ** 2, 10 ** 4, 10 ** 6)
+
+# A script that wins the game with the current game data
+WINNING_SCRIPT = WALKTHROUGHS["win"]
+
+# Each benchmark is set up by a function that returns the operation to time
+Setup = Callable[[], Callable[[], object]]
+BENCHMARKS: dict[str, Setup] = {}
+
+
+def benchmark(name: str) -> Callable[[Setup], Setup]:
+    """Register the decorated setup function as the benchmark with the given name."""
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _new_game() -> AdventureGame:
+    """Return a new game at the start, with all its output thrown away."""
+    return AdventureGame(GAME_DATA, 1, FastIO(capture=False))
+
+
+@benchmark("string_in_text")
+def _string_in_text() -> Callable[[], object]:
+    text = _new_game().get_location().available_commands["check clothes"]
+    return lambda: AdventureGame._string_in_text("candy", text)
+
+
+@benchmark("handle_event")
+def _handle_event() -> Callable[[], object]:
+    game = _new_game()
+
+    def handle_event() -> None:
+        # The event picks up an item and removes the command, so undo it to leave the game as it was
+        game.journal.begin_turn()
+        run_sync(game.handle_event("check papers"))
+        game.journal.end_turn()
+        game.journal.undo()
+    return handle_event
+
+
+@benchmark("inventory.has_item")
+def _has_item() -> Callable[[], object]:
+    game = _new_game()
+    catalog = {f"item {i}": Item(f"item {i}", "A benchmark item.", 0, 0, 0, item_id=i) for i in range(50)}
+    for name in catalog:
+        game.inventory.add_item(name, catalog, 0)
+    return lambda: game.inventory.has_item("item 25")
+
+
+@benchmark("inventory.add_item")
+def _add_item() -> Callable[[], object]:
+    game = _new_game()
+    catalog = {f"item {i}": Item(f"item {i}", "A benchmark item.", 0, 0, 0, i, item_id=i) for i in range(51)}
+    for name in list(catalog)[:50]:
+        game.inventory.add_item(name, catalog, 0)
+
+    def add_item() -> None:
+        game.inventory.add_item("item 50", catalog, 0)
+        game.inventory.remove_item("item 50", catalog)
+    return add_item
+
+
+@benchmark("GameState.copy")
+def _copy_state() -> Callable[[], object]:
+    return _new_game().state.copy
+
+
+@benchmark("AdventureGame.state_key")
+def _state_key() -> Callable[[], object]:
+    return _new_game().state_key
+
+
+@benchmark("AdventureGame.get_choice")
+def _get_choice() -> Callable[[], object]:
+    io = FastIO(itertools.repeat("look"))
+    game = AdventureGame(GAME_DATA, 1, io)
+
+    def get_choice() -> None:
+        run_sync(game.get_choice())
+        io.output.clear()
+    return get_choice
+
+
+@benchmark("Fuzzer.step")
+def _fuzzer_step() -> Callable[[], object]:
+    # one whole fuzzing session, after enough sessions that most continue an earlier one, as they do when fuzzing
+    fuzzer = Fuzzer(GAME_DATA, 1, seed=0)
+    fuzzer.fuzz(sessions=200)
+    return fuzzer.step
+
+
+@benchmark("Event")
+def _event() -> Callable[[], object]:
+    game = _new_game()
+    return lambda: Event(1, game)
+
+
+@benchmark("EventList.add_event")
+def _add_event() -> Callable[[], object]:
+    game = _new_game()
+    log = EventList()
+    return lambda: log.add_event(Event(1, game), "look")
+
+
+@benchmark("StreamingEventList.add_event")
+def _add_streamed_event() -> Callable[[], object]:
+    game = _new_game()
+    log = StreamingEventList(os.path.join(tempfile.mkdtemp(), "events.jsonl"))
+    return lambda: log.add_event(Event(1, game), "look")
+
+
+@benchmark("EventList.get_id_log")
+def _get_id_log() -> Callable[[], object]:
+    game = _new_game()
+    log = EventList()
+    for _ in range(1000):
+        log.add_event(Event(1, game), "look")
+    return log.get_id_log
+
+
+@benchmark("load_game_data (json)")
+def _load_json() -> Callable[[], object]:
+    return lambda: load_game_data(GAME_DATA)
+
+
+@benchmark("load_game_data (compiled)")
+def _load_compiled() -> Callable[[], object]:
+    # Compile a copy, so the benchmark never leaves a world file behind
+    directory = tempfile.mkdtemp()
+    filename = shutil.copy2(GAME_DATA, directory)
+    compile_game_data(filename)
+    return lambda: load_game_data(filename)
+
+
+def _played_game() -> AdventureGame:
+    """Return a game that has been played halfway through WINNING_SCRIPT."""
+    game = AdventureGame(GAME_DATA, 1, FastIO(WINNING_SCRIPT, capture=False))
+    for _ in range(len(WINNING_SCRIPT) // 2):
+        run_sync(game.take_turn(run_sync(game.get_choice())))
+    return game
+
+
+@benchmark("save_game.load")
+def _load_save() -> Callable[[], object]:
+    filename = os.path.join(tempfile.mkdtemp(), "game.sav")
+    save(_played_game(), filename)
+    return lambda: load(AdventureGame(GAME_DATA, 1, FastIO(capture=False)), filename)
+
+
+@benchmark("AutoSaver.checkpoint")
+def _checkpoint() -> Callable[[], object]:
+    game = _played_game()
+    saver = AutoSaver(os.path.join(tempfile.mkdtemp(), "game.sav"))
+    saver.checkpoint(game)
+
+    def checkpoint() -> None:
+        # a turn that uses up a move, then undone, so that both checkpoints have something to save
+        run_sync(game.take_turn("look"))
+        saver.checkpoint(game)
+        game.journal.undo()
+        saver.checkpoint(game)
+    return checkpoint
+
+
+def _walkthrough(commands: list[str]) -> Setup:
+    """Return the setup for a benchmark that plays a whole game through the given commands, from loading the
+    world to the end, at machine speed with its output thrown away.
+    """
+    return lambda: lambda: run_script("benchmark", commands, GAME_DATA)
+
+
+for _name, _commands in WALKTHROUGHS.items():
+    benchmark(f"walkthrough {_name}")(_walkthrough(_commands))
+
+
+def time_benchmark(setup: Setup, repeat: int = 5) -> dict[str, float]:
+    """Return how long the benchmark with the given setup takes per operation, in seconds, as the best and
+    median of repeat runs, and the number of operations in each run.
+    """
+    timer = timeit.Timer(setup())
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat, number)]
+    return {"best": min(times), "median": statistics.median(times), "number": number}
+
+
+def startup_time(repeat: int = 5) -> dict[str, float]:
+    """Return how long the launcher takes from starting a new Python process to showing the first prompt, in
+    seconds, as the best and median of repeat runs, in the same form as time_benchmark.
+
+    One run is made first and not timed, so that the bytecode and the compiled world are cached, as they are once
+    the game has been played.
+    """
+    times = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, LAUNCHER, "--world", GAME_DATA], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        output = b''
+        while ACTION_PROMPT.encode() not in output:
+            chunk = os.read(process.stdout.fileno(), 1 << 16)
+            if not chunk:
+                raise RuntimeError("the launcher exited before showing its first prompt")
+            output += chunk
+        times.append(time.perf_counter() - start)
+        process.stdin.close()
+        process.wait()
+        process.stdout.close()
+    return {"best": min(times[1:]), "median": statistics.median(times[1:]), "number": 1}
+
+
+def event_memory(num_events: int = 10000, inventory_size: int = 50, changes_every: int = 10) -> float:
+    """Return the average number of bytes each Event in a log takes up, for a player carrying inventory_size items
+    whose inventory changes once every changes_every events.
+    """
+    game = AdventureGame(GAME_DATA, 1, FastIO(capture=False))
+    catalog = {f"item {i}": Item(f"item {i}", "A benchmark item.", 0, 0, 0, item_id=i)
+               for i in range(inventory_size + 1)}
+    for name in list(catalog)[:inventory_size]:
+        game.inventory.add_item(name, catalog, 0)
+
+    log = EventList()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(num_events):
+        if i % changes_every == 0:
+            if game.inventory.has_item(f"item {inventory_size}"):
+                game.inventory.remove_item(f"item {inventory_size}", catalog)
+            else:
+                game.inventory.add_item(f"item {inventory_size}", catalog, 0)
+        log.add_event(Event(1, game), "look")
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (after - before) / num_events
+
+
+def _generated_world(entities: int, directory: str) -> tuple[str, int]:
+    """Generate and index a world with about the given number of locations and items together in the given
+    directory, and return its game data file and the first location with an item to pick up.
+    """
+    data = generate_world(entities // 2, entities - entities // 2, max(1, entities // 1000))
+    start = next(location["id"] for location in data["locations"] if location["items"])
+    filename = os.path.join(directory, f"world_{entities}.json")
+    with open(filename, 'w') as f:
+        json.dump(data, f)
+    build_index(filename)
+    return filename, start
+
+
+def scaling(sizes: tuple[int, ...] = SCALES, repeat: int = 5) -> dict[str, dict[str, dict[str, float]]]:
+    """Return how long loading an indexed world, and playing a turn and the event it handles in it, take in
+    generated worlds of each of the given sizes, as the results of time_benchmark by size. These should hardly
+    change with the size of the world.
+    """
+    results = {}
+    for entities in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            filename, start = _generated_world(entities, directory)
+            game = AdventureGame(filename, start, FastIO(capture=False))
+            command = next(command for command in game.get_location().available_commands if "inspect" in command)
+
+            def handle_event() -> None:
+                game.journal.begin_turn()
+                run_sync(game.handle_event(command))
+                game.journal.end_turn()
+                game.journal.undo()
+
+            def take_turn() -> None:
+                run_sync(game.take_turn(command))
+                game.journal.undo()
+
+            results[str(entities)] = {
+                "load world": time_benchmark(lambda: lambda: IndexedWorld(WorldIndex.open(filename)), repeat),
+                "handle_event": time_benchmark(lambda: handle_event, repeat),
+                "take_turn": time_benchmark(lambda: take_turn, repeat)
+            }
+        print(f"{entities:>9} entities: " + ', '.join(f"{name} {result['best'] * 1e6:.2f} us"
+                                                      for name, result in results[str(entities)].items()))
+    return results
+
+
+def run_benchmarks(names: Optional[list[str]] = None, repeat: int = 5) -> dict:
+    """Run the benchmarks with the given names, or all of them, and return their results as a
+    JSON-serializable dictionary.
+    """
+    results = {}
+    for name in names if names is not None else BENCHMARKS:
+        results[name] = time_benchmark(BENCHMARKS[name], repeat)
+        print(f"{name:32} {results[name]['best'] * 1e6:12.2f} us")
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "memory": {f"event bytes ({size} items)": event_memory(inventory_size=size) for size in (0, 10, 100)}
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.1) -> list[str]:
+    """Return a description of every result in current that is more than threshold (a fraction) worse than the
+    same result in baseline. Results that are only in one of them are ignored.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        if name in baseline["results"]:
+            old, new = baseline["results"][name]["best"], result["best"]
+            if new > old * (1 + threshold):
+                regressions.append(f"{name}: {old * 1e6:.2f} us -> {new * 1e6:.2f} us ({new / old - 1:+.0%})")
+    for name, new in current["memory"].items():
+        old = baseline.get("memory", {}).get(name)
+        if old is not None and new > old * (1 + threshold):
+            regressions.append(f"{name}: {old:.0f} -> {new:.0f} ({new / old - 1:+.0%})")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the benchmarks from the command line, exiting with an error if any result regressed."""
+    parser = argparse.ArgumentParser(description="Benchmark the adventure game engine.")
+    parser.add_argument("-k", dest="filter", help="only run benchmarks whose names contain this")
+    parser.add_argument("--repeat", type=int, default=5, help="how many times to time each benchmark")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="a JSON file of earlier results to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="how much slower than the baseline counts as a regression, as a fraction")
+    parser.add_argument("--scaling", action="store_true",
+                        help="also time loading and playing generated worlds of 10^2 to 10^6 locations and items")
+    parser.add_argument("--startup", action="store_true",
+                        help="also time starting the launcher in a new process, up to its first prompt")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.filter is None or args.filter in name]
+    results = run_benchmarks(names, args.repeat)
+    if args.scaling:
+        results["scaling"] = scaling(repeat=args.repeat)
+    if args.startup:
+        results["results"]["launcher startup"] = startup_time(args.repeat)
+        print(f"{'launcher startup':32} {results['results']['launcher startup']['best'] * 1e3:12.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+from __future__ import annotations
+from typing import Iterable, Optional
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Return the Levenshtein distance between a and b: the fewest single-character insertions, deletions and
+    substitutions that turn one into the other. If a limit is given, any distance over it may be returned as
+    limit + 1, which lets most comparisons stop early.
+
+    >>> edit_distance("go east", "go eats")
+    2
+    >>> edit_distance("inventory", "look", limit=2)
+    3
+    """
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _TrieNode:
+    """A node of a CommandTrie: the commands that start with the characters on the path to it."""
+    children: dict[str, _TrieNode]
+    count: int
+    command: Optional[str]
+
+    __slots__ = ('children', 'count', 'command')
+
+    def __init__(self) -> None:
+        self.children = {}
+        self.count = 0
+        self.command = None
+
+
+class CommandTrie:
+    """A trie of commands, one character per level, where each node knows how many commands start with the
+    characters on the path to it. So whether a prefix starts exactly one command, and which one, is found in time
+    proportional to the length of the command, however many commands there are.
+    """
+    # Private Instance Attributes:
+    #   - _root: the node for the empty prefix
+    _root: _TrieNode
+
+    def __init__(self, commands: Iterable[str] = ()) -> None:
+        self._root = _TrieNode()
+        for command in commands:
+            self.add(command)
+
+    def __contains__(self, command: object) -> bool:
+        node = self._find(command) if isinstance(command, str) else None
+        return node is not None and node.command == command
+
+    def add(self, command: str) -> None:
+        """Add the given command, if it isn't already in the trie."""
+        if command in self:
+            return
+        node = self._root
+        node.count += 1
+        for char in command:
+            node = node.children.setdefault(char, _TrieNode())
+            node.count += 1
+        node.command = command
+
+    def remove(self, command: str) -> None:
+        """Remove the given command, if it is in the trie."""
+        if command not in self:
+            return
+        node = self._root
+        node.count -= 1
+        for char in command:
+            child = node.children[char]
+            child.count -= 1
+            if child.count == 0:
+                del node.children[char]  # nothing else goes through the rest of the path
+                return
+            node = child
+        node.command = None
+
+    def count(self, prefix: str) -> int:
+        """Return the number of commands that start with the given prefix."""
+        node = self._find(prefix)
+        return 0 if node is None else node.count
+
+    def complete(self, prefix: str) -> Optional[str]:
+        """Return the command that is the given prefix, or else the only command that starts with it, or None if
+        there is no such command.
+        """
+        node = self._find(prefix)
+        if node is None:
+            return None
+        if node.command is not None:
+            return node.command
+        if node.count != 1:
+            return None
+        while node.command is None:
+            node = next(iter(node.children.values()))
+        return node.command
+
+    def completions(self, prefix: str, limit: int) -> list[str]:
+        """Return up to limit of the commands that start with the given prefix, in alphabetical order."""
+        found = []
+        stack = [self._find(prefix)]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            if node is None:
+                continue
+            if node.command is not None:
+                found.append(node.command)
+            stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+        return found
+
+    def _find(self, prefix: str) -> Optional[_TrieNode]:
+        """Return the node for the given prefix, or None if no command starts with it."""
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+
+class BKTree:
+    """A Burkhard-Keller tree of commands, which finds the commands within an edit distance of a piece of text
+    without comparing it to most of them.
+
+    Each command's children are kept by their distance from it, and by the triangle inequality only the children
+    within max_distance of the text's distance from a command can be close to the text. Removed commands are only
+    skipped, until they make up half of the tree, when it is rebuilt.
+    """
+    # Private Instance Attributes:
+    #   - _root: (command, {distance: child}) for the first command added, or None if the tree is empty
+    #   - _size: the number of commands in the tree, including the removed ones
+    #   - _removed: the commands in the tree that have been removed since
+    _root: Optional[tuple[str, dict[int, tuple]]]
+    _size: int
+    _removed: set[str]
+
+    def __init__(self, commands: Iterable[str] = ()) -> None:
+        self._build(commands)
+
+    def _build(self, commands: Iterable[str]) -> None:
+        """Make this tree hold exactly the given commands."""
+        self._root = None
+        self._size = 0
+        self._removed = set()
+        for command in commands:
+            self.add(command)
+
+    def add(self, command: str) -> None:
+        """Add the given command, if it isn't already in the tree."""
+        if command in self._removed:
+            self._removed.discard(command)
+            return
+        if self._root is None:
+            self._root = (command, {})
+            self._size = 1
+            return
+        node = self._root
+        while True:
+            distance = edit_distance(command, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (command, {})
+                self._size += 1
+                return
+            node = child
+
+    def remove(self, command: str) -> None:
+        """Remove the given command, if it is in the tree."""
+        if self.search(command, 0):
+            self._removed.add(command)
+            if 2 * len(self._removed) >= self._size:
+                self._build([found for found in self._commands() if found not in self._removed])
+
+    def search(self, text: str, max_distance: int) -> list[tuple[int, str]]:
+        """Return (distance, command) for every command within the given edit distance of text, closest first,
+        and in alphabetical order when they are as close.
+        """
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            command, children = stack.pop()
+            distance = edit_distance(text, command)
+            if distance <= max_distance and command not in self._removed:
+                found.append((distance, command))
+            stack.extend(child for child_distance, child in children.items()
+                         if distance - max_distance <= child_distance <= distance + max_distance)
+        return sorted(found)
+
+    def _commands(self) -> list[str]:
+        """Return every command in the tree, including the removed ones."""
+        commands = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            command, children = stack.pop()
+            commands.append(command)
+            stack.extend(children.values())
+        return commands
+
+
+class CommandIndex:
+    """The commands available somewhere, indexed to resolve what a player types into one of them: a unique
+    prefix is taken as the command it starts, and otherwise the commands within a small edit distance of it are
+    suggested. The index is kept up to date as commands are added and removed.
+
+    The tree for suggesting corrections is only built the first time a correction is asked for, since working out
+    edit distances takes much longer than resolving prefixes.
+    """
+    # Private Instance Attributes:
+    #   - _trie: the commands, for resolving prefixes
+    #   - _tree: the commands, for suggesting corrections, or None if no correction has been asked for yet
+    #   - _commands: the commands, in the order they were added
+    _trie: CommandTrie
+    _tree: Optional[BKTree]
+    _commands: dict[str, None]
+
+    def __init__(self, commands: Iterable[str] = ()) -> None:
+        self._commands = dict.fromkeys(commands)
+        self._trie = CommandTrie(self._commands)
+        self._tree = None
+
+    def add(self, command: str) -> None:
+        """Add the given command to the index."""
+        self._commands[command] = None
+        self._trie.add(command)
+        if self._tree is not None:
+            self._tree.add(command)
+
+    def remove(self, command: str) -> None:
+        """Remove the given command from the index."""
+        self._commands.pop(command, None)
+        self._trie.remove(command)
+        if self._tree is not None:
+            self._tree.remove(command)
+
+    def count(self, prefix: str) -> int:
+        """Return the number of commands that start with the given prefix."""
+        return self._trie.count(prefix)
+
+    def complete(self, prefix: str) -> Optional[str]:
+        """Return the command that is the given non-empty prefix, or else the only command that starts with it, or
+        None if there is no such command.
+        """
+        return self._trie.complete(prefix) if prefix else None
+
+    def suggest(self, text: str, limit: int = 3) -> list[tuple[int, str]]:
+        """Return (distance, command) for up to limit commands that text could be meant as, best first: the
+        commands that start with it, as distance 0, then the commands within an edit distance of it that grows
+        with its length, up to 2, closest first.
+        """
+        if self._tree is None:
+            self._tree = BKTree(self._commands)
+        suggestions = [(0, command) for command in self._trie.completions(text, limit)] if text else []
+        for distance, command in self._tree.search(text, min(2, len(text) // 3)):
+            if len(suggestions) == limit:
+                break
+            if not command.startswith(text):
+                suggestions.append((distance, command))
+        return suggestions
@@ -0,0 +1,279 @@
+from __future__ import annotations
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from game_state import GameState, PUZZLE_BITS, PUZZLES
+
+MOVE_LIMIT = 60
+
+# What unlocks along the way and what ends the game, for game data that doesn't declare its own conditions.
+# These are the rules the game has always been played by.
+DEFAULT_CONDITIONS = (
+    {"when": {"has_item": "lucky UofT mug", "not_at": [11, 12, 13, 14]},
+     "message": "Now, after you got all of your items, you can finally submit your project.",
+     "unlock": {"go back to dorm room": 11}},
+    {"when": {"puzzles_solved": list(PUZZLES)}, "outcome": "win"},
+    {"when": {"moves": MOVE_LIMIT}, "outcome": "lose"},
+)
+
+OUTCOMES = ("win", "lose")
+
+# The part of the state each field of GameState is, for the fields conditions can read, other than flags
+_STATE_FIELDS = {'moves': 'moves', 'location_id': 'location'}
+# The part of the state each puzzle's bit of GameState.flags is
+_PUZZLE_FIELDS = tuple((bit, f'puzzle {name}') for bit, name in zip(PUZZLE_BITS, PUZZLES))
+
+# A part of a game's state that conditions can read: 'moves', 'location', 'puzzle <name>' or 'item <name>', where
+# item names are lowercased
+Field = str
+# Something that must be true for a condition to hold: (the parts of the state it reads, a test of the game)
+Clause = tuple[tuple[Field, ...], Callable[[Any], bool]]
+
+
+def changed_fields(old: GameState, new: GameState, item_names: Sequence[str]) -> list[Field]:
+    """Return the parts of the state that conditions can read that differ between the given states, where
+    item_names[i] is the lowercased name of the item whose item_id is i.
+    """
+    fields = [field for name, field in _STATE_FIELDS.items() if getattr(old, name) != getattr(new, name)]
+    fields.extend(field for bit, field in _PUZZLE_FIELDS if (old.flags ^ new.flags) & bit)
+    items = old.items ^ new.items
+    while items:
+        bit = items & -items
+        fields.append(f'item {item_names[bit.bit_length() - 1]}')
+        items ^= bit
+    return fields
+
+
+def _clause(kind: str, value: Any) -> Clause:
+    """Return the clause of the given kind from game data, with the given value.
+
+    Preconditions:
+    - the clause is valid (see validate_clauses)
+    """
+    if kind in ("has_item", "lacks_item"):
+        names = [value] if isinstance(value, str) else value
+        wanted = kind == "has_item"
+        return tuple(f'item {name.lower()}' for name in names), \
+            lambda game: all(game.inventory.has_item(name) == wanted for name in names)
+    elif kind == "at":
+        places = frozenset(value)
+        return ('location',), lambda game: game.state.location_id in places
+    elif kind == "not_at":
+        places = frozenset(value)
+        return ('location',), lambda game: game.state.location_id not in places
+    elif kind == "puzzles_solved":
+        mask = 0
+        for name in value:
+            mask |= PUZZLE_BITS[PUZZLES.index(name)]
+        return tuple(f'puzzle {name}' for name in value), lambda game: game.state.flags & mask == mask
+    else:  # "moves"
+        return ('moves',), lambda game: game.state.moves >= value
+
+
+def compile_clauses(when: dict[str, Any]) -> tuple[Clause, ...]:
+    """Return the clauses in the given valid "when" object from game data."""
+    return tuple(_clause(kind, value) for kind, value in when.items())
+
+
+def _is_place(value: Any, location_ids: set[int]) -> bool:
+    """Return whether the given JSON value is one of the given location ids."""
+    return isinstance(value, int) and not isinstance(value, bool) and value in location_ids
+
+
+def validate_clauses(when: Any, location_ids: set[int], item_names: set[str]) -> list[str]:
+    """Return a description of everything wrong with the given "when" object from game data, whose world has the
+    given location ids and item names. Its entries must all be true for it to hold, out of:
+        - "has_item" and "lacks_item": an item name, or a list of them, that the inventory must all hold or all lack
+        - "at" and "not_at": a list of location ids the player must or must not be at
+        - "puzzles_solved": a list of the names in PUZZLES
+        - "moves": the number of moves the game must have taken at least
+
+    >>> validate_clauses({"has_item": ["hat", "scarf"], "moves": 3}, set(), {"hat"})
+    ["unknown item 'scarf'"]
+    """
+    if not isinstance(when, dict):
+        return ["'when' must be an object"]
+
+    problems = []
+    for kind, value in when.items():
+        if kind in ("has_item", "lacks_item"):
+            names = [value] if isinstance(value, str) else value
+            if not isinstance(names, list) or not names:
+                problems.append(f"{kind!r} must be an item name or a list of them")
+            else:
+                problems.extend(f"unknown item {name!r}" for name in names
+                                if not isinstance(name, str) or name not in item_names)
+        elif kind in ("at", "not_at"):
+            if not isinstance(value, list) or not all(_is_place(place, location_ids) for place in value):
+                problems.append(f"{kind!r} must be a list of location ids")
+        elif kind == "puzzles_solved":
+            if not isinstance(value, list) or any(name not in PUZZLES for name in map(str, value)):
+                problems.append(f"'puzzles_solved' must be a list of puzzles out of {PUZZLES}")
+        elif kind == "moves":
+            if not isinstance(value, int) or isinstance(value, bool):
+                problems.append("'moves' must be a number of moves")
+        else:
+            problems.append(f"unknown clause {kind!r}")
+    return problems
+
+
+def validate_conditions(conditions: Any, location_ids: set[int], item_names: set[str]) -> list[str]:
+    """Return a description of everything wrong with the given conditions from game data, whose world has the given
+    location ids and item names, or an empty list if there is nothing wrong with them.
+
+    Each condition is an object with:
+        - "when": what must be true for the condition to hold (see validate_clauses)
+        - "message" (optional): shown at the end of every turn the condition holds
+        - "unlock" (optional): commands added at the player's location, with the location id each leads to, at the
+            end of every turn the condition holds
+        - "outcome" (optional): "win" if the game is won at the end of a turn the condition holds, or "lose" if the
+            game is lost as soon as it holds
+
+    >>> validate_conditions([{"when": {"moves": 60}, "outcome": "lose"}], set(), set())
+    []
+    >>> validate_conditions([{"when": {"has_item": "hat"}, "outcome": "draw"}], set(), set())
+    ["condition #0: unknown item 'hat'", "condition #0: unknown outcome 'draw'"]
+    """
+    if not isinstance(conditions, list):
+        return ["conditions must be a list"]
+
+    problems = []
+    for i, condition in enumerate(conditions):
+        if not isinstance(condition, dict) or not isinstance(condition.get('when'), dict):
+            problems.append(f"condition #{i} must be an object with a 'when' object")
+            continue
+        problems.extend(f"condition #{i}: {problem}"
+                        for problem in validate_clauses(condition['when'], location_ids, item_names))
+        if not isinstance(condition.get('message', ''), str):
+            problems.append(f"condition #{i}: 'message' must be some text")
+        unlock = condition.get('unlock', {})
+        if not isinstance(unlock, dict) or not all(_is_place(target, location_ids) for target in unlock.values()):
+            problems.append(f"condition #{i}: 'unlock' must map commands to location ids")
+        if condition.get('outcome') is not None and condition['outcome'] not in OUTCOMES:
+            problems.append(f"condition #{i}: unknown outcome {condition['outcome']!r}")
+    return problems
+
+
+class Condition:
+    """A condition declared in game data, and what happens while it holds.
+
+    Instance Attributes:
+        - clauses: everything that must be true for the condition to hold
+        - message: what is shown at the end of every turn the condition holds, if anything
+        - unlock: the commands added at the player's location at the end of every turn the condition holds, with
+            the location id each leads to
+        - outcome: "win" or "lose" if the condition ends the game, otherwise None
+    """
+    clauses: tuple[Clause, ...]
+    message: str
+    unlock: dict[str, int]
+    outcome: Optional[str]
+
+    def __init__(self, declaration: dict) -> None:
+        """Compile the given valid condition from game data."""
+        self.clauses = compile_clauses(declaration['when'])
+        self.message = declaration.get('message', '')
+        self.unlock = declaration.get('unlock', {})
+        self.outcome = declaration.get('outcome')
+
+    def holds(self, game: Any) -> bool:
+        """Return whether this condition holds in the given game."""
+        return all(test(game) for _, test in self.clauses)
+
+
+class ConditionSet:
+    """A world's conditions, compiled into watchers on the parts of a game's state they read.
+
+    Instance Attributes:
+        - conditions: the conditions, in the order they were declared
+    """
+    # Private Instance Attributes:
+    #   - _watchers: the positions in self.conditions of the conditions that read each part of the state
+    conditions: tuple[Condition, ...]
+    _watchers: dict[Field, tuple[int, ...]]
+
+    def __init__(self, declarations: Iterable[dict]) -> None:
+        """Compile the given valid conditions from game data."""
+        self.conditions = tuple(Condition(declaration) for declaration in declarations)
+        watchers = {}
+        for i, condition in enumerate(self.conditions):
+            for fields, _ in condition.clauses:
+                for field in fields:
+                    watchers.setdefault(field, []).append(i)
+        self._watchers = {field: tuple(dict.fromkeys(positions)) for field, positions in watchers.items()}
+
+    def watching(self, field: Field) -> tuple[int, ...]:
+        """Return the positions of the conditions that read the given part of the state."""
+        return self._watchers.get(field, ())
+
+
+class ConditionWatcher:
+    """Which of a world's conditions hold in one game, kept up to date as the game's state changes.
+
+    A condition is only evaluated when a part of the state it reads changes, such as an item it asks for being
+    added to or removed from the inventory, a puzzle it asks about being solved, or a move being taken. So checking
+    the conditions at the end of each turn only looks at the ones that hold.
+    """
+    # Private Instance Attributes:
+    #   - _conditions: the world's conditions
+    #   - _game: the game being watched
+    #   - _holding: the positions of the conditions that hold in the game
+    _conditions: ConditionSet
+    _game: Any
+    _holding: set[int]
+
+    def __init__(self, conditions: ConditionSet, game: Any) -> None:
+        """Initialize a watcher of the given game, where no condition holds until it is refreshed."""
+        self._conditions = conditions
+        self._game = game
+        self._holding = set()
+
+    def refresh(self) -> None:
+        """Evaluate every condition, as when the game starts."""
+        self._holding = {i for i, condition in enumerate(self._conditions.conditions) if condition.holds(self._game)}
+
+    def changed(self, field: Field) -> None:
+        """Evaluate again the conditions that read the given part of the state, which has just changed."""
+        for i in self._conditions.watching(field):
+            if self._conditions.conditions[i].holds(self._game):
+                self._holding.add(i)
+            else:
+                self._holding.discard(i)
+
+    def state_changed(self, name: str, old: Any, new: Any) -> None:
+        """Evaluate again the conditions that read the field of the game's GameState with the given name, if it
+        has changed from old to new. For flags, only the conditions that read a bit that changed are evaluated.
+        """
+        if old == new:
+            return
+        if name == 'flags':
+            for bit, field in _PUZZLE_FIELDS:
+                if (old ^ new) & bit:
+                    self.changed(field)
+        elif name in _STATE_FIELDS:
+            self.changed(_STATE_FIELDS[name])
+
+    def item_changed(self, name: str) -> None:
+        """Evaluate again the conditions that read whether the inventory holds the item with the given lowercased
+        name, which has just been added or removed.
+        """
+        self.changed(f'item {name}')
+
+    def holding(self) -> list[Condition]:
+        """Return the conditions that hold, in the order they were declared."""
+        return [self._conditions.conditions[i] for i in sorted(self._holding)]
+
+    def has_outcome(self, outcome: str) -> bool:
+        """Return whether a condition with the given outcome holds."""
+        return any(self._conditions.conditions[i].outcome == outcome for i in self._holding)
+
+    def stale(self, fields: Optional[Iterable[Field]] = None) -> list[Condition]:
+        """Return the conditions whose result is out of date with the game's state, which should never happen.
+        If fields are given, only the conditions that read those parts of the state are looked at, otherwise
+        every condition is evaluated. This is only for checking the watcher.
+        """
+        if fields is None:
+            positions = range(len(self._conditions.conditions))
+        else:
+            positions = sorted({i for field in fields for i in self._conditions.watching(field)})
+        return [self._conditions.conditions[i] for i in positions
+                if self._conditions.conditions[i].holds(self._game) != (i in self._holding)]
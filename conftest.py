@@ -0,0 +1,52 @@
+"""Fixtures shared by the tests of games played on game_data.json."""
+from __future__ import annotations
+import os
+from typing import Callable
+
+import pytest
+
+from adventure import AdventureGame
+from game_io import FastIO, run_sync
+
+GAME_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_data.json")
+
+
+def _new_game(*lines: str) -> AdventureGame:
+    """Return a new game on game_data.json that reads the given lines as the player's input, with its output
+    captured.
+    """
+    return AdventureGame(GAME_DATA, 1, FastIO(lines))
+
+
+def _play(game: AdventureGame, *choices: str) -> None:
+    """Play a turn for each of the given choices. Anything a turn asks the player is read from the game's input."""
+    for choice in choices:
+        run_sync(game.take_turn(choice))
+
+
+def _snapshot(game: AdventureGame) -> tuple:
+    """Return everything about the game that undoing a turn puts back, and a save file keeps."""
+    return (game.player_state, game.game_state, game.state.items, game.inventory.snapshot(),
+            game.inventory.get_money(), game._locations.changes(),
+            [list(game.get_location(location_id).available_commands.items()) for location_id in game._locations],
+            list(game.event_log.entries()))
+
+
+@pytest.fixture
+def new_game() -> Callable[..., AdventureGame]:
+    """Return a function that starts a new game on game_data.json, reading the lines it is given as input."""
+    return _new_game
+
+
+@pytest.fixture
+def play() -> Callable[..., None]:
+    """Return a function that plays a turn of a game for each choice it is given."""
+    return _play
+
+
+@pytest.fixture
+def snapshot() -> Callable[[AdventureGame], tuple]:
+    """Return a function that returns everything about a game that undoing a turn puts back, and a save file
+    keeps.
+    """
+    return _snapshot
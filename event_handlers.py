@@ -1,53 +1,78 @@
 import re
-from game_entities import Enemy, Item, Location
-from inventory import Inventory
-from combat import Combat
-from time import sleep
+from game_entities import Enemy, Item
 from typing import Optional
+from game_state import PUZZLES
 from game_updates import update_game_state, update_player_state, update_puzzle_state
 from proj1_event_logger import Event
+from instrumentation import timed
+from triggers import Effect, Trigger
+
+async def say(game, effect: Effect) -> None:
+    """Show the effect's text, with the money in the wallet in place of {money}."""
+    game.io.print(effect.value.format(money=game.inventory.get_money()))
+
+async def pause(game, effect: Effect) -> None:
+    await game.io.sleep(effect.value)
+
+async def give_money(game, effect: Effect) -> None:
+    game.inventory.add_money(effect.value)
+
+async def give_item(game, effect: Effect) -> None:
+    game.inventory.add_item(effect.value, game._items, game.state.score)
+
+async def take_item(game, effect: Effect) -> None:
+    game.inventory.remove_item(effect.value, game._items)
+
+async def fight(game, effect: Effect) -> None:
+    enemy = effect.value
+    await game.combat_system.start_combat(Enemy(enemy["enemy"], enemy["health"], enemy["attack"], enemy.get("reward")))
+
+async def set_commands(game, effect: Effect) -> None:
+    game.get_location().available_commands.update(effect.value)
+
+async def clear_commands(game, effect: Effect) -> None:
+    game.get_location().available_commands.clear()
+
+async def check(game, effect: Effect) -> None:
+    """Carry out the effect's then effects if everything it asks for is true, otherwise its else effects."""
+    await run_effects(game, effect.then if all(test(game) for _, test in effect.clauses) else effect.otherwise)
+
+async def pay(game, effect: Effect) -> None:
+    """Carry out the effect's then effects if the player can pay its price, otherwise its else effects."""
+    await run_effects(game, effect.then if game.inventory.remove_money(effect.value) else effect.otherwise)
+
+EFFECTS = {
+    "say": say,
+    "pause": pause,
+    "give_money": give_money,
+    "give_item": give_item,
+    "take_item": take_item,
+    "fight": fight,
+    "set_commands": set_commands,
+    "clear_commands": clear_commands,
+    "if": check,
+    "pay": pay
+}
+
+async def run_effects(game, effects: tuple[Effect, ...]) -> None:
+    """Carry out the given effects of a trigger, in order."""
+    for effect in effects:
+        await EFFECTS[effect.kind](game, effect)
+
+@timed()
+async def handle_trigger(game, trigger: Trigger) -> None:
+    """Carry out a trigger from the game data. A dialogue asks the player yes or no first."""
+    if trigger.dialogue:
+        update_game_state(game, dialogue_ongoing=True)
+        await handle_dialogue(game, trigger.effects)
+    else:
+        await run_effects(game, trigger.effects)
 
-def handle_combat(game, command: str, result: str) -> None:
-    """Handles all combat scenarios."""
-    if game._string_in_text("pass out", result):
-        if game.inventory.has_item("USB stick") and game.inventory.has_item("laptop charger"):
-            print("Demon: I have taken your lucky UofT mug and you will never get it back!")
-            demon = Enemy("demon", 100, 50)
-            game.combat_system.start_combat(demon)
-    elif game._string_in_text("attack the lions", result):
-        lions = Enemy("lion", 50, 20)
-        game.combat_system.start_combat(lions)
-
-def handle_inventory_event(game, command: str, result: str) -> None:
-    """Handles events that change inventory."""
-    if game._string_in_text("gifts", result):
-        if game.inventory.has_item("membership card"):
-            if not game.inventory.has_item("uoft hoodie"):
-                sleep(1)
-                print("Merchant: Let me see... Ah, wonderful, ya have it! Here ya go. Check yer inventory for some goodies.")
-                game.inventory.add_money(100)
-                game.inventory.add_item("uoft hoodie", game._items, game.player_state[2])
-                game.inventory.add_item("a very sharp stick", game._items, game.player_state[2])
-            else:
-                print("Merchant: I already gave ya yer gifts!")
-        else:
-            print("Merchant: Ah, shoo, shoo! Come back when you have yer card.")
-    elif game._string_in_text("fall asleep", result):
-        game.inventory.remove_item("tea for lions", game.inventory.inventory_items)
-        game.inventory.add_item("laptop charger", game._items, game.player_state[2])
-
-def handle_npc_interaction(game, command: str, result: str) -> None:
-    """Handles NPC interactions."""
-    if game._string_in_text("overhear", result):
-        if game.inventory.has_item("USB stick"):
-            print("They mention someone left their laptop charger at Bahen.")
-        else:
-            print("They mention someone stole a USB stick at Robarts.")
-
-def handle_dialogue(game, result: str, choice: Optional[str] = None) -> None:
-    """Handles player yes/no choices."""
+@timed()
+async def handle_dialogue(game, effects: tuple[Effect, ...], choice: Optional[str] = None) -> None:
+    """Handles player yes/no choices, carrying out the given effects if the player says yes."""
     if choice is None:
-        choice = input("\nEnter response: ").lower().strip()
+        choice = (await game.io.input("\nEnter response: ")).lower().strip()
 
     dialogue_event = Event(game.get_location().location_id, game)
     dialogue_event.description = choice
@@ -55,66 +80,12 @@ def handle_dialogue(game, result: str, choice: Optional[str] = None) -> None:
 
     if choice == "yes":
         game.event_log.add_event(dialogue_event, choice)
-        if game._string_in_text("$20", result):
-            print("You steal the $20 bill. You feel guilty.")
-            game.inventory.add_money(20)
-        elif game._string_in_text("powder", result):
-            print("\nYou bought the sugar for $5.")
-            game.inventory.add_item("sugar", game._items, game.player_state[2])
-            print(f"Remaining money in wallet: ${game.inventory.get_money()}\n")
-        elif game._string_in_text("test", result):
-            print("You help them review for their test.")
-            print("They say: Hey, thanks for helping me out. Here's a cool sword I found!")
-            game.inventory.add_item("sword", game._items, game.player_state[2])
-        elif game._string_in_text("USB", result):
-            print("You say: Hey, is that my USB?")
-            # sleep(1)
-            print("USB Guy: Maybe. If you want it back, you have to fight me for it!")
-            # sleep(1)
-            usb_guy = Enemy("USB Guy", 5, 0.5)
-            game.combat_system.start_combat(usb_guy)
+        await run_effects(game, effects)
     else:
-        print("You walk away.")
+        game.io.print("You walk away.")
         game.event_log.add_event(dialogue_event, choice)
     update_game_state(game, dialogue_ongoing=False)
 
-def handle_menu_order(game, command: str, result: str) -> None:
-    """Handles ordering from the Starbucks in Robarts. Use reponse instead if it's provided."""
-    if game._string_in_text("the menu", result):
-        menu = {
-            "order a matcha latte": 5,
-            "order a brown sugar espresso": 7,
-            "order tea for lions": 3
-        }
-
-        for order in menu.keys():
-            game.get_location().available_commands[order] = f"You {order} from the menu."
-
-        if command in menu:
-            name = command
-            price = menu[command]
-    
-            if game.inventory.remove_money(price):  # check if wallet has enough money
-                print(f"\nYou {name} for ${price}.")
-                print(f"Remaining money in wallet: ${game.inventory.get_money()}\n")
-                game.inventory.add_item("tea for lions", game._items, game.player_state[2])
-            else:
-                print("\nYou don't have enough money to buy that!\n")
-        return  # exit so we don't add the items to the inventory
-    
-def handle_location_event(game, location_id: int) -> None:
-    """Handles events at specific locations."""
-    if game.game_state[1] == 2:
-        if game.inventory.has_item("USB stick"):
-            game.get_location().available_commands["go south"] = 7
-
-    elif game.game_state[1] == 8:
-        if game.inventory.has_item("tea for lions"):
-            game.get_location().available_commands["use tea for lions"] = "You put the cup of tea on the ground, and the lions slowly come up to drink it. They instantly fall asleep, allowing you to grab your laptop charger!"
-            if game.inventory.has_item("laptop charger"):
-                game.get_location().available_commands = []
-                game.get_location().available_commands["go north"] = 9
-
 def handle_item_pickup(game, item_name: str, item: Item) -> None:
     """Handles picking up items from events."""
     if "$" in item_name:
@@ -123,22 +94,22 @@ def handle_item_pickup(game, item_name: str, item: Item) -> None:
             amount = int(match.group(1))
             game.inventory.add_money(amount)
     else:
-        game.inventory.add_item(item, game._items, game.player_state[2])
+        game.inventory.add_item(item, game._items, game.state.score)
 
-def use_item(game) -> None:
+async def use_item(game) -> None:
     """Handles using an item."""
-    item = input("Which item in your inventory would you like to use? ").strip().lower()
+    item = (await game.io.input("Which item in your inventory would you like to use? ")).strip().lower()
 
     if not game.inventory.has_item(item):
-        print("You don't have that item.")
+        game.io.print("You don't have that item.")
         return
 
-    if item in ["candy", "uoft hoodie"]:
+    if game.inventory.get_item(item).heal > 0:
         consume_item(game, item)
-    elif item in ["book", "orange", "torch", "shield"]:
+    elif is_pedestal_item(game, item):
         place_item(game, item)
     else:
-        print("You can't use that here!")
+        game.io.print("You can't use that here!")
 
     use_event, item_event = Event(game.get_location().location_id, game), Event(game.get_location().location_id, game)
     use_event.description, item_event.description = "use", item
@@ -148,28 +119,26 @@ def use_item(game) -> None:
 
 def consume_item(game, item: str) -> None:
     """Consume an item and apply its effects."""
-    if item == "candy":
-        print("You ate the candy and got +1 hp")
-        update_player_state(game, health=game.player_state[0] + 1)
-    elif item == "uoft hoodie":
-        print("You put on the UofT hoodie and feel a surge of power. +40hp")
-        update_player_state(game, health=game.player_state[0] + 40)
+    item_obj = game.inventory.get_item(item)
+    game.io.print(item_obj.use_message or f"You use the {item_obj.get_name()} and get +{item_obj.heal} hp")
+    update_player_state(game, health=game.state.health + item_obj.heal)
     game.inventory.remove_item(item, game._items)
 
+def is_pedestal_item(game, item: str) -> bool:
+    """Return whether the given item in the inventory belongs on a pedestal: that is, whether the room it
+    should be placed in is declared in the game data to have one.
+    """
+    target = game.inventory.get_item(item).get_target_position()
+    return target in game.world.locations and game.world.locations[target].pedestal
+
 def place_item(game, item: str) -> None:
     """Handles item placing in the backrooms."""
-    print(f"You place the {item} on the pedestal.")
-
-    if game.game_state[1] == game._items[item].get_target_position():
-        print("The room lights up, it seems you've solved something.")
-        update_player_state(game, score=game.player_state[2] + 25)
-        if item == "book":
-            update_puzzle_state(game, book_correct=True)
-        elif item == "orange":
-            update_puzzle_state(game, orange_correct=True)
-        elif item == "torch":
-            update_puzzle_state(game, torch_correct=True)
-        elif item == "shield":
-            update_puzzle_state(game, shield_correct=True)
+    game.io.print(f"You place the {item} on the pedestal.")
+
+    if game.state.location_id == game._items[item].get_target_position():
+        game.io.print("The room lights up, it seems you've solved something.")
+        update_player_state(game, score=game.state.score + 25)
+        if item in PUZZLES:
+            update_puzzle_state(game, **{f"{item}_correct": True})
     else:
-        print("Something seems off... nothing happens. Maybe you should try this somewhere else.")
+        game.io.print("Something seems off... nothing happens. Maybe you should try this somewhere else.")
@@ -0,0 +1,211 @@
+from __future__ import annotations
+import json
+import os
+from collections import deque
+from typing import BinaryIO, Iterator, Optional
+
+from journal import Journal
+from proj1_event_logger import Event, EventList
+
+# The number of events between the entries of a log file's index, which lets pages of the log be read without
+# reading everything before them
+INDEX_EVERY = 256
+
+# An event as it is stored in a log file: [id_num, next_command, description, money, health, inventory]
+Record = list
+
+
+def to_record(event: Event) -> Record:
+    """Return the record of the given event."""
+    return [event.id_num, event.next_command, event.description, event.current_money, event.current_health,
+            list(event.current_inventory)]
+
+
+def _encode(event: Event) -> bytes:
+    """Return the line of a log file that records the given event."""
+    return json.dumps(to_record(event), separators=(',', ':')).encode() + b'\n'
+
+
+def _decode(line: bytes) -> Optional[Record]:
+    """Return the record on the given line of a log file, or None if the line was never finished, as happens
+    when a game crashes while writing it.
+    """
+    if not line.endswith(b'\n'):
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def to_event(record: Record) -> Event:
+    """Return the event the given record was written from."""
+    event = Event.__new__(Event)
+    event.id_num, event.next_command, event.description, event.current_money, event.current_health, inventory \
+        = record
+    event.current_inventory = tuple(inventory)
+    event.next = event.prev = None
+    return event
+
+
+def read_records(filename: str, offset: int = 0) -> Iterator[Record]:
+    """Yield the record of each event in the given log file in order, starting from the record at the given
+    offset, reading one line at a time. Reading stops at a line that was never finished.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            record = _decode(line)
+            if record is None:
+                return
+            yield record
+
+
+def read_id_log(filename: str) -> list[int]:
+    """Return the location IDs of every event in the given log file, in sequence, like EventList.get_id_log."""
+    return [record[0] for record in read_records(filename)]
+
+
+class StreamingEventList(EventList):
+    """A list of game events that is written to an append-only log file as it grows, and only keeps its most
+    recent events in memory.
+
+    The log file has a line of JSON for each event (see Record), which is flushed as soon as the event is added,
+    so a game that crashes loses nothing it has logged; and if the list is durable, each line is also synced to
+    disk. Removing the last event truncates it from the file, so the file always holds exactly the events in the
+    list. Events that are no longer in memory are read back from the file if they need to be removed.
+
+    Instance Attributes:
+        - filename: the log file
+        - window: the most events kept in memory
+        - durable: whether every event is synced to disk as soon as it is added
+
+    Representation Invariants:
+        - self.window >= 1
+    """
+    # Private Instance Attributes:
+    #   - _file: the log file, open for writing
+    #   - _size: the length of the log file in bytes
+    #   - _count: the number of events in the list, including the ones that are no longer in memory
+    #   - _offsets: where the record of each event in memory starts in the log file, oldest first
+    #   - _index: where the record of every INDEX_EVERY-th event starts in the log file
+    filename: str
+    window: int
+    durable: bool
+    _file: BinaryIO
+    _size: int
+    _count: int
+    _offsets: deque[int]
+    _index: list[int]
+
+    def __init__(self, filename: str, journal: Optional[Journal] = None, window: int = 1000,
+                 durable: bool = False) -> None:
+        """Initialize a new empty event list, logged to the given file, replacing anything already in it."""
+        super().__init__(journal)
+        self.filename = filename
+        self.window = window
+        self.durable = durable
+        self._file = open(filename, 'wb')
+        self._size = 0
+        self._count = 0
+        self._offsets = deque()
+        self._index = []
+
+    def is_empty(self) -> bool:
+        """Return whether this event list is empty."""
+        return self._count == 0
+
+    def add_event(self, event: Event, command: Optional[str] = None) -> None:
+        """Add the given new event to the end of this event list, and log it.
+        The given command is the command which was used to reach this new event, or None if this is the first
+        event in the game.
+        """
+        super().add_event(event, command)
+
+        if self._count % INDEX_EVERY == 0:
+            self._index.append(self._size)
+        self._offsets.append(self._size)
+        self._write(_encode(event))
+        self._count += 1
+
+        if len(self._offsets) > self.window:
+            self._offsets.popleft()
+            oldest, self.first = self.first, self.first.next
+            oldest.next = self.first.prev = None
+
+    def remove_last_event(self) -> None:
+        """Remove the last event from this event list, and from its log file.
+        If the list is empty, do nothing."""
+        if self.is_empty():
+            return
+        if self.last is None:
+            offset = self._last_offset()
+            with open(self.filename, 'rb') as f:
+                f.seek(offset)
+                self.first = self.last = to_event(_decode(f.readline()))
+            self._offsets.append(offset)
+
+        super().remove_last_event()
+
+        self._size = self._offsets.pop()
+        self._count -= 1
+        while self._index and self._index[-1] >= self._size:
+            self._index.pop()
+        self._file.seek(self._size)
+        self._file.truncate()
+        self._sync()
+
+    def entries(self, start: int = 0) -> Iterator[tuple[int, Optional[str]]]:
+        """Yield the location id and command of each event in this list in chronological order, starting from the
+        event at the given index. Events are read from the log file a line at a time, starting from the nearest
+        entry in its index.
+        """
+        if start >= self._count:
+            return
+        checkpoint = start // INDEX_EVERY
+        skip = start - checkpoint * INDEX_EVERY
+        for i, record in enumerate(read_records(self.filename, self._index[checkpoint])):
+            if i >= skip:
+                yield record[0], record[1]
+
+    def get_id_log(self) -> list[int]:
+        """Return a list of all location IDs visited for each event in this list, in sequence, read from the
+        log file.
+        """
+        return read_id_log(self.filename)
+
+    def close(self) -> None:
+        """Sync the log file to disk and close it. No more events can be added or removed."""
+        if not self._file.closed:
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def _write(self, line: bytes) -> None:
+        """Append the given line to the log file, and flush it."""
+        self._file.write(line)
+        self._size += len(line)
+        self._sync()
+
+    def _sync(self) -> None:
+        """Flush the log file, and sync it to disk if this list is durable."""
+        self._file.flush()
+        if self.durable:
+            os.fsync(self._file.fileno())
+
+    def _last_offset(self) -> int:
+        """Return where the record of the last event starts in the log file, by reading it backwards from the
+        end until the line before it.
+
+        Preconditions:
+        - not self.is_empty()
+        """
+        with open(self.filename, 'rb') as f:
+            end = self._size - 1  # the newline that ends the last record
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline != -1:
+                    return start + newline + 1
+                end = start
+        return 0
@@ -0,0 +1,497 @@
+from __future__ import annotations
+import argparse
+import os
+import random
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing import Pool
+from typing import Hashable, Optional
+
+from adventure import AdventureGame, MENU, MOVE_LIMIT
+from conditions import changed_fields
+from game_io import GameIO, NullSink, RenderBuffer, run_sync
+from game_state import GameState
+from journal import Checkpoint
+
+_PACKAGE = os.path.dirname(os.path.abspath(__file__))
+
+# Lines that are never valid anywhere, to check that bad input is handled
+GARBAGE = ["", "asdf", "go", "use use", "undo -1", "yes please", "ATTACK", "sword "]
+
+# The most input a session may read before it counts as stuck
+MAX_INPUTS = 2000
+
+# The most turns of random input a session plays after the lines it carries on from
+EXTEND_TURNS = 8
+
+# How often a session plays random input until the game ends instead, so long games are still explored
+PLAY_TO_END = 0.05
+
+
+class InvariantViolation(AssertionError):
+    """Raised when a game's state breaks one of AdventureGame's representation invariants, or the session stops
+    making progress.
+
+    Instance Attributes:
+        - kind: which invariant was broken, the same however it was broken
+    """
+    kind: str
+
+    def __init__(self, kind: str, detail: str) -> None:
+        super().__init__(f"{kind}: {detail}")
+        self.kind = kind
+
+
+def check_invariants(game: AdventureGame) -> None:
+    """Raise InvariantViolation if the given game, between turns, is in a state it should never be in."""
+    InvariantChecker(game).check()
+
+
+class InvariantChecker:
+    """Checks one game's invariants between turns, the way check_invariants does, but only looks again at the
+    parts of the game that changed since the last check: the inventory, the commands at the current location, and
+    the conditions that read the parts of the state that changed.
+    """
+    # Private Instance Attributes:
+    #   - _game: the game being checked
+    #   - _item_names: the lowercased name of each item in the world, by item_id
+    #   - _state: a copy of the game's state as of the last check, or None before the first check
+    #   - _inventory: the inventory's snapshot as of the last check, or None before the first check
+    #   - _location_id: the location the player was at as of the last check
+    #   - _commands: the fingerprint of that location's commands as of the last check
+    _game: AdventureGame
+    _item_names: list[str]
+    _state: Optional[GameState]
+    _inventory: Optional[tuple[str, ...]]
+    _location_id: Optional[int]
+    _commands: object
+
+    def __init__(self, game: AdventureGame) -> None:
+        self._game = game
+        self._item_names = [''] * len(game.world.items)
+        for item in game.world.items.values():
+            self._item_names[item.item_id] = item.name.lower()
+        self._state = self._inventory = self._location_id = self._commands = None
+
+    def check(self) -> None:
+        """Raise InvariantViolation if the game, between turns, is in a state it should never be in."""
+        game = self._game
+        state = game.state
+        moves, location_id, dialogue_ongoing, health, score = (state.moves, state.location_id,
+                                                               state.dialogue_ongoing, state.health, state.score)
+        if location_id not in game.world.locations:
+            raise InvariantViolation("unknown location", f"the player is at location {location_id}")
+        if not 0 <= moves <= MOVE_LIMIT:
+            raise InvariantViolation("moves out of range", f"{moves} moves have been taken")
+        if dialogue_ongoing:
+            raise InvariantViolation("dialogue between turns", "dialogue is still going on between turns")
+        if health < 0:
+            raise InvariantViolation("negative health", f"the player's health is {health}")
+        if score < 0:
+            raise InvariantViolation("negative score", f"the player's score is {score}")
+        if game.inventory.get_money() < 0:
+            raise InvariantViolation("negative money", f"the player has ${game.inventory.get_money()}")
+
+        inventory = game.inventory.snapshot()
+        if inventory is not self._inventory:
+            for name in inventory:
+                if name not in game.world.items:
+                    raise InvariantViolation("unknown item", f"the inventory holds {name!r}")
+            if state.items != sum(1 << item.item_id for item in game.inventory.inventory_items):
+                raise InvariantViolation("stale item bits", "the state's items are out of step with the inventory")
+            self._inventory = inventory
+
+        commands = game.get_location().available_commands
+        fingerprint = commands.fingerprint()
+        if location_id != self._location_id or fingerprint is not self._commands:
+            for command, result in commands.items():
+                if isinstance(result, int) and result not in game.world.locations:
+                    raise InvariantViolation("dangling command", f"{command!r} at location {location_id} leads to "
+                                                                 f"location {result}")
+            self._location_id, self._commands = location_id, fingerprint
+
+        fields = None if self._state is None else changed_fields(self._state, state, self._item_names)
+        stale = game.conditions.stale(fields)
+        if stale:
+            raise InvariantViolation("stale condition",
+                                     f"{len(stale)} condition(s) out of date with the game's state")
+        self._state = state.copy()
+
+
+class FuzzIO(GameIO):
+    """Plays sessions of a game for the fuzzer, one after another: input is read from a list of lines and then,
+    once those run out, chosen at random from the commands and answers that make sense at each prompt, with some
+    invalid ones mixed in.
+
+    The game's invariants are checked before each turn, and everything the session reaches is recorded as
+    coverage.
+
+    Instance Attributes:
+        - game: the game being played, which must be set with start before it asks for input
+        - invariants: checks the game's invariants before each turn, once the game is set
+        - lines: every line of input read so far in this session
+        - checkpoints: (the number of lines read, the game's journal checkpoint) at the start of each turn of this
+            session so far
+        - coverage: the features of the game reached so far in this session
+    """
+    # Private Instance Attributes:
+    #   - _queued: the lines to read before choosing at random
+    #   - _rng: where random choices come from, or None if this session may only read the queued lines
+    #   - _turns_left: the most turns left to choose at random
+    #   - _turn: (location id, command, whether the command led to combat) for the turn being played, if any
+    game: Optional[AdventureGame]
+    invariants: Optional[InvariantChecker]
+    lines: list[str]
+    checkpoints: list[tuple[int, Checkpoint]]
+    coverage: set[Hashable]
+    _queued: deque[str]
+    _rng: Optional[random.Random]
+    _turns_left: int
+    _turn: Optional[list]
+
+    def __init__(self) -> None:
+        self.game = self.invariants = None
+        self.render = RenderBuffer(NullSink())
+        self.reset([], [], None)
+
+    def start(self, game: AdventureGame) -> None:
+        """Play the given game, which hasn't asked for input yet."""
+        self.game = game
+        self.invariants = InvariantChecker(game)
+
+    def reset(self, read: list[str], queued: list[str], rng: Optional[random.Random], turns: int = 0,
+              checkpoints: Optional[list[tuple[int, Checkpoint]]] = None) -> None:
+        """Start a new session, which has already read the given lines and taken the given checkpoints, and reads
+        the queued lines and then, if rng is given, up to the given number of turns of random input.
+        """
+        self.lines = list(read)
+        self.checkpoints = list(checkpoints or [])
+        self.coverage = set()
+        self._queued = deque(queued)
+        self._rng = rng
+        self._turns_left = turns
+        self._turn = None
+
+    async def input(self, prompt: str = '') -> str:
+        if len(self.lines) >= MAX_INPUTS:
+            raise InvariantViolation("stuck", f"the session read {MAX_INPUTS} lines without ending")
+
+        if "action" in prompt:
+            self.end_turn()
+            self.invariants.check()
+            if not self._queued:
+                if self._turns_left == 0:
+                    raise EOFError("no more turns to play")
+                self._turns_left -= 1
+            self.checkpoints.append((len(self.lines), self.game.journal.checkpoint()))
+            line = self._next(self._commands)
+            self._start_turn(line)
+        elif "response" in prompt:
+            line = self._next(lambda: ["yes", "no"])
+            self.coverage.add(("dialogue", self.game.state.location_id, line == "yes"))
+        elif "attack" in prompt:
+            line = self._next(lambda: ["attack"] * 8)
+            self._turn[2] = True
+        else:
+            line = self._next(lambda: [*self.game.inventory.snapshot(), *self.game.world.items])
+            self.coverage.add(("use", line.lower() if self.game.inventory.has_item(line) else None))
+
+        self.lines.append(line)
+        return line
+
+    async def sleep(self, seconds: float) -> None:
+        pass
+
+    def _next(self, choices) -> str:
+        """Return the next queued line, or if there isn't one, a random choice from the given choices or,
+        sometimes, garbage. Raise EOFError if there are no more queued lines and no random choices may be made.
+        """
+        if self._queued:
+            return self._queued.popleft()
+        if self._rng is None:
+            raise EOFError("no more input to replay")
+        if self._rng.random() < 0.05:
+            return self._rng.choice(GARBAGE)
+        return self._rng.choice(choices())
+
+    def _commands(self) -> list[str]:
+        """Return the commands to choose the next turn from: the location's commands, given more weight, and the
+        menu commands, with counts for undo and redo.
+        """
+        commands = list(self.game.get_location().available_commands) * 6
+        return commands + [command for command in MENU if command != "quit"] + ["undo 3", "redo 2", "quit"]
+
+    def _start_turn(self, command: str) -> None:
+        """Record the coverage of starting a turn with the given command."""
+        location = self.game.get_location()
+        result = location.available_commands.get(command)
+        self._turn = [location.location_id, command, False]
+        if command.split(" ")[0] in MENU:
+            self.coverage.add(("menu", command.split(" ")[0]))
+        elif isinstance(result, str):
+            self.coverage.add(("command", location.location_id, command))
+
+    def end_turn(self) -> None:
+        """Record the coverage of the turn that has just been played, if there was one."""
+        if self._turn is None:
+            return
+        location_id, command, fought = self._turn
+        game = self.game
+        self.coverage.add(("location", game.state.location_id))
+        self.coverage.update(("item", game.state.location_id, name) for name in game.inventory.snapshot())
+        self.coverage.update(("puzzle", i) for i, solved in enumerate(game.state.puzzles()) if solved)
+        if fought:
+            self.coverage.add(("combat", location_id, command, "won" if game.state.health > 0 else "knocked out"))
+        self._turn = None
+
+
+@dataclass
+class Crash:
+    """A way to crash the game, or break its invariants.
+
+    Instance Attributes:
+        - signature: the exception's type and where in the game it was raised, which identifies the bug
+        - error: the exception's message
+        - lines: the shortest input found that causes it, one line per command or answer
+    """
+    signature: str
+    error: str
+    lines: list[str]
+
+
+def crash_signature(error: BaseException) -> str:
+    """Return the type of the given exception and the last line of the game's own code it was raised through,
+    or for invariant violations, which invariant was broken.
+    """
+    if isinstance(error, InvariantViolation):
+        return f"InvariantViolation: {error.kind}"
+    frames = [frame for frame in traceback.extract_tb(error.__traceback__)
+              if frame.filename.startswith(_PACKAGE) and not frame.filename.endswith("fuzzer.py")]
+    where = f"{os.path.basename(frames[-1].filename)}:{frames[-1].lineno}" if frames else "?"
+    return f"{type(error).__name__} at {where}"
+
+
+class Fuzzer:
+    """Plays many random sessions of a game, preferring to build on sessions that reached something new, and
+    collects every distinct way to crash it.
+
+    Every session is played in the same game, which its journal puts back to the start, or to the start of the turn
+    of an earlier session the new session carries on from, so the turns already played are never played again. A
+    session that crashes the game may have left it in any state, so the next session starts a new game instead.
+
+    Instance Attributes:
+        - game_data_file: the game data file the sessions are played in
+        - initial_location_id: the location every session starts at
+        - coverage: every feature reached by any session so far
+        - corpus: the input of every session that reached a new feature, oldest first
+        - crashes: every distinct crash found so far, by signature
+        - sessions: the number of sessions played so far
+    """
+    # Private Instance Attributes:
+    #   - _rng: where the fuzzer's random choices come from
+    #   - _game: the game sessions are played in, or None if a new one must be started
+    #   - _checkpoints: for the index in the corpus of each session played in _game, its checkpoints (see FuzzIO)
+    game_data_file: str
+    initial_location_id: int
+    coverage: set[Hashable]
+    corpus: list[list[str]]
+    crashes: dict[str, Crash]
+    sessions: int
+    _rng: random.Random
+    _game: Optional[AdventureGame]
+    _checkpoints: dict[int, list[tuple[int, Checkpoint]]]
+
+    def __init__(self, game_data_file: str, initial_location_id: int = 1, seed: Optional[int] = None) -> None:
+        self.game_data_file = game_data_file
+        self.initial_location_id = initial_location_id
+        self.coverage = set()
+        self.corpus = []
+        self.crashes = {}
+        self.sessions = 0
+        self._rng = random.Random(seed)
+        self._game = None
+        self._checkpoints = {}
+
+    def __getstate__(self) -> dict:
+        """Return what is sent of this fuzzer to another process: everything but the game it plays sessions in."""
+        return {**self.__dict__, '_game': None, '_checkpoints': {}}
+
+    def play(self, lines: list[str], extend: bool = True,
+             checkpoints: Optional[list[tuple[int, Checkpoint]]] = None) -> tuple[FuzzIO, Optional[BaseException]]:
+        """Play a session that reads the given lines and then, if extend is True, up to EXTEND_TURNS turns of
+        random input, or with probability PLAY_TO_END as many as it takes, stopping early if the game ends. Return
+        its IO and the exception that crashed it, if any.
+
+        If checkpoints are given, they are the checkpoints taken up to the start of a turn by an earlier session in
+        this fuzzer's game, which had read the given lines by then, and the session carries on from the last one.
+        """
+        if self._game is None:
+            self._game = AdventureGame(self.game_data_file, self.initial_location_id, FuzzIO())
+            self._game.io.start(self._game)
+        game, io = self._game, self._game.io
+        turns = 0
+        if extend:
+            turns = MAX_INPUTS if self._rng.random() < PLAY_TO_END else self._rng.randint(1, EXTEND_TURNS)
+        rng = self._rng if extend else None
+        if checkpoints:
+            game.journal.rewind(checkpoints[-1][1])
+            io.reset(lines, [], rng, turns, checkpoints[:-1])
+        else:
+            game.journal.rewind()
+            io.reset([], lines, rng, turns)
+
+        error = None
+        try:
+            io.coverage.add(("outcome", run_sync(game.play_turns())))
+            io.end_turn()
+            io.invariants.check()
+        except EOFError:
+            pass
+        except Exception as e:  # finding these is the point
+            error = e
+        if game.journal.is_recording():  # the session ended part of the way through a turn
+            game.journal.abort_turn()
+        if error is not None:
+            self._game = None
+            self._checkpoints.clear()
+        self.sessions += 1
+        return io, error
+
+    def step(self) -> None:
+        """Play one session, which carries on from the start of a random turn of an interesting earlier session, or
+        starts from scratch, and keep it if it reached something new or crashed in a new way.
+        """
+        lines, checkpoints = [], None
+        if self.corpus and self._rng.random() < 0.8:
+            i = self._rng.randrange(len(self.corpus))
+            if i in self._checkpoints:
+                checkpoints = self._checkpoints[i][:self._rng.randint(1, len(self._checkpoints[i]))]
+                lines = self.corpus[i][:checkpoints[-1][0]]
+            else:  # it was played in a game that has since crashed, so it must be played again
+                lines = self.corpus[i][:self._rng.randint(0, len(self.corpus[i]))]
+
+        io, error = self.play(lines, checkpoints=checkpoints)
+        if not io.coverage <= self.coverage:
+            self.coverage |= io.coverage
+            if error is None and io.checkpoints:
+                self._checkpoints[len(self.corpus)] = io.checkpoints
+            self.corpus.append(io.lines)
+
+        if error is not None:
+            signature = crash_signature(error)
+            if signature not in self.crashes:
+                lines = self.minimize(io.lines, signature)
+                self.crashes[signature] = Crash(signature, f"{type(error).__name__}: {error}", lines)
+
+    def _crashes_with(self, lines: list[str], signature: str) -> bool:
+        """Return whether replaying exactly the given lines crashes the game with the given signature."""
+        _, error = self.play(lines, extend=False)
+        return error is not None and crash_signature(error) == signature
+
+    def minimize(self, lines: list[str], signature: str) -> list[str]:
+        """Return the shortest input found, by removing ever smaller runs of lines from the given input, that
+        still crashes the game with the given signature.
+        """
+        size = max(1, len(lines) // 2)
+        while size >= 1:
+            start = 0
+            while start < len(lines):
+                candidate = lines[:start] + lines[start + size:]
+                if candidate != lines and self._crashes_with(candidate, signature):
+                    lines = candidate
+                else:
+                    start += size
+            size //= 2
+        return lines
+
+    def fuzz(self, sessions: Optional[int] = None, seconds: Optional[float] = None) -> None:
+        """Play sessions until the given number have been played or the given number of seconds have passed,
+        whichever comes first.
+        """
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        played = 0
+        while (sessions is None or played < sessions) and (deadline is None or time.perf_counter() < deadline):
+            self.step()
+            played += 1
+
+    def merge(self, other: Fuzzer) -> None:
+        """Add everything another fuzzer of the same game found to this one, keeping the shorter input for
+        crashes both found.
+        """
+        self.coverage |= other.coverage
+        self.corpus.extend(other.corpus)
+        self.sessions += other.sessions
+        for signature, crash in other.crashes.items():
+            if signature not in self.crashes or len(crash.lines) < len(self.crashes[signature].lines):
+                self.crashes[signature] = crash
+
+    def save_crashes(self, directory: str) -> list[str]:
+        """Write the input of each crash to its own script file in the given directory, which
+        proj1_batch_simulation can replay, and return their paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for i, crash in enumerate(sorted(self.crashes.values(), key=lambda c: c.signature)):
+            path = os.path.join(directory, f"crash_{i}.txt")
+            with open(path, 'w') as f:
+                f.write(f"# {crash.signature}\n# {crash.error}\n")
+                f.writelines(f"{line}\n" for line in crash.lines)
+            paths.append(path)
+        return paths
+
+
+def _fuzz_worker(job: tuple[str, int, Optional[int], Optional[int], Optional[float]]) -> Fuzzer:
+    """Fuzz in a worker process, and return the worker's fuzzer."""
+    game_data_file, initial_location_id, seed, sessions, seconds = job
+    fuzzer = Fuzzer(game_data_file, initial_location_id, seed)
+    fuzzer.fuzz(sessions, seconds)
+    return fuzzer
+
+
+def fuzz_parallel(game_data_file: str, initial_location_id: int = 1, processes: int = 1,
+                  sessions: Optional[int] = None, seconds: Optional[float] = None,
+                  seed: Optional[int] = None) -> Fuzzer:
+    """Fuzz with independent fuzzers in the given number of worker processes, each playing up to the given
+    number of sessions for up to the given number of seconds, and return a fuzzer with everything they found.
+    """
+    seeds = [None if seed is None else seed + i for i in range(processes)]
+    jobs = [(game_data_file, initial_location_id, worker_seed, sessions, seconds) for worker_seed in seeds]
+    if processes == 1:
+        fuzzers = [_fuzz_worker(jobs[0])]
+    else:
+        with Pool(processes) as pool:
+            fuzzers = pool.map(_fuzz_worker, jobs)
+
+    fuzzer = fuzzers[0]
+    for other in fuzzers[1:]:
+        fuzzer.merge(other)
+    return fuzzer
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Fuzz the game from the command line."""
+    parser = argparse.ArgumentParser(description="Find crashes in the adventure game by playing it at random.")
+    parser.add_argument("--world", default="game_data.json", help="the game data file")
+    parser.add_argument("--start", type=int, default=1, help="the starting location ID")
+    parser.add_argument("--sessions", type=int, default=None, help="how many sessions each process plays")
+    parser.add_argument("--seconds", type=float, default=60.0, help="how long to fuzz for")
+    parser.add_argument("--seed", type=int, default=None, help="the random seed, to repeat a run")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--output", default="crashes", help="the directory to save crashing inputs in")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    fuzzer = fuzz_parallel(args.world, args.start, args.processes, args.sessions, args.seconds, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"Played {fuzzer.sessions} sessions in {elapsed:.1f}s ({fuzzer.sessions / elapsed:.0f}/s), "
+          f"reaching {len(fuzzer.coverage)} features with a corpus of {len(fuzzer.corpus)}")
+    for crash, path in zip(sorted(fuzzer.crashes.values(), key=lambda c: c.signature),
+                           fuzzer.save_crashes(args.output)):
+        print(f"  {crash.signature} ({len(crash.lines)} lines) -> {path}")
+
+
+if __name__ == "__main__":
+    main()
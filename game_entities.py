@@ -11,12 +11,21 @@ class Item:
         - start_position: The initial position of the item.
         - target_position: The position where the item needs to be moved.
         - target_points: The points awarded for moving the item to the target position.
+        - damage: The damage the item does when the player attacks with it, or 0 if it is not a weapon.
+        - heal: The health the player gains by using the item, or 0 if it can't be used up.
+        - damage_bonus: The extra damage every attack does while the item is in the inventory.
+        - use_message: What to print when the player uses the item up.
+        - item_id: The item's position in the game data, which is its bit in GameState.items.
 
     Representation Invariants:
         - name != ''
         - start_position >= 0
         - target_position >= 0
         - target_points >= 0
+        - damage >= 0
+        - heal >= 0
+        - damage_bonus >= 0
+        - item_id >= 0
     """
 
     name: str
@@ -24,13 +33,25 @@ class Item:
     start_position: int
     target_position: int
     target_points: int
-
-    def __init__(self, name: str, description: str, start_position: int, target_position: int, target_points: int) -> None:
+    damage: int
+    heal: int
+    damage_bonus: int
+    use_message: str
+    item_id: int
+
+    def __init__(self, name: str, description: str, start_position: int, target_position: int, target_points: int,
+                 damage: int = 0, heal: int = 0, damage_bonus: int = 0, use_message: str = '',
+                 item_id: int = 0) -> None:
         self.name = name
         self.description = description
         self.start_position = start_position
         self.target_position = target_position
         self.target_points = target_points
+        self.damage = damage
+        self.heal = heal
+        self.damage_bonus = damage_bonus
+        self.use_message = use_message
+        self.item_id = item_id
 
     def get_name(self) -> str:
         return self.name
@@ -89,6 +110,7 @@ class Location:
         - long_description: A detailed description of the location.
         - available_commands: A list of commands that can be used at this location.
         - items: A list of items available at this location.
+        - pedestal: Whether this location has a pedestal, which items can be placed on.
         - visited: Whether this location has been visited before.
 
     Representation Invariants:
@@ -105,11 +127,12 @@ class Location:
     long_description: str 
     available_commands: list[str]
     items: list[Item]
+    pedestal: bool
     visited: bool
 
 
     def __init__(self, location_id, name, brief_description, long_description, available_commands, items,
-                 visited=False) -> None:
+                 pedestal=False, visited=False) -> None:
         """Initialize a new location.
 
         # TODO Add more details here about the initialization if needed
@@ -121,6 +144,7 @@ class Location:
         self.long_description = long_description
         self.available_commands = available_commands
         self.items = items
+        self.pedestal = pedestal
         self.visited = visited
 
 
@@ -132,6 +156,7 @@ class Enemy:
         - name: The name of the penemylayer.
         - health: The health points of the enemy.
         - damage: the damage the enemy does
+        - reward: the name of the item the player gets for defeating the enemy, if any
 
     Representation Invariants:
         - name != ''
@@ -140,11 +165,13 @@ class Enemy:
     name: str
     health: int
     damage: int
+    reward: Optional[str]
 
-    def __init__(self, name: str, health: int, attack: int):
+    def __init__(self, name: str, health: int, attack: int, reward: Optional[str] = None):
         self.name = name
         self.health = health
         self.attack = attack
+        self.reward = reward
     
     def is_alive(self) -> bool:
         return self.health > 0
@@ -0,0 +1,215 @@
+from __future__ import annotations
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Coroutine, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class OutputSink(ABC):
+    """Where a session's output ends up once it is rendered, such as a terminal or a connection."""
+
+    @abstractmethod
+    def write(self, text: str) -> None:
+        """Write the given output, all at once."""
+
+
+class TerminalSink(OutputSink):
+    """Writes output to stdout, flushing it after every write."""
+
+    def write(self, text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class CaptureSink(OutputSink):
+    """Keeps output in a list, for tests and tools that look at what the game showed.
+
+    Instance Attributes:
+        - output: every piece of output written, in order
+    """
+    output: list[str]
+
+    def __init__(self) -> None:
+        self.output = []
+
+    def write(self, text: str) -> None:
+        self.output.append(text)
+
+    def getvalue(self) -> str:
+        """Return all the output written as one string."""
+        return ''.join(self.output)
+
+
+class NullSink(OutputSink):
+    """Throws output away, for simulations that only care about what the game does."""
+
+    def write(self, text: str) -> None:
+        pass
+
+
+class RenderBuffer:
+    """Holds a session's output until it is flushed, so that it reaches its sink in one write per turn instead
+    of one write per line.
+
+    Instance Attributes:
+        - sink: where the output goes when it is flushed
+        - discards: whether the sink throws output away, in which case no output is held
+    """
+    # Private Instance Attributes:
+    #   - _parts: the output since the last flush, in order
+    sink: OutputSink
+    discards: bool
+    _parts: list[str]
+
+    def __init__(self, sink: OutputSink) -> None:
+        self.sink = sink
+        self.discards = isinstance(sink, NullSink)
+        self._parts = []
+
+    def write(self, text: str) -> None:
+        """Add the given output to the end of the buffer."""
+        if not self.discards:
+            self._parts.append(text)
+
+    def flush(self) -> None:
+        """Write the output held so far to the sink, as one piece, and empty the buffer."""
+        if self._parts:
+            text = ''.join(self._parts)
+            self._parts.clear()
+            self.sink.write(text)
+
+    def set_sink(self, sink: OutputSink) -> None:
+        """Flush the output held so far, then send all further output to the given sink."""
+        self.flush()
+        self.sink = sink
+        self.discards = isinstance(sink, NullSink)
+
+
+class GameIO(ABC):
+    """The input, output and clock used by the game engine.
+
+    The engine never calls print, input or sleep directly, so the same game can be played in a terminal,
+    driven by a script at machine speed, or served to remote players.
+
+    Output goes into the IO's render buffer, and only reaches its sink when the buffer is flushed: before the
+    game waits for input or pauses, and at the end of every turn.
+
+    input and sleep are coroutines, so that an IO serving a remote player can wait for them without holding up
+    the other players. An IO that never actually suspends in them can be driven with run_sync.
+
+    Instance Attributes:
+        - render: the buffer the game's output is held in until it is flushed
+    """
+    render: RenderBuffer
+
+    def print(self, *values: object, sep: str = ' ', end: str = '\n') -> None:
+        """Show the given values to the player, the same way the print builtin would, once the output is flushed."""
+        render = self.render
+        if not render.discards:
+            render.write(sep.join(str(value) for value in values) + end)
+
+    def flush(self) -> None:
+        """Send the output held in the render buffer to its sink."""
+        self.render.flush()
+
+    @abstractmethod
+    async def input(self, prompt: str = '') -> str:
+        """Show the given prompt and return the next line of player input, without its newline.
+
+        Raise EOFError if there is no more input.
+        """
+
+    @abstractmethod
+    async def sleep(self, seconds: float) -> None:
+        """Pause for the given number of seconds, for dramatic effect."""
+
+
+class TerminalIO(GameIO):
+    """Plays the game in a terminal: output is written to the given sink, or stdout if none is given, input is
+    read from stdin, and sleeps are real.
+
+    Input and sleeps block the whole process, since there is only one player.
+    """
+
+    def __init__(self, sink: Optional[OutputSink] = None) -> None:
+        self.render = RenderBuffer(sink if sink is not None else TerminalSink())
+
+    async def input(self, prompt: str = '') -> str:
+        self.render.write(prompt)
+        self.render.flush()
+        return input()
+
+    async def sleep(self, seconds: float) -> None:
+        self.render.flush()
+        time.sleep(seconds)
+
+
+class FastIO(GameIO):
+    """Plays the game at machine speed: input comes from a script, sleeps return immediately, and output is
+    captured instead of printed.
+
+    Instance Attributes:
+        - output: every piece of output flushed so far, in order (always empty if output is not captured)
+        - slept: the total number of seconds the game has asked to sleep for
+        - capture: whether output is kept in self.output or thrown away
+    """
+    # Private Instance Attributes:
+    #   - _queued: lines added with feed, which are read before the rest of the script
+    #   - _script: the rest of the lines this IO was created with
+    output: list[str]
+    slept: float
+    capture: bool
+    _queued: deque[str]
+    _script: Iterator[str]
+
+    def __init__(self, script: Iterable[str] = (), capture: bool = True) -> None:
+        """Initialize a new FastIO reading input from the given lines.
+
+        The script may be an iterator that the caller is also reading from, in which case both share its lines.
+        """
+        sink = CaptureSink() if capture else NullSink()
+        self.render = RenderBuffer(sink)
+        self.output = sink.output if capture else []
+        self.slept = 0
+        self.capture = capture
+        self._queued = deque()
+        self._script = iter(script)
+
+    def feed(self, *lines: str) -> None:
+        """Add lines of input, to be read before the rest of the script."""
+        self._queued.extend(lines)
+
+    async def input(self, prompt: str = '') -> str:
+        self.render.write(prompt)
+        self.render.flush()
+        if self._queued:
+            return self._queued.popleft()
+        line = next(self._script, None)
+        if line is None:
+            raise EOFError("no more scripted input")
+        return line
+
+    async def sleep(self, seconds: float) -> None:
+        self.slept += seconds
+
+    def getvalue(self) -> str:
+        """Return all the captured output as one string, including any output not flushed yet."""
+        self.render.flush()
+        return ''.join(self.output)
+
+
+def run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run the given coroutine to completion in this thread, without an event loop, and return its result.
+
+    This only works for game code whose IO never suspends, like TerminalIO and FastIO. Raise RuntimeError if
+    the coroutine tries to suspend.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("run_sync can't run a coroutine that suspends; use an event loop instead")
@@ -0,0 +1,225 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import os
+import time
+import traceback
+from collections import Counter
+from typing import Iterator, Optional
+
+from adventure import AdventureGame
+from game_io import GameIO, OutputSink, RenderBuffer
+from session_corpus import RecordingIO, append_session, describe_error, live_session
+
+
+class StreamSink(OutputSink):
+    """Writes output to a connection, encoded as UTF-8, without waiting for it to be sent."""
+    # Private Instance Attributes:
+    #   - _writer: the stream output is written to
+    _writer: asyncio.StreamWriter
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self._writer = writer
+
+    def write(self, text: str) -> None:
+        self._writer.write(text.encode())
+
+
+class StreamIO(GameIO):
+    """Plays the game over a connection: output is written to the client, a turn at a time, and each line the
+    client sends is one line of input.
+
+    Waiting for input or sleeping only suspends this session, so one server can play many sessions at once.
+
+    Instance Attributes:
+        - sleep_scale: how much every sleep is scaled by, so 0 skips them
+        - idle_timeout: how many seconds to wait for a line of input before giving up, or None to wait forever
+    """
+    # Private Instance Attributes:
+    #   - _reader: the stream the client's input is read from
+    #   - _writer: the stream output is written to
+    sleep_scale: float
+    idle_timeout: Optional[float]
+    _reader: asyncio.StreamReader
+    _writer: asyncio.StreamWriter
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 sleep_scale: float = 1.0, idle_timeout: Optional[float] = None) -> None:
+        self.sleep_scale = sleep_scale
+        self.idle_timeout = idle_timeout
+        self._reader = reader
+        self._writer = writer
+        self.render = RenderBuffer(StreamSink(writer))
+
+    async def input(self, prompt: str = '') -> str:
+        self.render.write(prompt)
+        self.render.flush()
+        await self._writer.drain()
+        try:
+            line = await asyncio.wait_for(self._reader.readline(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            raise EOFError("the player stopped responding") from None
+        if not line:
+            raise EOFError("the player disconnected")
+        return line.decode(errors='replace').rstrip('\r\n')
+
+    async def sleep(self, seconds: float) -> None:
+        self.render.flush()
+        await self._writer.drain()
+        if self.sleep_scale > 0:
+            await asyncio.sleep(seconds * self.sleep_scale)
+
+    async def drain(self) -> None:
+        """Send the output held so far, and wait until all of it has been sent."""
+        self.render.flush()
+        await self._writer.drain()
+
+
+class GameServer:
+    """Serves the game to many players at once, each playing their own session in the same world.
+
+    Every connection is one session: the server sends the game's output as text, and the client sends one
+    line for each line of input. The session ends, and the connection is closed, when the game ends or the
+    client disconnects.
+
+    Instance Attributes:
+        - game_data_file: the game data file every session is played in
+        - initial_location_id: the location every session starts at
+        - sleep_scale: how much the game's sleeps are scaled by, so 0 skips them
+        - idle_timeout: how many seconds a session waits for input before ending, or None to wait forever
+        - log_dir: the directory each session's event log is streamed to, or None to keep event logs in memory
+        - corpus: the corpus file every finished session is recorded in, or None if sessions aren't recorded
+        - active_sessions: the number of sessions being played right now
+        - outcomes: how many finished sessions ended each way: "win", "lose", "quit", "disconnect" or "error"
+    """
+    # Private Instance Attributes:
+    #   - _session_numbers: the number of each session, counting from 1 in the order they connected
+    #   - _corpus_lock: held while a finished session is added to the corpus, so sessions are added one at a time
+    game_data_file: str
+    initial_location_id: int
+    sleep_scale: float
+    idle_timeout: Optional[float]
+    log_dir: Optional[str]
+    corpus: Optional[str]
+    active_sessions: int
+    outcomes: Counter[str]
+    _session_numbers: Iterator[int]
+    _corpus_lock: asyncio.Lock
+
+    def __init__(self, game_data_file: str, initial_location_id: int = 1, sleep_scale: float = 1.0,
+                 idle_timeout: Optional[float] = None, log_dir: Optional[str] = None,
+                 corpus: Optional[str] = None) -> None:
+        self.game_data_file = game_data_file
+        self.initial_location_id = initial_location_id
+        self.sleep_scale = sleep_scale
+        self.idle_timeout = idle_timeout
+        self.log_dir = log_dir
+        self.corpus = corpus
+        self.active_sessions = 0
+        self.outcomes = Counter()
+        self._session_numbers = itertools.count(1)
+        self._corpus_lock = asyncio.Lock()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Play one session with the client on the other end of the given streams, then close the connection."""
+        io = StreamIO(reader, writer, self.sleep_scale, self.idle_timeout)
+        recording = RecordingIO(io)
+        self.active_sessions += 1
+        session = next(self._session_numbers)
+        log_file = None if self.log_dir is None else os.path.join(self.log_dir, f"session_{session}.jsonl")
+        outcome = "disconnect"
+        error = None
+        game = None
+        try:
+            game = AdventureGame(self.game_data_file, self.initial_location_id, recording, log_file)
+            game.on_turn = recording.record_turn
+            outcome = await game.run()
+            await io.drain()
+        except (EOFError, ConnectionError):
+            pass
+        except Exception as e:  # a crashing session must not take the other sessions down with it
+            outcome, error = "error", describe_error(e)
+            traceback.print_exc()
+        finally:
+            if game is not None:
+                game.event_log.close()
+            if self.corpus is not None and recording.inputs:
+                await self._record(session, recording, game, outcome, error)
+            self.active_sessions -= 1
+            self.outcomes[outcome] += 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _record(self, session: int, recording: RecordingIO, game: Optional[AdventureGame], outcome: str,
+                      error: Optional[str]) -> None:
+        """Add the finished session with the given number, played through the given recording IO, to the corpus.
+
+        Reading a streamed event log back and writing to the corpus are done in a worker thread, so that they
+        don't hold up the other sessions.
+        """
+        session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{session}"
+        # A session the player left is recorded the way replaying its input would end: with the input running out
+        corpus_outcome = "incomplete" if outcome == "disconnect" else outcome
+
+        def record() -> None:
+            append_session(self.corpus, live_session(session_id, recording, game, self.initial_location_id,
+                                                     corpus_outcome, error))
+
+        async with self._corpus_lock:
+            await asyncio.get_running_loop().run_in_executor(None, record)
+
+    async def start_tcp(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        """Start accepting sessions on the given TCP address, and return the listening server.
+        If port is 0, any free port is used.
+        """
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        """Start accepting sessions on a Unix socket at the given path, and return the listening server."""
+        return await asyncio.start_unix_server(self.handle_connection, path)
+
+
+async def serve(server: GameServer, host: str, port: int, unix: Optional[str] = None) -> None:
+    """Serve the game until cancelled."""
+    if unix is not None:
+        listener = await server.start_unix(unix)
+    else:
+        listener = await server.start_tcp(host, port)
+
+    for sock in listener.sockets:
+        print(f"Serving {server.game_data_file} on {sock.getsockname()}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the game server from the command line."""
+    parser = argparse.ArgumentParser(description="Serve the adventure game to many players over a line protocol.")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    parser.add_argument("--port", type=int, default=8023, help="the TCP port to listen on")
+    parser.add_argument("--unix", help="listen on a Unix socket at this path instead of TCP")
+    parser.add_argument("--world", default="game_data.json", help="the game data file")
+    parser.add_argument("--start", type=int, default=1, help="the starting location ID")
+    parser.add_argument("--fast", action="store_true", help="skip the game's pauses")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="end sessions that send no input for this many seconds")
+    parser.add_argument("--log-dir", help="stream each session's event log to a file in this directory")
+    parser.add_argument("--record", help="record every session in this corpus file (see session_corpus)")
+    args = parser.parse_args(argv)
+
+    if args.log_dir is not None:
+        os.makedirs(args.log_dir, exist_ok=True)
+    server = GameServer(args.world, args.start, 0.0 if args.fast else 1.0, args.idle_timeout, args.log_dir,
+                        args.record)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+# The puzzles a game keeps track of, in order
+PUZZLES = ("book", "orange", "torch", "shield")
+
+# The bits of GameState.flags
+ONGOING = 1
+DIALOGUE = 2
+# The bit of GameState.flags for each puzzle in PUZZLES, in order
+PUZZLE_BITS = tuple(4 << i for i in range(len(PUZZLES)))
+ALL_PUZZLES = sum(PUZZLE_BITS)
+
+
+class GameState:
+    """Everything about one game that changes from turn to turn, other than its money, event log and commands, in
+    one compact object.
+
+    The game's booleans and puzzles are bits of a single int, and the items in the inventory are bits of another,
+    by item id, so a state can be copied, hashed and compared without building anything.
+    Since states are hashable, a state must not be changed while it is used as a key; use a copy instead.
+
+    Instance Attributes:
+        - moves: the number of moves taken so far
+        - location_id: the id of the player's location
+        - health: the player's health
+        - money: the player's money, as update_player_state records it (the money they can spend is in their wallet)
+        - score: the player's score
+        - flags: ONGOING if the game is ongoing, DIALOGUE if a dialogue is going on, and the bit in PUZZLE_BITS of
+            every solved puzzle
+        - items: the bit 1 << item.item_id of every item in the inventory
+
+    Representation Invariants:
+        - self.moves >= 0
+        - self.health >= 0
+        - self.flags >= 0
+        - self.items >= 0
+    """
+    moves: int
+    location_id: int
+    health: int
+    money: int
+    score: int
+    flags: int
+    items: int
+
+    __slots__ = ('moves', 'location_id', 'health', 'money', 'score', 'flags', 'items')
+
+    def __init__(self, location_id: int, health: int = 10, money: int = 0, score: int = 0) -> None:
+        """Initialize the state of a new, ongoing game at the given location, with no moves taken, no puzzles
+        solved and nothing in the inventory.
+        """
+        self.moves = 0
+        self.location_id = location_id
+        self.health = health
+        self.money = money
+        self.score = score
+        self.flags = ONGOING
+        self.items = 0
+
+    @property
+    def ongoing(self) -> bool:
+        return bool(self.flags & ONGOING)
+
+    @property
+    def dialogue_ongoing(self) -> bool:
+        return bool(self.flags & DIALOGUE)
+
+    def is_solved(self, puzzle: int) -> bool:
+        """Return whether the puzzle at the given position in PUZZLES is solved."""
+        return bool(self.flags & PUZZLE_BITS[puzzle])
+
+    def puzzles(self) -> tuple[bool, ...]:
+        """Return whether each puzzle in PUZZLES is solved, in order."""
+        return tuple(bool(self.flags & bit) for bit in PUZZLE_BITS)
+
+    def copy(self) -> GameState:
+        """Return a copy of this state."""
+        state = GameState.__new__(GameState)
+        state.moves = self.moves
+        state.location_id = self.location_id
+        state.health = self.health
+        state.money = self.money
+        state.score = self.score
+        state.flags = self.flags
+        state.items = self.items
+        return state
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, GameState) and self.moves == other.moves \
+            and self.location_id == other.location_id and self.health == other.health \
+            and self.money == other.money and self.score == other.score and self.flags == other.flags \
+            and self.items == other.items
+
+    def __hash__(self) -> int:
+        return hash((self.moves, self.location_id, self.health, self.money, self.score, self.flags, self.items))
+
+    def __repr__(self) -> str:
+        return (f"GameState(moves={self.moves}, location_id={self.location_id}, health={self.health}, "
+                f"money={self.money}, score={self.score}, flags={self.flags:#b}, items={self.items:#x})")
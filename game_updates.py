@@ -1,85 +1,103 @@
 from typing import Optional
-from time import sleep
 
 from proj1_event_logger import EventList
+from instrumentation import timed
+from game_state import DIALOGUE, ONGOING, PUZZLE_BITS
 
 
 def display_time(game) -> None:
     """Displays current in-game time."""
-    print(f"3:{game.game_state[0]:02}PM")
+    game.io.print(f"3:{game.state.moves:02}PM")
 
 def display_location(game) -> None:
     """Displays location information only when location changes."""
     location = game.get_location()
 
     description = location.brief_description if location.visited else location.long_description
-    print(f"LOCATION: {location.name}\n====================")
-    print(description)
+    game.io.print(f"LOCATION: {location.name}\n====================")
+    game.io.print(description)
 
 def update_player_state(
     game, health: Optional[int] = None, money: Optional[int] = None,
     score: Optional[int] = None
 ) -> None:
     """Update player stats."""
-    current_health, current_money, current_score = game.player_state
-    game.player_state = (
-        health if health is not None else current_health,
-        money if money is not None else current_money,
-        score if score is not None else current_score
-    )
+    for name, value in (('health', health), ('money', money), ('score', score)):
+        if value is not None:
+            set_state(game, name, value)
 
 def update_game_state(
     game, moves: Optional[int] = None, location_id: Optional[int] = None,
     ongoing: Optional[bool] = None, dialogue_ongoing: Optional[bool] = None
 ) -> None:
     """Update game state while keeping other values unchanged."""
-    current_moves, current_location, current_ongoing, current_dialogue_ongoing = game.game_state
-    game.game_state = (
-        moves if moves is not None else current_moves,
-        location_id if location_id is not None else current_location,
-        ongoing if ongoing is not None else current_ongoing,
-        dialogue_ongoing if dialogue_ongoing is not None else current_dialogue_ongoing
-    )
+    if moves is not None:
+        set_state(game, 'moves', moves)
+    if location_id is not None:
+        set_state(game, 'location_id', location_id)
+    if ongoing is not None or dialogue_ongoing is not None:
+        set_state(game, 'flags', _with_bits(game.state.flags, ((ONGOING, ongoing), (DIALOGUE, dialogue_ongoing))))
 
 def update_puzzle_state(
     game, book_correct: Optional[bool] = None, orange_correct: Optional[bool] = None,
     torch_correct: Optional[bool] = None, shield_correct: Optional[bool] = None
 ) -> None:
     """Update puzzle state while keeping other values unchanged."""
-    current_book, current_orange, current_torch, current_shield = game.puzzle_state
-    game.puzzle_state = (
-        book_correct if book_correct is not None else current_book,
-        orange_correct if orange_correct is not None else current_orange,
-        torch_correct if torch_correct is not None else current_torch,
-        shield_correct if shield_correct is not None else current_shield
-    )
+    solved = (book_correct, orange_correct, torch_correct, shield_correct)
+    set_state(game, 'flags', _with_bits(game.state.flags, zip(PUZZLE_BITS, solved)))
 
-def check_win(game) -> bool:
-    """Check if the player has won."""
-    if game.inventory.has_item("lucky UofT mug") and game.game_state[1] not in {11, 12, 13, 14}:
-        print("Now, after you got all of your items, you can finally submit your project.")
-        game.get_location().available_commands["go back to dorm room"] = 11
+def set_state(game, name: str, value) -> None:
+    """Set the field of game.state with the given name, recording the change in game.journal and letting
+    game.conditions know about it.
+    """
+    old_value = getattr(game.state, name)
+    setattr(game.state, name, value)
+    game.journal.record(game.restore_state, name, old_value, value)
+    game.conditions.state_changed(name, old_value, value)
 
-    if all(game.puzzle_state):
-        print("\nAfter placing the final item in the pedestal, a booming voice speaks.")
-        print("\nVoice: You have proven yourself worthy. You may now submit your project.")
-        sleep(1)
-        print("\nYour laptop appears in front of you, floating in the air.")
-        print("You submit your project, and breathe a sigh of relief.")
-        sleep(5)
-        print("You have won the game!")
-        display_time(game)
-        print(f"You took {game.game_state[0]} moves to complete the game.")
-        print(f"Your final score is {game.player_state[2]} points. Great job!")
-        sleep(5)
-        return True
+def _with_bits(flags: int, changes) -> int:
+    """Return flags with each bit in the given (bit, on) pairs set if on is True or cleared if it is False, and
+    left alone if it is None.
+    """
+    for bit, on in changes:
+        if on is not None:
+            flags = flags | bit if on else flags & ~bit
+    return flags
+
+@timed()
+async def check_win(game) -> bool:
+    """Carry out the game's conditions that hold at the end of a turn, in the order they were declared, and return
+    whether the player has won. Only the conditions that hold are looked at (see ConditionWatcher).
+    """
+    for condition in game.conditions.holding():
+        if condition.message:
+            game.io.print(condition.message)
+        for command, target in condition.unlock.items():
+            game.get_location().available_commands[command] = target
+        if condition.outcome == "win":
+            await announce_win(game)
+            return True
 
     return False
 
-def print_objective() -> None:
-    print("You are in your dorm room. \n\nYour room is a mess. Clothes are scattered all around.")
-    print("There's a box in the corner, and a few loose papers on the desk. The door is to the east.\n\n")
-    print("""Your project is due at 4pm. But before you submit, you need to find 3 items:
+async def announce_win(game) -> None:
+    """Tell the player they have won."""
+    game.io.print("\nAfter placing the final item in the pedestal, a booming voice speaks.")
+    game.io.print("\nVoice: You have proven yourself worthy. You may now submit your project.")
+    await game.io.sleep(1)
+    game.io.print("\nYour laptop appears in front of you, floating in the air.")
+    game.io.print("You submit your project, and breathe a sigh of relief.")
+    await game.io.sleep(5)
+    game.io.print("You have won the game!")
+    display_time(game)
+    game.io.print(f"You took {game.state.moves} moves to complete the game.")
+    game.io.print(f"Your final score is {game.state.score} points. Great job!")
+    await game.io.sleep(5)
+
+def print_objective(game) -> None:
+    game.io.print("You are in your dorm room. \n\nYour room is a mess. Clothes are scattered all around.")
+    game.io.print("There's a box in the corner, and a few loose papers on the desk. The door is to the east.\n\n")
+    game.io.print("""Your project is due at 4pm. But before you submit, you need to find 3 items:
     1. your project USB drive
     2. your laptop charger
     3. your lucky UofT mug""")
\ No newline at end of file
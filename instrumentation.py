@@ -0,0 +1,157 @@
+from __future__ import annotations
+import atexit
+import functools
+import inspect
+import json
+import os
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Callable, Optional, TypeVar
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# The upper bounds of the latency histogram buckets, in seconds; the last bucket holds everything slower
+BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+
+
+class Timer:
+    """How often one instrumented function was called, and how long it took.
+
+    Times include the time spent in everything the function called, including waiting for the player.
+
+    Instance Attributes:
+        - calls: the number of calls that have finished
+        - total: the total time those calls took, in seconds
+        - max: the time the slowest call took, in seconds
+        - histogram: the number of calls that took up to each bound in BUCKETS, followed by the number that
+            took longer
+
+    Representation Invariants:
+        - len(self.histogram) == len(BUCKETS) + 1
+        - sum(self.histogram) == self.calls
+    """
+    calls: int
+    total: float
+    max: float
+    histogram: list[int]
+
+    __slots__ = ('calls', 'total', 'max', 'histogram')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def record(self, seconds: float) -> None:
+        """Record a call that took the given number of seconds."""
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram[bisect_left(BUCKETS, seconds)] += 1
+
+    def to_json(self) -> dict:
+        """Return this timer as a JSON-serializable dictionary."""
+        return {"calls": self.calls, "total": self.total, "max": self.max, "histogram": list(self.histogram)}
+
+
+class TimingStats:
+    """Timers for the engine's hot paths, shared by every game played in this process.
+
+    Nothing is recorded unless the stats are enabled, and instrumented functions only check a flag when they
+    are not.
+
+    Instance Attributes:
+        - enabled: whether calls to instrumented functions are being timed
+        - timers: the timer for each instrumented function that has been called while enabled, by name
+    """
+    enabled: bool
+    timers: dict[str, Timer]
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.timers = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a call to the instrumented function with the given name that took the given number of seconds."""
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = Timer()
+        timer.record(seconds)
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        self.timers.clear()
+
+    def to_json(self) -> dict:
+        """Return these stats as a JSON-serializable dictionary."""
+        return {
+            "enabled": self.enabled,
+            "buckets": list(BUCKETS),
+            "timers": {name: timer.to_json() for name, timer in self.timers.items()}
+        }
+
+    def dump(self, filename: str) -> None:
+        """Write these stats to the given JSON file."""
+        with open(filename, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def report(self) -> list[str]:
+        """Return a table of these stats, one line each, slowest in total first, with a latency histogram
+        for whole turns.
+        """
+        if not self.enabled:
+            return ["Timing stats are off. Set ADVENTURE_STATS=1 before starting the game to turn them on."]
+        if not self.timers:
+            return ["Nothing has been timed yet."]
+
+        lines = [f"{'':32}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"]
+        for name, timer in sorted(self.timers.items(), key=lambda entry: -entry[1].total):
+            lines.append(f"{name:32}{timer.calls:>8}{timer.total * 1e3:>12.3f}"
+                         f"{timer.total / timer.calls * 1e3:>10.3f}{timer.max * 1e3:>10.3f}")
+
+        if "turn" in self.timers:
+            lines.append("\nTurn latency:")
+            labels = [f"<= {bound * 1e3:g} ms" for bound in BUCKETS] + [f"> {BUCKETS[-1] * 1e3:g} ms"]
+            for label, count in zip(labels, self.timers["turn"].histogram):
+                lines.append(f"{label:>14}  {count}")
+        return lines
+
+
+STATS = TimingStats(os.environ.get("ADVENTURE_STATS", "0") not in ("", "0"))
+
+if STATS.enabled and os.environ.get("ADVENTURE_STATS_FILE"):
+    atexit.register(STATS.dump, os.environ["ADVENTURE_STATS_FILE"])
+
+
+def timed(name: Optional[str] = None) -> Callable[[F], F]:
+    """Instrument the decorated function or coroutine function, so that every call to it is timed in STATS
+    under the given name, or its qualified name if none is given.
+    """
+    def decorate(func: F) -> F:
+        label = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not STATS.enabled:
+                    return await func(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    STATS.record(label, perf_counter() - start)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not STATS.enabled:
+                    return func(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    STATS.record(label, perf_counter() - start)
+        return wrapper
+
+    return decorate
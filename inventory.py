@@ -1,66 +1,206 @@
+import heapq
+from itertools import count
+from typing import Callable, Optional, ValuesView
+
 from game_entities import Item, Wallet
+from game_io import GameIO, TerminalIO
+from journal import Journal, MISSING
 
 class Inventory:
-    """Handles inventory management."""
-    
-    def __init__(self) -> None:
-        self.inventory_items = []
+    """Handles inventory management.
+
+    Items are indexed by their lowercased name, so checking for, adding and removing an item takes constant time
+    no matter how many items the player is carrying. The best weapon is kept at the top of a heap, so finding it
+    does not scan the inventory either.
+
+    If the inventory has a journal, every change to its items and money is recorded there, and if it has an
+    on_change callback, it is called with the lowercased name of every item added or removed, and the item,
+    including by undo and redo.
+    """
+    # Private Instance Attributes:
+    #   - _index: a mapping from each lowercased item name to the item, in the order the items were added
+    #   - _points: the total target points of every item in the inventory
+    #   - _added: a mapping from each lowercased item name to when it was added, counted by _counter
+    #   - _weapons: a heap of (-damage, when added, lowercased name) for every weapon added to the inventory.
+    #       Weapons that have since been removed are only popped once they reach the top.
+    #   - _boosters: the items in the inventory with a damage bonus, by lowercased name
+    #   - _snapshot: the names of the items in the inventory as of its last change, or None if it has changed
+    #       since a snapshot was last asked for
+    #   - _unordered: whether an undone removal has put an item back out of the order the items were added in
+    _index: dict[str, Item]
+    _points: int
+    _added: dict[str, int]
+    _counter: count
+    _weapons: list[tuple[int, int, str]]
+    _boosters: dict[str, Item]
+    _snapshot: Optional[tuple[str, ...]]
+    _unordered: bool
+
+    def __init__(self, io: Optional[GameIO] = None, journal: Optional[Journal] = None,
+                 on_change: Optional[Callable[[str, Item], None]] = None) -> None:
+        self.io = io if io is not None else TerminalIO()
+        self.journal = journal if journal is not None else Journal()
+        self.on_change = on_change
+        self._index = {}
+        self._points = 0
+        self._added = {}
+        self._counter = count()
+        self._weapons = []
+        self._boosters = {}
+        self._snapshot = ()
+        self._unordered = False
         self.wallet = Wallet(money=0)
 
+    @property
+    def inventory_items(self) -> list[Item]:
+        """A new list of the items in the player's inventory, in the order they were added. Changing the list
+        doesn't change the inventory, and the list doesn't change when the inventory does.
+        """
+        self._reorder()
+        return list(self._index.values())
+
     def show_inventory(self) -> None:
         """Show the player's inventory"""
-        print(f"Money: ${self.wallet.get_money()}")
+        self.io.print(f"Money: ${self.wallet.get_money()}")
         
         inventory_items = [item for item in self.inventory_items if not isinstance(item, Wallet)]
 
         if inventory_items:
             for item in inventory_items:
-                print('   >', item.get_name(), '-', item.get_description())
+                self.io.print('   >', item.get_name(), '-', item.get_description())
         else:
-            print("Your inventory is empty :(")
+            self.io.print("Your inventory is empty :(")
 
     def get_score(self, score: int) -> int:
         """Return the updated player's score based on inventory items."""
-        for item in self.inventory_items:
-            if isinstance(item, Item):
-                score += item.get_target_points()
-        return score
-    
+        return score + self._points
+
     def has_item(self, item_name: str) -> bool:
         """Return True if the player has an item with the given name."""
-        return any(item.get_name().lower() == item_name.lower() for item in self.inventory_items)
+        return item_name.lower() in self._index
+
+    def get_item(self, item_name: str) -> Optional[Item]:
+        """Return the item in the player's inventory with the given name, or None if they don't have it."""
+        return self._index.get(item_name.lower())
+
+    def snapshot(self) -> tuple[str, ...]:
+        """Return the names of the items in the inventory, in the order they were added.
+
+        The same tuple is returned until the inventory changes, so snapshots taken between changes share memory.
+        """
+        if self._snapshot is None:
+            self._reorder()
+            self._snapshot = tuple(item.get_name() for item in self._index.values())
+        return self._snapshot
+
+    def best_weapon(self) -> Optional[Item]:
+        """Return the weapon in the inventory that does the most damage, or None if there are no weapons.
+        Of equally good weapons, the one that has been in the inventory the longest is returned.
+        """
+        while self._weapons:
+            _, added, name = self._weapons[0]
+            if self._added.get(name) == added:
+                return self._index[name]
+            heapq.heappop(self._weapons)
+        return None
+
+    def damage_boosters(self) -> ValuesView[Item]:
+        """Return the items in the inventory that add to the damage of every attack."""
+        return self._boosters.values()
 
     def add_item(self, item: str | Item, items, score: int) -> None:
         """Adds an item to the player's inventory."""
         if isinstance(item, Item):
             item = item.get_name()
         if not self.has_item(item):
-            self.inventory_items.append(items[item])
-            score += items[item].get_target_points()
-            print(f"    - Added {item} to the inventory.")
+            name = item.lower()
+            self._store(name, items[item])
+            self.journal.record(self._restore_item, name, MISSING, (self._index[name], self._added[name]))
+            self.io.print(f"    - Added {item} to the inventory.")
         else:
-            print("You already have this item!")
+            self.io.print("You already have this item!")
 
     def remove_item(self, item: str, items) -> None:
         """Removes an item from the player's inventory."""
         if isinstance(item, Item):
             item = item.get_name()
-        
-        for inv_item in self.inventory_items:
-            if inv_item.get_name().lower() == item.lower():
-                self.inventory_items.remove(inv_item)
-                print(f"   - Removed {item} from inventory.")
-                return
+
+        if self.has_item(item):
+            name = item.lower()
+            self.journal.record(self._restore_item, name, (self._index[name], self._added[name]), MISSING)
+            self._discard(name)
+            self.io.print(f"   - Removed {item} from inventory.")
+
+    def _store(self, name: str, item: Item, added: Optional[int] = None) -> None:
+        """Add the given item to the inventory under the given lowercased name, and update the totals.
+        If added is given, the item goes back to the place in the inventory it had when it was first added.
+        """
+        self._index[name] = item
+        self._snapshot = None
+        self._points += item.get_target_points()
+        if added is None:
+            self._added[name] = next(self._counter)
+        else:
+            self._added[name] = added
+            self._unordered = True
+        if item.damage > 0:
+            heapq.heappush(self._weapons, (-item.damage, self._added[name], name))
+        if item.damage_bonus > 0:
+            self._boosters[name] = item
+        if self.on_change is not None:
+            self.on_change(name, item)
+
+    def _discard(self, name: str) -> None:
+        """Remove the item with the given lowercased name from the inventory, and update the totals."""
+        item = self._index.pop(name)
+        self._snapshot = None
+        self._points -= item.get_target_points()
+        del self._added[name]
+        self._boosters.pop(name, None)
+        if self.on_change is not None:
+            self.on_change(name, item)
+
+    def _reorder(self) -> None:
+        """Put the items back in the order they were added, if an undone removal has changed it."""
+        if self._unordered:
+            self._index = dict(sorted(self._index.items(), key=lambda entry: self._added[entry[0]]))
+            self._unordered = False
+
+    def _restore_item(self, name: str, entry: object) -> None:
+        """Silently put the item with the given lowercased name back to a state recorded in the journal:
+        either an (item, when added) pair, or MISSING.
+        """
+        if self.has_item(name):
+            self._discard(name)
+        if entry is not MISSING:
+            self._store(name, *entry)
+
+    def load(self, items: list[Item], money: int) -> None:
+        """Silently replace everything in the inventory with the given items, added in order, and the money in the
+        wallet with the given amount, as when a saved game is loaded. Nothing is recorded in the journal.
+        """
+        for name in list(self._index):
+            self._discard(name)
+        self._weapons.clear()
+        for item in items:
+            self._store(item.get_name().lower(), item)
+        self.wallet.money = money
+
+    def _restore_money(self, _: None, money: int) -> None:
+        """Silently set the money in the wallet back to an amount recorded in the journal."""
+        self.wallet.money = money
 
     def get_money(self) -> int:
         return self.wallet.money
 
     def add_money(self, amount: int) -> None:
+        self.journal.record(self._restore_money, None, self.wallet.money, self.wallet.money + amount)
         self.wallet.money += amount
 
     def remove_money(self, amount: int) -> bool:
         """Remove money if possible, return True if successful, False if insufficient funds."""
         if self.wallet.money >= amount:
+            self.journal.record(self._restore_money, None, self.wallet.money, self.wallet.money - amount)
             self.wallet.money -= amount
             return True
         return False
@@ -0,0 +1,151 @@
+from __future__ import annotations
+from collections import deque
+from typing import Any, Callable, Optional
+
+MISSING = object()  # the old or new value of something that didn't exist before or after a change
+
+Restore = Callable[[Any, Any], None]
+# The changes made in each turn that can be undone, oldest first, and in each turn that can be redone, most recently
+# undone last, as of some point between turns (see Journal.checkpoint)
+Checkpoint = tuple[tuple[list[tuple[Restore, Any, Any, Any]], ...], tuple[list[tuple[Restore, Any, Any, Any]], ...]]
+
+
+class Journal:
+    """A record of every change made to a game's state, grouped into turns, so that turns can be undone and
+    redone exactly.
+
+    Each change is recorded as (restore, key, old, new), where restore(key, old) puts the state back the way it
+    was before the change, and restore(key, new) makes the change again. Restoring is silent, and never records
+    anything itself. Changes made outside a turn are not recorded, and so cannot be undone.
+
+    Instance Attributes:
+        - max_turns: the most recent turns that can be undone, or None if every turn can be. Older turns are
+            forgotten, so that a long game doesn't keep every change it ever made in memory.
+    """
+    # Private Instance Attributes:
+    #   - _current: the changes made so far in the turn being played, or None if no turn is being played
+    #   - _done: the changes made in each finished turn that can still be undone, oldest first
+    #   - _undone: the changes made in each undone turn, most recently undone last
+    #   - _restoring: whether the journal is restoring changes, so changes must not be recorded
+    max_turns: Optional[int]
+    _current: Optional[list[tuple[Restore, Any, Any, Any]]]
+    _done: deque[list[tuple[Restore, Any, Any, Any]]]
+    _undone: list[list[tuple[Restore, Any, Any, Any]]]
+    _restoring: bool
+
+    def __init__(self, max_turns: Optional[int] = None) -> None:
+        """Initialize a new journal that can undo up to max_turns turns, or every turn if max_turns is None.
+
+        Preconditions:
+        - max_turns is None or max_turns >= 1
+        """
+        self.max_turns = max_turns
+        self._current = None
+        self._done = deque(maxlen=max_turns)
+        self._undone = []
+        self._restoring = False
+
+    def begin_turn(self) -> None:
+        """Start recording the changes made in a new turn."""
+        self._current = []
+
+    def end_turn(self) -> None:
+        """Finish the turn being played. A turn that changed anything can be undone, and once it has been played,
+        the turns undone before it can no longer be redone.
+        """
+        if self._current:
+            self._done.append(self._current)
+            self._undone.clear()
+        self._current = None
+
+    def abort_turn(self) -> None:
+        """Put back everything changed so far in the turn being played, and stop playing it, as if it had never
+        started. This is for turns that couldn't be finished, such as when the game crashed part of the way through.
+        """
+        changes, self._current = self._current or [], None
+        self._restoring = True
+        try:
+            for restore, key, old, _ in reversed(changes):
+                restore(key, old)
+        finally:
+            self._restoring = False
+
+    def is_recording(self) -> bool:
+        """Return whether changes made now would be recorded."""
+        return self._current is not None and not self._restoring
+
+    def record(self, restore: Restore, key: Any, old: Any, new: Any) -> None:
+        """Record a change in the turn being played."""
+        if self.is_recording():
+            self._current.append((restore, key, old, new))
+
+    def undo(self, turns: int = 1) -> int:
+        """Undo up to the given number of turns, most recent first, and return how many were undone."""
+        undone = 0
+        self._restoring = True
+        try:
+            while undone < turns and self._done:
+                changes = self._done.pop()
+                for restore, key, old, _ in reversed(changes):
+                    restore(key, old)
+                self._undone.append(changes)
+                undone += 1
+        finally:
+            self._restoring = False
+        return undone
+
+    def redo(self, turns: int = 1) -> int:
+        """Redo up to the given number of undone turns, least recently undone first, and return how many were
+        redone.
+        """
+        redone = 0
+        self._restoring = True
+        try:
+            while redone < turns and self._undone:
+                changes = self._undone.pop()
+                for restore, key, _, new in changes:
+                    restore(key, new)
+                self._done.append(changes)
+                redone += 1
+        finally:
+            self._restoring = False
+        return redone
+
+    def can_undo(self) -> bool:
+        """Return whether there is a turn to undo."""
+        return bool(self._done)
+
+    def can_redo(self) -> bool:
+        """Return whether there is an undone turn to redo."""
+        return bool(self._undone)
+
+    def checkpoint(self) -> Checkpoint:
+        """Return the turns that can be undone and redone now, so that the game can be put back the way it is now
+        with rewind, whatever turns are played, undone and redone in the meantime.
+        """
+        return tuple(self._done), tuple(self._undone)
+
+    def rewind(self, checkpoint: Checkpoint = ((), ())) -> None:
+        """Put the game back the way it was when the given checkpoint was taken, or with no checkpoint, the way it
+        was before every turn: undo the turns since then, and make the changes of the checkpoint's turns that
+        aren't made. Afterwards, the turns that can be undone and redone are the checkpoint's.
+
+        Preconditions:
+        - self.max_turns is None
+        - no turn is being played
+        - checkpoint was returned by self.checkpoint
+        """
+        done, undone = checkpoint
+        common = 0
+        while common < min(len(done), len(self._done)) and done[common] is self._done[common]:
+            common += 1
+        self.undo(len(self._done) - common)
+        self._restoring = True
+        try:
+            for changes in done[common:]:
+                for restore, key, _, new in changes:
+                    restore(key, new)
+                self._done.append(changes)
+        finally:
+            self._restoring = False
+        self._undone = list(undone)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+_WORD_CHAR = re.compile(r'\w')
+# A token is a run of word characters, or any other single character. Keywords can only start at a token that
+# doesn't follow a word character.
+_TOKEN = re.compile(r'\w+|.', re.DOTALL)
+_WORD_START = re.compile(r'(?<!\w)(?:\w+|.)', re.DOTALL)
+# The key in a trie node that holds the keywords ending there, which can't be mistaken for a token
+_END = ''
+
+
+@lru_cache(maxsize=None)
+def word_pattern(string: str) -> re.Pattern:
+    """Return a compiled, case-insensitive pattern matching the given string as a whole word.
+
+    Preconditions:
+    - string != ''
+    """
+    return re.compile(rf'(?<!\w){re.escape(string)}(?!\w)', re.IGNORECASE)
+
+
+class KeywordMatcher:
+    """Finds every keyword that appears as a whole word in a piece of text, using a single scan.
+
+    A keyword matches the same way AdventureGame._string_in_text does: case-insensitively, and only when
+    it is not directly preceded or followed by a word character.
+
+    Keywords are kept in a trie of their tokens, so finding them takes time proportional to the length of the
+    text, however many keywords there are.
+
+    Instance Attributes:
+        - keywords: the keywords this matcher looks for, in the order they were given
+
+    Representation Invariants:
+        - all(keyword != '' for keyword in self.keywords)
+    """
+    # Private Instance Attributes:
+    #   - _trie: nested dicts mapping each token of the lowercased keywords (see _TOKEN) to the tokens that
+    #       follow it, where _END maps to the keywords that end at that point
+    #   - _rank: a mapping from each keyword to its position in self.keywords
+
+    keywords: list[str]
+    _trie: dict[str, dict]
+    _rank: dict[str, int]
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        """Build a matcher for the given keywords.
+
+        Preconditions:
+        - all(keyword != '' for keyword in keywords)
+        """
+        self.keywords = list(dict.fromkeys(keywords))
+        self._rank = {keyword: i for i, keyword in enumerate(self.keywords)}
+
+        self._trie = {}
+        for keyword in self.keywords:
+            node = self._trie
+            for token in _TOKEN.findall(keyword.lower()):
+                node = node.setdefault(token, {})
+            node.setdefault(_END, []).append(keyword)
+
+    def find_all(self, text: str) -> list[str]:
+        """Return every keyword that appears as a whole word in text, in the order the keywords were given."""
+        text = text.lower()
+        found = set()
+        for start in _WORD_START.finditer(text):
+            node = self._trie.get(start.group())
+            end = start.end()
+            while node is not None:
+                if _END in node and not _WORD_CHAR.match(text, end):
+                    found.update(node[_END])
+                token = _TOKEN.match(text, end)
+                if token is None:
+                    break
+                node = node.get(token.group())
+                end = token.end()
+
+        return sorted(found, key=self._rank.__getitem__)
+
+
+class LookupKeywordMatcher:
+    """Finds keywords in text the same way as KeywordMatcher, for worlds with too many keywords to keep in memory.
+
+    The keywords given are matched by a KeywordMatcher, and reported first. After them come the keywords a lookup
+    function finds for the phrases in the text, ordered by the rank the lookup gives them. Each phrase is only
+    made longer while some keyword starts with it, so finding them takes time proportional to the length of the
+    text, and to the time the lookup takes.
+
+    Instance Attributes:
+        - keywords: the keywords given to this matcher, in the order they were given
+        - max_tokens: the most tokens (see _TOKEN) in any keyword the lookup can find
+    """
+    # Private Instance Attributes:
+    #   - _matcher: the matcher for the keywords given
+    #   - _lookup: a function returning (rank, keyword) for each keyword that is the same as the given lowercased
+    #       phrase, ignoring case, or None if no keyword starts with the phrase followed by the end of the keyword
+    #       or the start of another token
+    keywords: list[str]
+    max_tokens: int
+    _matcher: KeywordMatcher
+    _lookup: Callable[[str], Optional[list[tuple[int, str]]]]
+
+    def __init__(self, keywords: Iterable[str], lookup: Callable[[str], Optional[list[tuple[int, str]]]],
+                 max_tokens: int) -> None:
+        """Create a matcher for the given keywords, followed by every keyword the lookup can find.
+
+        Preconditions:
+        - all(keyword != '' for keyword in keywords)
+        """
+        self._matcher = KeywordMatcher(keywords)
+        self.keywords = self._matcher.keywords
+        self._lookup = lookup
+        self.max_tokens = max_tokens
+
+    def find_all(self, text: str) -> list[str]:
+        """Return every keyword that appears as a whole word in text: the keywords given, in the order they were
+        given, followed by the keywords the lookup finds, by rank.
+        """
+        found = self._matcher.find_all(text)
+        text = text.lower()
+        ranks = {}
+        for start in _WORD_START.finditer(text):
+            end = start.end()
+            for _ in range(self.max_tokens):
+                matches = self._lookup(text[start.start():end])
+                if matches is None:
+                    break
+                if not _WORD_CHAR.match(text, end):
+                    for rank, keyword in matches:
+                        ranks[keyword] = rank
+                token = _TOKEN.match(text, end)
+                if token is None:
+                    break
+                end = token.end()
+
+        given = set(found)
+        return found + sorted((keyword for keyword in ranks if keyword not in given), key=ranks.__getitem__)
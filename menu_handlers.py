@@ -1,61 +1,67 @@
 from event_handlers import use_item
-from game_updates import update_game_state, update_player_state, display_location
+from game_updates import update_game_state, display_location
+from instrumentation import STATS
 
-def handle_menu_command(game, choice: str) -> None:
+COUNTED_COMMANDS = {"undo", "redo", "log"}
+FREE_COMMANDS = {"undo", "redo", "stats"}  # menu commands that don't use up a move
+
+async def handle_menu_command(game, choice: str) -> None:
     """Handles all the menu commands."""
     location = game.get_location()
+    line = choice
+    choice, count = split_menu_choice(choice)
 
     if choice == "look":
-        print(location.long_description)
+        game.io.print(location.long_description)
     elif choice == "inventory":
         game.inventory.show_inventory()
     elif choice == "use":
-        use_item(game)
+        await use_item(game)
     elif choice == "score":
-        print(f"Current score: {game.inventory.get_score(game.player_state[2])}")
+        game.io.print(f"Current score: {game.inventory.get_score(game.state.score)}")
     elif choice == "undo":
-        undo(game)
+        undo(game, count)
+    elif choice == "redo":
+        redo(game, count)
     elif choice == "log":
-        if game.event_log.first:
-            game.event_log.display_events()
+        if not game.event_log.is_empty():
+            game.event_log.display_events(game.io, None if line == choice else count)
         else:
-            print("Nothing to display!")
+            game.io.print("Nothing to display!")
+    elif choice == "stats":
+        for line in STATS.report():
+            game.io.print(line)
     elif choice == "quit":
         update_game_state(game, ongoing=False)
-        quit()
 
-def undo(game) -> None:
-    """Undo the last move. Reverts the player's state, including location, inventory, money, and health."""
-    if game.event_log.is_empty():
-        print("No actions to undo.")
-        return
+def split_menu_choice(choice: str) -> tuple[str, int]:
+    """Split a menu choice like "undo 3" into its command and how many times to carry it out, or for "log 2", which
+    page of the log to show. Only undo, redo and log can be given a number; any other choice is returned as is,
+    with a count of 1.
+    """
+    command, _, count = choice.partition(" ")
+    if command in COUNTED_COMMANDS and count.isdigit():
+        return command, int(count)
+    return choice, 1
 
-    last_event = game.event_log.last
-    if last_event is None or last_event.prev is None:
-        print("No actions to undo.")
+def undo(game, turns: int = 1) -> None:
+    """Undo the given number of moves. Everything the moves changed is put back exactly as it was, including
+    location, inventory, money, health, puzzles and the commands available at each location.
+    """
+    undone = game.journal.undo(turns)
+    if undone == 0:
+        game.io.print("No actions to undo.")
         return
 
-    print("Undoing last move...")
-
-    prev_event = last_event.prev
-
-    update_game_state(game, location_id=prev_event.id_num)
-
-    current_inventory = {item.get_name() for item in game.inventory.inventory_items}
-    prev_inventory = set(prev_event.current_inventory)
+    game.io.print("Undoing last move..." if undone == 1 else f"Undoing last {undone} moves...")
+    display_location(game)
 
-    for item_name in current_inventory - prev_inventory:
-        game.inventory.remove_item(item_name, game._items)
-
-    for item_name in prev_inventory - current_inventory:
-        game.inventory.add_item(item_name, game._items, game.player_state[2])
-
-    game.inventory.wallet.money = prev_event.current_money
-    update_player_state(game, health=prev_event.current_health)
-
-    if game.game_state[0] > 0:
-        update_game_state(game, moves=game.game_state[0] - 1)
-
-    game.event_log.remove_last_event()
+def redo(game, turns: int = 1) -> None:
+    """Redo the given number of undone moves."""
+    redone = game.journal.redo(turns)
+    if redone == 0:
+        game.io.print("No actions to redo.")
+        return
 
-    display_location(game)
\ No newline at end of file
+    game.io.print("Redoing last move..." if redone == 1 else f"Redoing last {redone} moves...")
+    display_location(game)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import argparse
+import json
+import time
+from dataclasses import dataclass, asdict
+from multiprocessing import Pool
+from typing import Iterable, Iterator, Optional, Union
+
+from game_io import FastIO
+from proj1_simulation import AdventureGameSimulation
+
+Script = Union[list[str], tuple[str, list[str]]]
+
+
+@dataclass
+class ScriptResult:
+    """The result of running one command script through an AdventureGameSimulation.
+
+    Instance Attributes:
+        - script_id: the name of the script
+        - id_log: the location IDs of every event in the simulation, as returned by get_id_log
+        - player_state: the final (health, money, score) of the player
+        - puzzle_state: the final (book_correct, orange_correct, torch_correct, shield_correct)
+        - outcome: how the game ended, as returned by AdventureGameSimulation.get_outcome,
+            or "error" if the script crashed the game
+        - wall_time: how long the script took to run, in seconds
+        - error: a description of the exception raised by the game, or None if there was none
+    """
+    script_id: str
+    id_log: list[int]
+    player_state: tuple[int, int, int]
+    puzzle_state: tuple[bool, bool, bool, bool]
+    outcome: str
+    wall_time: float
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    """The aggregated results of a batch of simulations.
+
+    Instance Attributes:
+        - results: the result of each script, in the order the scripts were given
+        - wall_time: how long the whole batch took to run, in seconds
+    """
+    results: list[ScriptResult]
+    wall_time: float
+
+    def summary(self) -> dict[str, int]:
+        """Return the number of scripts that ended with each outcome."""
+        counts = {}
+        for result in self.results:
+            counts[result.outcome] = counts.get(result.outcome, 0) + 1
+        return counts
+
+    def to_json(self) -> dict:
+        """Return this batch result as a JSON-serializable dictionary."""
+        return {
+            "wall_time": self.wall_time,
+            "summary": self.summary(),
+            "results": [asdict(result) for result in self.results]
+        }
+
+
+def run_script(script_id: str, commands: list[str], game_data_file: str,
+               initial_location_id: int = 1) -> ScriptResult:
+    """Run the given commands through a new simulation at machine speed with all output thrown away, and return
+    its result.
+
+    The commands are the lines a player would type, so the answers to prompts come from the same list.
+    """
+    script = iter(commands)
+    start = time.perf_counter()
+    try:
+        sim = AdventureGameSimulation(game_data_file, initial_location_id, script, FastIO(script, capture=False))
+    except Exception as e:  # a crashing script is a result, not a reason to stop the batch
+        return ScriptResult(script_id, [], (0, 0, 0), (False, False, False, False), "error",
+                            time.perf_counter() - start, f"{type(e).__name__}: {e}")
+
+    game = sim.get_game()
+    return ScriptResult(script_id, sim.get_id_log(), game.player_state, game.puzzle_state, sim.get_outcome(),
+                        time.perf_counter() - start)
+
+
+def _run_job(job: tuple[str, list[str], str, int]) -> ScriptResult:
+    """Unpack a job for run_script, so it can be sent to a worker process."""
+    return run_script(*job)
+
+
+def _jobs(scripts: Iterable[Script], game_data_file: str,
+          initial_location_id: int) -> Iterator[tuple[str, list[str], str, int]]:
+    """Yield a job for each script, naming unnamed scripts by their position."""
+    for i, script in enumerate(scripts):
+        if isinstance(script, tuple):
+            script_id, commands = script
+        else:
+            script_id, commands = str(i), script
+        yield script_id, list(commands), game_data_file, initial_location_id
+
+
+def run_batch(scripts: Iterable[Script], game_data_file: str, initial_location_id: int = 1,
+              processes: Optional[int] = None, chunksize: int = 16) -> BatchResult:
+    """Run every script across a pool of worker processes and return the aggregated results.
+
+    Each script is either a list of commands or a (script_id, commands) tuple. The scripts can come from a
+    generator; they are only read as workers become free. If processes is 1, the scripts are run in this process.
+    """
+    start = time.perf_counter()
+    jobs = _jobs(scripts, game_data_file, initial_location_id)
+
+    if processes == 1:
+        results = [_run_job(job) for job in jobs]
+    else:
+        with Pool(processes) as pool:
+            results = list(pool.imap(_run_job, jobs, chunksize))
+
+    return BatchResult(results, time.perf_counter() - start)
+
+
+def load_scripts(paths: Iterable[str]) -> Iterator[tuple[str, list[str]]]:
+    """Yield (script_id, commands) for each script file.
+
+    A .json file holds either a list of commands, or an object mapping script names to lists of commands.
+    Any other file holds one command per line; blank lines and lines starting with '#' are skipped.
+    """
+    for path in paths:
+        with open(path, 'r') as f:
+            if path.endswith('.json'):
+                data = json.load(f)
+                if isinstance(data, dict):
+                    for name, commands in data.items():
+                        yield f"{path}:{name}", commands
+                else:
+                    yield path, data
+            else:
+                yield path, [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the batch simulation from the command line."""
+    parser = argparse.ArgumentParser(description="Run many command scripts through the adventure game.")
+    parser.add_argument("scripts", nargs="+", help="script files (.txt, one command per line, or .json)")
+    parser.add_argument("--world", default="game_data.json", help="the game data file")
+    parser.add_argument("--start", type=int, default=1, help="the starting location ID")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--output", help="write every result to this JSON file")
+    args = parser.parse_args(argv)
+
+    batch = run_batch(load_scripts(args.scripts), args.world, args.start, args.processes)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(batch.to_json(), f, indent=2)
+
+    print(f"Ran {len(batch.results)} scripts in {batch.wall_time:.2f}s: {batch.summary()}")
+    for result in batch.results:
+        if result.error is not None:
+            print(f"  {result.script_id}: {result.error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Optional
+from itertools import islice
+from typing import Iterator, Optional
 
+from game_io import GameIO, TerminalIO
+from journal import Journal
 
-@dataclass
+PAGE_SIZE = 20  # the number of events on each page of the log
+
+
+@dataclass(slots=True, eq=False)
 class Event:
     """
     A node representing one event in an adventure game.
@@ -14,6 +20,10 @@ class Event:
     - next_command: String command which leads this event to the next event, None if this is the last game event
     - next: Event object representing the next event in the game, or None if this is the last game event
     - prev: Event object representing the previous event in the game, None if this is the first game event
+    - current_inventory: The names of the items in the player's inventory at this event. This is the inventory's
+        snapshot, which is shared with every other event since the inventory last changed.
+    - current_money: The money in the player's wallet at this event
+    - current_health: The player's health at this event
     """
 
     id_num: int
@@ -22,7 +32,7 @@ class Event:
     next: Optional[Event]
     prev: Optional[Event]
 
-    current_inventory: list[str]
+    current_inventory: tuple[str, ...]
     current_money: int
     current_health: int
 
@@ -34,9 +44,9 @@ class Event:
         self.next = None
         self.prev = None
 
-        self.current_inventory = [item.get_name() for item in game.inventory.inventory_items]
+        self.current_inventory = game.inventory.snapshot()
         self.current_money = game.inventory.get_money()
-        self.current_health = game.player_state[0]
+        self.current_health = game.state.health
 
 
 class EventList:
@@ -46,6 +56,7 @@ class EventList:
     Instance Attributes:
         - first: first event in the list
         - last: last event in the list
+        - journal: the journal that adding and removing events is recorded in, if any
 
     Representation Invariants:
         - (self.first is None and self.last is None) or (self.first is not None and self.last is not None)
@@ -54,18 +65,46 @@ class EventList:
     """
     first: Optional[Event]
     last: Optional[Event]
+    journal: Optional[Journal]
 
-    def __init__(self) -> None:
+    def __init__(self, journal: Optional[Journal] = None) -> None:
         """Initialize a new empty event list."""
 
         self.first = None
         self.last = None
+        self.journal = journal
 
-    def display_events(self) -> None:
-        """Display all events in chronological order."""
+    def display_events(self, io: Optional[GameIO] = None, page: Optional[int] = None) -> None:
+        """Display all events in chronological order, or only the given page of PAGE_SIZE events, on the given io
+        or the terminal if none is given. Pages are numbered from 1.
+        """
+        terminal = io is None
+        io = io if io is not None else TerminalIO()
+        if page is None:
+            entries = self.entries()
+        else:
+            entries = islice(self.entries((page - 1) * PAGE_SIZE), PAGE_SIZE) if page >= 1 else iter(())
+
+        shown = False
+        for id_num, command in entries:
+            io.print(f"Location: {id_num}, Command: {command}")
+            shown = True
+        if not shown and page is not None:
+            io.print(f"There is no page {page} in the log.")
+        if terminal:
+            io.flush()
+
+    def entries(self, start: int = 0) -> Iterator[tuple[int, Optional[str]]]:
+        """Yield the location id and command of each event in this list in chronological order, starting from the
+        event at the given index.
+        """
         curr = self.first
+        for _ in range(start):
+            if curr is None:
+                return
+            curr = curr.next
         while curr:
-            print(f"Location: {curr.id_num}, Command: {curr.next_command}")
+            yield curr.id_num, curr.next_command
             curr = curr.next
 
     def is_empty(self) -> bool:
@@ -78,7 +117,7 @@ class EventList:
         event in the game.
         """
 
-        if self.is_empty():
+        if self.first is None:
             self.first = event
             self.last = event
             event.next_command = command
@@ -89,13 +128,18 @@ class EventList:
             event.next_command = command
             self.last = event
 
+        if self.journal is not None:
+            self.journal.record(self._restore_event, event, False, True)
+
     def remove_last_event(self) -> None:
         """Remove the last event from this event list.
         If the list is empty, do nothing."""
 
         if self.is_empty():
             return
-        if self.first == self.last:
+        if self.journal is not None:
+            self.journal.record(self._restore_event, self.last, True, False)
+        if self.first is self.last:
             self.first = None
             self.last = None
         else:
@@ -103,6 +147,15 @@ class EventList:
             if self.last:
                 self.last.next = None
 
+    def _restore_event(self, event: Event, present: bool) -> None:
+        """Silently add the given event back to the end of this list, or remove it from the end, as recorded in
+        the journal.
+        """
+        if present:
+            self.add_event(event, event.next_command)
+        else:
+            self.remove_last_event()
+
     def get_id_log(self) -> list[int]:
         """Return a list of all location IDs visited for each event in this list, in sequence."""
         lst = []
@@ -112,6 +165,9 @@ class EventList:
             curr = curr.next
         return lst
 
+    def close(self) -> None:
+        """Release anything this list holds open. A list kept in memory holds nothing."""
+
 
 if __name__ == "__main__":
     import python_ta
@@ -1,29 +1,82 @@
 from __future__ import annotations
+from typing import Callable, Iterable, Optional
 
 from adventure import AdventureGame
 from game_entities import Location
-from game_updates import check_win
+from game_io import FastIO, GameIO, run_sync
+from game_updates import update_game_state
 from proj1_event_logger import Event, EventList
 
 
+# Scripts that play through the game, used in the examples below and by the benchmarks
+WALKTHROUGHS = {
+    # Walkthrough to win the game: tea for the lions gets the laptop charger without a fight
+    "win": [
+        "check papers", "check clothes", "check box", "inventory", "score", "go east", "go east", "go north",
+        "wait in line", "order tea for lions", "go north", "go north", "talk to the person studying", "yes",
+        "talk to the person on the computer", "yes", "attack", "go south", "go south", "go south", "go west",
+        "talk to the people outside", "go south", "go south", "look around", "use tea for lions", "go north",
+        "visit the blue truck", "cross the road", "attack", "go back to dorm room", "inspect torch", "go east",
+        "inspect book", "go north", "inspect shield", "go west", "inspect orange", "use", "torch", "go east", "use",
+        "orange", "go south", "use", "shield", "go west", "use", "book"
+    ],
+    # Walkthrough to lose the game: fighting the USB Guy without ever attacking gets you knocked out
+    "lose": [
+        "go east", "go east", "go north", "go north", "go north", "talk to the person on the computer", "yes",
+        *["wait"] * 10
+    ],
+    "inventory": [
+        "check clothes", "inventory", "use", "candy"
+    ],
+    "score": [
+        "check clothes", "score"
+    ],
+    "combat": [
+        "check clothes", "go east", "go east", "go north", "go north", "go north",
+        "talk to the person on the computer", "yes", "attack"
+    ],
+    "purchase": [
+        "check box", "go east", "go east", "go north", "wait in line", "order tea for lions"
+    ],
+    "dialogue": [
+        "go east", "go east", "go north", "go north", "go north",
+        "talk to the person studying"
+    ],
+}
+
+
 class AdventureGameSimulation:
     """A simulation of an adventure game playthrough.
     """
     # Private Instance Attributes:
     #   - _game: The AdventureGame instance that this simulation uses.
     #   - _events: A collection of the events to process during the simulation.
+    #   - _won: Whether the player won the game during the simulation.
+    #   - _on_turn: Called with the game and the command at the end of every turn, if given.
     _game: AdventureGame
     _events: EventList
+    _won: bool
+    _on_turn: Optional[Callable[[AdventureGame, str], None]]
 
-    def __init__(self, game_data_file: str, initial_location_id: int, commands: list[str]) -> None:
+    def __init__(self, game_data_file: str, initial_location_id: int, commands: Iterable[str],
+                 io: Optional[GameIO] = None,
+                 on_turn: Optional[Callable[[AdventureGame, str], None]] = None) -> None:
         """Initialize a new game simulation based on the given game data, that runs through the given commands.
 
+        The commands are read the same way AdventureGame.play reads player input: menu commands are handled as
+        menu commands, a command can be given by a unique prefix of it (see AdventureGame.resolve_choice), and
+        invalid commands are skipped without using up a move. The game uses the given io,
+        or the terminal if none is given. If on_turn is given, it is called with the game and the command at the
+        end of every turn.
+
         Preconditions:
         - len(commands) > 0
         - all commands in the given list are valid commands at each associated location in the game
         """
-        self._game = AdventureGame(game_data_file, initial_location_id)
+        self._game = AdventureGame(game_data_file, initial_location_id, io)
         self._events = self._game.event_log
+        self._won = False
+        self._on_turn = on_turn
 
         initial_location = self._game.get_location()
         first_event = Event(initial_location_id, self._game)
@@ -32,27 +85,41 @@ class AdventureGameSimulation:
 
         self.generate_events(commands, initial_location)
 
-    def generate_events(self, commands: list[str], current_location: Location) -> None:
-        """Generate all events in this simulation.
+    def generate_events(self, commands: Iterable[str], current_location: Location) -> None:
+        """Generate all events in this simulation, stopping early if the game ends.
+
+        If a prompt during the simulation (dialogue, using an item, or combat) reads past the end of the
+        player's input, the simulation stops there.
 
         Preconditions:
         - len(commands) > 0
         - all commands in the given list are valid commands at each associated location in the game
         """
-        for command in commands:
-            if self._game.game_state[3]:
-                AdventureGame.handle_dialogue(self._game, "", response="yes")
-                print("response")
-
-            self._game.handle_game_action(command)
-
-            check_win(self._game)
+        for line in commands:
+            command = self._game.resolve_choice(line)
+            if command == "quit":
+                update_game_state(self._game, ongoing=False)
+                return
+            if command is None:
+                continue
+
+            try:
+                self._won = run_sync(self._game.take_turn(command))
+            except EOFError:
+                return
+            finally:
+                self._game.io.flush()
 
             current_location = self._game.get_location()
 
             event = Event(current_location.location_id, self._game)
             event.description = current_location.long_description
             self._events.add_event(event, command)
+            if self._on_turn is not None:
+                self._on_turn(self._game, command)
+
+            if self._won or self._game.conditions.has_outcome("lose"):
+                return
 
     def get_id_log(self) -> list[int]:
         """
@@ -72,6 +139,22 @@ class AdventureGameSimulation:
         """
         return self._events.get_id_log()
 
+    def get_game(self) -> AdventureGame:
+        """Return the game this simulation was played in."""
+        return self._game
+
+    def get_outcome(self) -> str:
+        """Return how the simulated game ended: "win", "lose", "quit", or "incomplete" if the commands ran out
+        before the game ended.
+        """
+        if self._won:
+            return "win"
+        if self._game.conditions.has_outcome("lose") or self._game.state.health <= 0:
+            return "lose"
+        if not self._game.state.ongoing:
+            return "quit"
+        return "incomplete"
+
     def run(self) -> None:
         """Run the game simulation and log location descriptions.
 
@@ -99,71 +182,22 @@ if __name__ == "__main__":
         'disable': ['R1705', 'E9998', 'E9999']
     })
 
-    # Walkthrough to win the game, solution 2
-    win_walkthrough = [
-        "check papers", "go east", "go east", "go north", "go north", "go north", 
-        "talk to the person studying", "talk to the person on the computer",
-        "go south", "go south", "go south", "go west", "talk to the people",
-        "go south", "go south", "fight the lions", "go north", "go north", "visit the blue truck",
-        "cross the road", "go back to dorm room", "inspect torch", "go east",
-        "inspect book", "go north", "inspect shield", "go west", "inspect orange",
-        "go south", "use", "book", "go east", "use", "shield", "go north", "use", "orange",
-        "go west", "use", "torch"
-    ]
-    expected_log = [1, 1, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 6, 6, 6, 6, 10, 6, 6, 5, 5,
-                    4, 4, 3, 3, 2, 2, 2, 2, 7, 7, 8, 8, 10, 8, 8, 9, 9, 9, 9, 9, 9, 10, 9,
-                    9, 11, 11, 11, 11, 12, 12, 12, 12, 13, 13, 13, 13, 14, 14, 14, 14, 11,
-                    11, 11, 11, 11, 11, 12, 12, 12, 12, 12, 12, 13, 13, 13, 13, 13, 13, 14, 14, 14, 14, 14]
-    sim = AdventureGameSimulation('game_data.json', 1, win_walkthrough)
-    print(f"Actual: {sim.get_id_log()}")
-    assert expected_log == sim.get_id_log()
-
-    # Walkthrough to lose the game
-    lose_demo = [
-        "go outside", "cross the road", "attack"
-    ]
-    expected_log = [1, 1, 1, 1, 1, 1, 1]
-    sim = AdventureGameSimulation('game_data.json', 1, lose_demo)
-    assert expected_log == sim.get_id_log()
-
-    # Walkthrough to demonstrate inventory
-    inventory_demo = [
-        "check clothes", "inventory", "use", "candy"
-    ]
-    expected_log = [1, 1, 1, 1, 1, 1, 1, 1, 1]
-    sim = AdventureGameSimulation('game_data.json', 1, inventory_demo)
-    assert expected_log == sim.get_id_log()
-
-    # Walkthrough to demonstrate score
-    scores_demo = [
-        "check clothes", "score"
-    ]
-    expected_log = [1, 1, 1, 1, 1]
-    sim = AdventureGameSimulation('game_data.json', 1, scores_demo)
-    assert expected_log == sim.get_id_log()
-
-    # Walkthrough to demonstrate combat
-    combat_demo = [
-        "check clothes", "go east", "go east", "go north", "go north", "go north",
-        "talk to the person on the computer", "yes", "attack"
-    ]
-    expected_log = [1, 1, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 6, 10, 10, 10, 10, 10, 6, 6, 6, 6, 6]
-    sim = AdventureGameSimulation('game_data.json', 1, combat_demo)
-    assert expected_log == sim.get_id_log()
-
-    # Walkthrough to demonstrate purchasing
-    purchase_demo = [
-        "check box", "go east", "go east", "go north", "wait in line", "order tea for lions"
-    ]
-    expected_log = [1, 1, 1, 1, 2, 2, 3, 3, 4, 4, 4, 4, 4]
-    sim = AdventureGameSimulation('game_data.json', 1, purchase_demo)
-    assert expected_log == sim.get_id_log()
-
-    # Walkthrough to demonstrate dialogue
-    purchase_demo = [
-        "go east", "go east", "go north", "go north", "go north", 
-        "talk to the person studying"
-    ]
-    expected_log = [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 6, 6]
-    sim = AdventureGameSimulation('game_data.json', 1, purchase_demo)
-    assert expected_log == sim.get_id_log()
+    # The location IDs each walkthrough visits, and how it ends. The answers to prompts come from the walkthroughs
+    # too, the way proj1_batch_simulation plays them.
+    expected_logs = {
+        "win": ([1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 3, 3, 4, 4, 4, 4, 4, 4, 5, 5, 6, 6, 6, 6, 6, 6, 10, 6, 6, 5, 5,
+                 4, 4, 3, 3, 2, 2, 2, 2, 7, 7, 8, 8, 8, 8, 8, 8, 9, 9, 9, 9, 10, 9, 9, 11, 11, 11, 11, 12, 12, 12,
+                 12, 13, 13, 13, 13, 14, 14, 14, 14, 14, 14, 14, 13, 13, 13, 13, 13, 12, 12, 12, 12, 12, 11, 11,
+                 11, 11], "win"),
+        "lose": ([1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 6, 10, 10, 10, 10, 10, 10, 10, 10, 10, 10, 10], "lose"),
+        "inventory": ([1, 1, 1, 1, 1, 1, 1], "incomplete"),
+        "score": ([1, 1, 1, 1], "incomplete"),
+        "combat": ([1, 1, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 6, 10], "incomplete"),
+        "purchase": ([1, 1, 1, 1, 2, 2, 3, 3, 4, 4, 4, 4, 4], "incomplete"),
+        "dialogue": ([1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6], "incomplete"),
+    }
+    for name, (expected_log, expected_outcome) in expected_logs.items():
+        script = iter(WALKTHROUGHS[name])
+        sim = AdventureGameSimulation('game_data.json', 1, script, FastIO(script, capture=False))
+        assert expected_log == sim.get_id_log(), f"{name}: {sim.get_id_log()}"
+        assert expected_outcome == sim.get_outcome(), f"{name}: {sim.get_outcome()}"
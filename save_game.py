@@ -0,0 +1,322 @@
+from __future__ import annotations
+import marshal
+import os
+import struct
+from collections import deque
+from typing import Any, BinaryIO, Iterable, Optional
+
+from event_store import Record, StreamingEventList, read_records, to_event, to_record
+from game_state import ONGOING
+from proj1_event_logger import Event, EventList
+
+SAVE_VERSION = 1
+
+# The most events an AutoSaver remembers having saved, which is as many as a streamed event log keeps in memory
+RECENT_EVENTS = 1000
+
+# The header of a save file: a magic number, the format version, and the marshal version it was written with.
+# It is followed by frames, each of which is the length of its payload followed by the payload, marshalled.
+_HEADER = struct.Struct('<4sHH')
+_FRAME = struct.Struct('<I')
+_MAGIC = b'TASV'
+
+# A frame's payload, as (state, inventory, money, commands, events). The first frame in a file is a full
+# snapshot of the game; every frame after it only holds the parts of the game that changed since the frame
+# before it, and None for the rest:
+#   - state: (moves, location_id, health, money, score, flags) of the game's GameState
+#   - inventory: the names of the items in the inventory, in the order they were added
+#   - money: the money in the wallet
+#   - commands: how the game has changed the commands at each location (see CommandOverlay.changes), where
+#       ({}, set(), {}) means a location's commands are back to the world's
+#   - events: (the number of events kept from the frame before, the record of each event added after them)
+Frame = tuple[Optional[tuple], Optional[tuple[str, ...]], Optional[int], Optional[dict], Optional[tuple]]
+
+_UNCHANGED_COMMANDS = ({}, set(), {})
+
+
+class SaveError(ValueError):
+    """Raised when a save file can't be loaded."""
+
+
+def _state(game: Any) -> tuple:
+    """Return the game's GameState as it is saved. The items in it are left out, since they follow the inventory."""
+    state = game.state
+    return state.moves, state.location_id, state.health, state.money, state.score, state.flags
+
+
+def _event_records(log: EventList) -> list[Record]:
+    """Return the record of every event in the given log, in order."""
+    if isinstance(log, StreamingEventList):
+        return list(read_records(log.filename))
+    records = []
+    event = log.first
+    while event is not None:
+        records.append(to_record(event))
+        event = event.next
+    return records
+
+
+def save(game: Any, filename: str) -> None:
+    """Save everything about the given game that its next turns depend on to the given file, replacing it.
+
+    The file is written in one go, so if saving fails, whatever was saved to it before is left as it was.
+    """
+    saver = AutoSaver(filename)
+    saver.checkpoint(game)
+    saver.close()
+
+
+def read_frames(filename: str) -> list[Frame]:
+    """Return the frames in the given save file, in order. Reading stops at a frame that was never finished, as
+    happens when a game crashes while saving.
+
+    Raise SaveError if the file isn't a save file this version of the game can read.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+    except OSError as error:
+        raise SaveError(f"{filename} can't be read: {error}") from error
+    if len(data) < _HEADER.size or _HEADER.unpack_from(data) != (_MAGIC, SAVE_VERSION, marshal.version):
+        raise SaveError(f"{filename} is not a save file this version of the game can read")
+
+    frames = []
+    offset = _HEADER.size
+    while offset + _FRAME.size <= len(data):
+        (length,) = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        if start + length > len(data):
+            break
+        try:
+            frames.append(marshal.loads(data[start:start + length]))
+        except (EOFError, ValueError, TypeError):
+            break
+        offset = start + length
+    if not frames:
+        raise SaveError(f"{filename} holds no saved game")
+    return frames
+
+
+def load(game: Any, filename: str) -> None:
+    """Load the game saved in the given file into the given game, which must have just been started in the same
+    world. The game can carry on from where it was saved, but its turns before that can't be undone.
+    A game saved after the player quit carries on as if they hadn't.
+
+    Raise SaveError if the file can't be loaded, leaving the game as it was.
+    """
+    state = inventory = money = None
+    commands, records = {}, []
+    for frame_state, frame_inventory, frame_money, frame_commands, frame_events in read_frames(filename):
+        state = frame_state if frame_state is not None else state
+        inventory = frame_inventory if frame_inventory is not None else inventory
+        money = frame_money if frame_money is not None else money
+        commands.update(frame_commands or {})
+        if frame_events is not None:
+            kept, added = frame_events
+            del records[kept:]
+            records.extend(added)
+
+    try:
+        items = [game._items[name] for name in inventory]
+    except (KeyError, TypeError) as error:
+        raise SaveError(f"{filename} was saved in a different world, or is damaged") from error
+    if state is None or money is None or state[1] not in game._locations \
+            or not all(location_id in game._locations for location_id in commands):
+        raise SaveError(f"{filename} was saved in a different world, or is damaged")
+
+    moves, location_id, health, state_money, score, flags = state
+    game.state.moves, game.state.location_id, game.state.health = moves, location_id, health
+    game.state.money, game.state.score, game.state.flags = state_money, score, flags | ONGOING
+    game.inventory.load(items, money)
+    for location_id, location_commands in commands.items():
+        game._locations[location_id].available_commands.load_changes(location_commands)
+    for record in records:
+        event = to_event(record)
+        game.event_log.add_event(event, event.next_command)
+    game.conditions.refresh()
+
+
+class AutoSaver:
+    """Saves one game to a file at every checkpoint, such as at the end of each turn, writing only what has
+    changed since the checkpoint before it.
+
+    The first checkpoint writes a full snapshot of the game, and each checkpoint after it appends a frame with
+    only the parts of the game that changed, so saving after a turn takes about as long however long the game
+    has been going. Once the file holds compact_every frames, the next checkpoint writes a full snapshot again,
+    so that loading never has to read through too many of them.
+
+    Instance Attributes:
+        - filename: the save file
+        - durable: whether every checkpoint is synced to disk as soon as it is written
+        - compact_every: the most frames the file holds before it is written again as one snapshot
+
+    Representation Invariants:
+        - self.compact_every >= 1
+    """
+    # Private Instance Attributes:
+    #   - _file: the save file, open for appending, or None before the first checkpoint
+    #   - _frames: the number of frames in the save file
+    #   - _state, _inventory, _money, _commands: those parts of the game as of the last checkpoint
+    #   - _event_count: the number of events in the game's log as of the last checkpoint
+    #   - _recent: the position in the log of each of the last RECENT_EVENTS events as of the last checkpoint
+    #   - _order: the events in _recent, oldest first
+    filename: str
+    durable: bool
+    compact_every: int
+    _file: Optional[BinaryIO]
+    _frames: int
+    _state: Optional[tuple]
+    _inventory: Optional[tuple[str, ...]]
+    _money: Optional[int]
+    _commands: dict[int, tuple[dict, set, dict]]
+    _event_count: int
+    _recent: dict[Event, int]
+    _order: deque[Event]
+
+    def __init__(self, filename: str, durable: bool = False, compact_every: int = 100) -> None:
+        self.filename = filename
+        self.durable = durable
+        self.compact_every = compact_every
+        self._file = None
+        self._frames = 0
+        self._state = self._inventory = self._money = None
+        self._commands = {}
+        self._event_count = 0
+        self._recent = {}
+        self._order = deque()
+
+    def resume(self, game: Any) -> bool:
+        """Load the game saved in the save file into the given game, which must have just been started, if there
+        is one, and return whether there was. Checkpoints after this carry on from the saved game.
+
+        Raise SaveError if there is a save file that can't be loaded.
+        """
+        if not os.path.exists(self.filename):
+            return False
+        load(game, self.filename)
+        self._remember_game(game)
+        self._frames = len(read_frames(self.filename))
+        self._file = open(self.filename, 'ab')
+        return True
+
+    def checkpoint(self, game: Any) -> int:
+        """Save whatever has changed in the given game since the last checkpoint, and return the number of bytes
+        written, which is 0 if nothing changed.
+        """
+        if self._file is None or self._frames >= self.compact_every:
+            return self._snapshot(game)
+
+        state, inventory, money = _state(game), game.inventory.snapshot(), game.inventory.get_money()
+        commands = game._locations.changes()
+        changed_commands = {location_id: location_commands for location_id, location_commands in commands.items()
+                            if self._commands.get(location_id) != location_commands}
+        changed_commands.update((location_id, _UNCHANGED_COMMANDS) for location_id in self._commands
+                                if location_id not in commands)
+        frame = (state if state != self._state else None, inventory if inventory != self._inventory else None,
+                 money if money != self._money else None, changed_commands or None, self._new_events(game.event_log))
+        self._state, self._inventory, self._money, self._commands = state, inventory, money, commands
+        if frame == (None, None, None, None, None):
+            return 0
+
+        self._frames += 1
+        return self._write(self._file, frame)
+
+    def close(self) -> None:
+        """Sync the save file to disk and close it."""
+        if self._file is not None and not self._file.closed:
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def finish(self) -> None:
+        """Close the save file and delete it, since the game it saves is over. The next game to resume from it
+        starts afresh.
+        """
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._frames = 0
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def _snapshot(self, game: Any) -> int:
+        """Write a full snapshot of the given game as the only frame of the save file, and return the number of
+        bytes written.
+        """
+        self.close()
+        records = self._remember_game(game)
+        frame = (self._state, self._inventory, self._money, self._commands, (0, records))
+
+        temp = f"{self.filename}.{os.getpid()}.tmp"
+        with open(temp, 'wb') as f:
+            written = f.write(_HEADER.pack(_MAGIC, SAVE_VERSION, marshal.version)) + self._write(f, frame)
+        os.replace(temp, self.filename)  # so a game that crashes while saving keeps its last save
+        self._file = open(self.filename, 'ab')
+        self._frames = 1
+        return written
+
+    def _write(self, f: BinaryIO, frame: Frame) -> int:
+        """Append the given frame to the given file, flush it, and return the number of bytes written."""
+        payload = marshal.dumps(frame)
+        written = f.write(_FRAME.pack(len(payload)) + payload)
+        f.flush()
+        if self.durable:
+            os.fsync(f.fileno())
+        return written
+
+    def _remember_game(self, game: Any) -> list[Record]:
+        """Remember everything about the given game as saved, and return the record of every event in its log."""
+        self._state, self._inventory = _state(game), game.inventory.snapshot()
+        self._money, self._commands = game.inventory.get_money(), game._locations.changes()
+        records = _event_records(game.event_log)
+        self._remember_events(game.event_log, len(records))
+        return records
+
+    def _remember_events(self, log: EventList, count: int) -> None:
+        """Remember the events of the given log that are still in memory as saved, where the log has the given
+        number of events.
+        """
+        events = []
+        event = log.last
+        while event is not None and len(events) < RECENT_EVENTS:
+            events.append(event)
+            event = event.prev
+        self._recent.clear()
+        self._order.clear()
+        self._event_count = count - len(events)
+        self._add_events(reversed(events))
+
+    def _add_events(self, events: Iterable[Event]) -> None:
+        """Remember the given events as saved, added in order after the events already remembered."""
+        for event in events:
+            self._recent[event] = self._event_count
+            self._order.append(event)
+            self._event_count += 1
+        while len(self._order) > RECENT_EVENTS:
+            del self._recent[self._order.popleft()]
+
+    def _new_events(self, log: EventList) -> Optional[tuple[int, list[Record]]]:
+        """Return how the given log has changed since the last checkpoint, as (the number of events kept from
+        then, the records of the events added after them), or None if it hasn't changed.
+
+        Only the events added since then are looked at, unless the events before them are no longer in the
+        log's memory, in which case every event is read back from its file and saved again.
+        """
+        added = []
+        event = log.last
+        while event is not None and event not in self._recent:
+            added.append(event)
+            event = event.prev
+        if event is None and isinstance(log, StreamingEventList) and not log.is_empty():
+            records = _event_records(log)
+            self._remember_events(log, len(records))
+            return 0, records
+
+        kept = 0 if event is None else self._recent[event] + 1
+        if kept == self._event_count and not added:
+            return None
+        while self._order and self._recent[self._order[-1]] >= kept:
+            del self._recent[self._order.pop()]
+        self._event_count = kept
+        added.reverse()
+        self._add_events(added)
+        return kept, [to_record(event) for event in added]
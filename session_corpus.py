@@ -0,0 +1,298 @@
+from __future__ import annotations
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Any, Iterable, Iterator, Optional
+
+from adventure import AdventureGame
+from game_io import FastIO, GameIO, run_sync
+from game_state import PUZZLES
+from proj1_batch_simulation import load_scripts
+
+# What a game looks like at the end of a turn: its location, the names of the items in the inventory, in the
+# order they were added, the player's health, money in the wallet and score, the moves taken and the puzzles
+# solved
+TurnState = dict[str, Any]
+
+
+class RecordingIO(GameIO):
+    """Plays the game through another IO, sharing its render buffer, and records every line of input the player
+    gives, including their answers to dialogue, use and combat prompts, and what the game looks like at the end
+    of every turn, once record_turn is the game's on_turn.
+
+    Instance Attributes:
+        - io: the IO the game is played through
+        - inputs: every line of input so far, in order
+        - trace: the command and the state of the game at the end of every turn so far, in order
+    """
+    io: GameIO
+    inputs: list[str]
+    trace: list[tuple[str, TurnState]]
+
+    def __init__(self, io: GameIO) -> None:
+        self.io = io
+        self.render = io.render
+        self.inputs = []
+        self.trace = []
+
+    async def input(self, prompt: str = '') -> str:
+        line = await self.io.input(prompt)
+        self.inputs.append(line)
+        return line
+
+    async def sleep(self, seconds: float) -> None:
+        await self.io.sleep(seconds)
+
+    def record_turn(self, game: AdventureGame, command: str) -> None:
+        """Record what the given game looks like at the end of a turn of the given command."""
+        self.trace.append((command, turn_state(game)))
+
+    def playthrough(self, game: Optional[AdventureGame], outcome: str, error: Optional[str] = None) -> Playthrough:
+        """Return what happened in the given game, played through this IO, which ended with the given outcome.
+        The game is None if it crashed before it started.
+        """
+        return Playthrough(list(self.trace), [] if game is None else game.event_log.get_id_log(), outcome, error)
+
+
+def turn_state(game: AdventureGame) -> TurnState:
+    """Return what the given game looks like now."""
+    state = game.state
+    return {"location": state.location_id, "inventory": list(game.inventory.snapshot()), "health": state.health,
+            "money": game.inventory.get_money(), "score": state.score, "moves": state.moves,
+            "puzzles": [name for i, name in enumerate(PUZZLES) if state.is_solved(i)]}
+
+
+@dataclass
+class Playthrough:
+    """What happened when a session's input was played through the game by AdventureGame.run, live or replayed.
+
+    Instance Attributes:
+        - trace: the command and the state of the game at the end of every turn, in order
+        - id_log: the location IDs of every event in the game's event log
+        - outcome: how the game ended, as returned by AdventureGame.run, "incomplete" if the input ran out
+            before it ended, or "error" if the input crashed the game
+        - error: a description of the exception raised by the game, or None if there was none
+    """
+    trace: list[tuple[str, TurnState]]
+    id_log: list[int]
+    outcome: str
+    error: Optional[str] = None
+
+
+@dataclass
+class Session:
+    """A recorded session: a player's input, and what it did in the game when it was recorded.
+
+    Instance Attributes:
+        - session_id: the name of the session, unique in its corpus
+        - inputs: every line of input the player gave, in order
+        - initial_location_id: the location the session started at
+        - expected: what the input did when the session was recorded
+    """
+    session_id: str
+    inputs: list[str]
+    initial_location_id: int
+    expected: Playthrough
+
+    def to_json(self) -> dict:
+        """Return this session as a JSON-serializable dictionary, as it is stored in a corpus."""
+        return {"id": self.session_id, "start": self.initial_location_id, "inputs": self.inputs,
+                "trace": self.expected.trace, "id_log": self.expected.id_log, "outcome": self.expected.outcome,
+                "error": self.expected.error}
+
+    @staticmethod
+    def from_json(data: dict) -> Session:
+        """Return the session stored in a corpus as the given dictionary."""
+        trace = [(command, state) for command, state in data["trace"]]
+        return Session(data["id"], data["inputs"], data["start"],
+                       Playthrough(trace, data["id_log"], data["outcome"], data.get("error")))
+
+
+@dataclass
+class Divergence:
+    """Where replaying a session first stopped matching what it did when it was recorded.
+
+    Instance Attributes:
+        - session_id: the name of the session
+        - turn: the number of the turn it diverged at, counting from 1, or None if every turn matched but the
+            event log or outcome didn't
+        - command: the command of that turn when the session was recorded, if any
+        - changes: for each part of the game that is different, what it was when recorded and what it is now
+    """
+    session_id: str
+    turn: Optional[int]
+    command: Optional[str]
+    changes: dict[str, tuple[Any, Any]] = field(default_factory=dict)
+
+    def describe(self) -> str:
+        """Return a one-line description of this divergence."""
+        where = "after the last turn" if self.turn is None else f"turn {self.turn} ({self.command!r})"
+        parts = []
+        for name, (expected, actual) in self.changes.items():
+            if name == "inventory":
+                gained = [f"+{item}" for item in actual if item not in expected]
+                lost = [f"-{item}" for item in expected if item not in actual]
+                parts.append(f"inventory {' '.join(gained + lost) or 'reordered'}")
+            else:
+                parts.append(f"{name} {expected!r} -> {actual!r}")
+        return f"{self.session_id}: {where}: {', '.join(parts)}"
+
+
+def describe_error(error: Exception) -> str:
+    """Return how the given exception, raised by a game, is described in a corpus."""
+    return f"{type(error).__name__}: {error}"
+
+
+def replay(inputs: list[str], game_data_file: str, initial_location_id: int = 1) -> Playthrough:
+    """Play the given input through a new game in the given world, headless and at machine speed, the same way
+    a live session is played, and return what happened.
+    """
+    recording = RecordingIO(FastIO(inputs, capture=False))
+    game = None
+    try:
+        game = AdventureGame(game_data_file, initial_location_id, recording)
+        game.on_turn = recording.record_turn
+        outcome = run_sync(game.run())
+    except EOFError:
+        outcome = "incomplete"
+    except Exception as e:  # a crashing session is a result to compare, not a reason to stop the replay
+        return recording.playthrough(game, "error", describe_error(e))
+    return recording.playthrough(game, outcome)
+
+
+def record_session(session_id: str, inputs: list[str], game_data_file: str,
+                   initial_location_id: int = 1) -> Session:
+    """Return a session of the given input, recording what it does in the given world now."""
+    return Session(session_id, list(inputs), initial_location_id,
+                   replay(inputs, game_data_file, initial_location_id))
+
+
+def live_session(session_id: str, recording: RecordingIO, game: Optional[AdventureGame], initial_location_id: int,
+                 outcome: str, error: Optional[str] = None) -> Session:
+    """Return the session a player played live through the given recording IO, which ended with the given
+    outcome, recording what it actually did rather than what replaying it does now.
+    """
+    return Session(session_id, list(recording.inputs), initial_location_id,
+                   recording.playthrough(game, outcome, error))
+
+
+def first_divergence(session_id: str, expected: Playthrough, actual: Playthrough) -> Optional[Divergence]:
+    """Return where the actual playthrough of the session with the given name first stopped matching the expected
+    one, or None if they match.
+    """
+    for turn, ((command, state), (actual_command, actual_state)) in enumerate(zip(expected.trace, actual.trace), 1):
+        if command != actual_command:
+            return Divergence(session_id, turn, command, {"command": (command, actual_command)})
+        if state != actual_state:
+            return Divergence(session_id, turn, command, {name: (state.get(name), actual_state.get(name))
+                                                          for name in state.keys() | actual_state.keys()
+                                                          if state.get(name) != actual_state.get(name)})
+    if len(expected.trace) != len(actual.trace):
+        turn = min(len(expected.trace), len(actual.trace)) + 1
+        longer = expected.trace if len(expected.trace) > len(actual.trace) else actual.trace
+        return Divergence(session_id, turn, longer[turn - 1][0],
+                          {"turns": (len(expected.trace), len(actual.trace))})
+
+    changes = {}
+    if expected.id_log != actual.id_log:
+        i = next((i for i, (a, b) in enumerate(zip(expected.id_log, actual.id_log)) if a != b),
+                 min(len(expected.id_log), len(actual.id_log)))
+        changes[f"id_log[{i}]"] = (expected.id_log[i] if i < len(expected.id_log) else None,
+                                   actual.id_log[i] if i < len(actual.id_log) else None)
+    for name in ("outcome", "error"):
+        if getattr(expected, name) != getattr(actual, name):
+            changes[name] = (getattr(expected, name), getattr(actual, name))
+    return Divergence(session_id, None, None, changes) if changes else None
+
+
+def check_session(session: Session, game_data_file: str) -> Optional[Divergence]:
+    """Replay the given session in the given world, and return where it first diverged from its recording, or
+    None if it didn't.
+    """
+    actual = replay(session.inputs, game_data_file, session.initial_location_id)
+    return first_divergence(session.session_id, session.expected, actual)
+
+
+def _check_job(job: tuple[Session, str]) -> Optional[Divergence]:
+    """Unpack a job for check_session, so it can be sent to a worker process."""
+    return check_session(*job)
+
+
+@dataclass
+class ReplayResult:
+    """The result of replaying a corpus.
+
+    Instance Attributes:
+        - sessions: the number of sessions replayed
+        - divergences: where each session that diverged first did, in the order the sessions were given
+        - wall_time: how long the replay took, in seconds
+    """
+    sessions: int
+    divergences: list[Divergence]
+    wall_time: float
+
+
+def replay_corpus(sessions: Iterable[Session], game_data_file: str, processes: Optional[int] = None,
+                  chunksize: int = 16) -> ReplayResult:
+    """Replay every session across a pool of worker processes, in the given world, and return where each one
+    first diverged from its recording. If processes is 1, the sessions are replayed in this process.
+    """
+    start = time.perf_counter()
+    jobs = ((session, game_data_file) for session in sessions)
+    if processes == 1:
+        results = [_check_job(job) for job in jobs]
+    else:
+        with Pool(processes) as pool:
+            results = list(pool.imap(_check_job, jobs, chunksize))
+    return ReplayResult(len(results), [result for result in results if result is not None],
+                        time.perf_counter() - start)
+
+
+def load_corpus(paths: Iterable[str]) -> Iterator[Session]:
+    """Yield every session in the given corpus files, which hold one session as JSON on each line."""
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield Session.from_json(json.loads(line))
+
+
+def append_session(path: str, session: Session) -> None:
+    """Add the given session to the end of the given corpus file, creating it if it doesn't exist."""
+    with open(path, 'a') as f:
+        f.write(json.dumps(session.to_json(), separators=(',', ':')) + '\n')
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Record sessions into a corpus, or replay a corpus, from the command line."""
+    parser = argparse.ArgumentParser(description="Record and replay a corpus of adventure game sessions.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="add script files to a corpus as sessions")
+    record.add_argument("corpus", help="the corpus file to add to")
+    record.add_argument("scripts", nargs="+", help="script files (.txt, one line of input per line, or .json)")
+    check = subparsers.add_parser("replay", help="replay corpora and show where each session first diverges")
+    check.add_argument("corpora", nargs="+", help="the corpus files to replay")
+    check.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    for subparser in (record, check):
+        subparser.add_argument("--world", default="game_data.json", help="the game data file")
+    record.add_argument("--start", type=int, default=1, help="the starting location ID")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        for script_id, inputs in load_scripts(args.scripts):
+            append_session(args.corpus, record_session(script_id, inputs, args.world, args.start))
+        return
+
+    result = replay_corpus(load_corpus(args.corpora), args.world, args.processes)
+    for divergence in result.divergences:
+        print(divergence.describe())
+    print(f"Replayed {result.sessions} sessions in {result.wall_time:.2f}s: {len(result.divergences)} diverged")
+    if result.divergences:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+from __future__ import annotations
+import argparse
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from math import inf
+from multiprocessing import Pool
+from typing import Hashable, Iterable, Iterator, Optional
+
+from adventure import AdventureGame, MENU, MOVE_LIMIT
+from event_handlers import is_pedestal_item
+from game_state import PUZZLE_BITS, PUZZLES
+from world import World
+from game_io import GameIO, NullSink, RenderBuffer, run_sync
+
+# A turn as the lines the player types in it: a command, followed by the answers to any prompts it asks
+Turn = tuple[str, ...]
+Path = tuple[Turn, ...]
+
+
+class SolverIO(GameIO):
+    """Answers the game's prompts for the solver, and remembers every answer, so that a turn can be played again
+    from the lines it read. Output is thrown away, and sleeps return immediately.
+
+    Dialogue is answered with the given answer, combat with "attack", and "use" with the given item.
+
+    Instance Attributes:
+        - lines: every line of input read since the last reset
+        - asked: whether a dialogue prompt has been answered since the last reset
+    """
+    # Private Instance Attributes:
+    #   - _queued: lines to read before answering prompts
+    #   - _item: the item to use
+    #   - _answer: the answer to dialogue prompts
+    lines: list[str]
+    asked: bool
+    _queued: deque[str]
+    _item: str
+    _answer: str
+
+    def __init__(self) -> None:
+        self.render = RenderBuffer(NullSink())
+        self.reset()
+
+    def reset(self, queued: Turn = (), item: str = '', answer: str = 'yes') -> None:
+        """Forget the lines read so far, and start reading the queued lines, then answering prompts with the
+        given item and dialogue answer.
+        """
+        self.lines = []
+        self.asked = False
+        self._queued = deque(queued)
+        self._item = item
+        self._answer = answer
+
+    async def input(self, prompt: str = '') -> str:
+        if self._queued:
+            line = self._queued.popleft()
+        elif "response" in prompt:
+            self.asked = True
+            line = self._answer
+        elif "attack" in prompt:
+            line = "attack"
+        else:
+            line = self._item
+        self.lines.append(line)
+        return line
+
+    async def sleep(self, seconds: float) -> None:
+        pass
+
+
+def _all_effects(effects: Iterable[dict]) -> Iterator[dict]:
+    """Yield every effect in the given effects from game data, and in their "then" and "else" branches."""
+    for effect in effects:
+        yield effect
+        yield from _all_effects(effect.get('then', []))
+        yield from _all_effects(effect.get('else', []))
+
+
+class Estimate:
+    """A lower bound on the number of moves it takes to win a game from its current state, for an A* search.
+
+    Each puzzle a winning condition needs solved takes a turn of its own to place its item, and each item it needs
+    that isn't held takes a turn to get, or fewer if a single turn can give several of them. Only the conditions
+    with the "win" outcome whose puzzles can all be solved, by placing an item of the same name on a pedestal, are
+    counted, so the estimate is infinite in a world that can't be won.
+
+    The estimate only depends on the puzzles solved and the items held, and goes down by at most one each turn.
+    """
+    # Private Instance Attributes:
+    #   - _goals: for each winning condition, the (bit, item name) of each puzzle it needs solved, and the names
+    #       of the items it needs held
+    #   - _per_turn: the most of the items the winning conditions need that any single turn can give
+    _goals: list[tuple[tuple[tuple[int, str], ...], tuple[str, ...]]]
+    _per_turn: int
+
+    def __init__(self, game: AdventureGame) -> None:
+        world = game.world
+        self._goals = []
+        for condition in world.conditions:
+            if condition.get('outcome') != "win":
+                continue
+            when = condition['when']
+            puzzles = tuple((PUZZLE_BITS[PUZZLES.index(name)], name) for name in when.get('puzzles_solved', ()))
+            if all(self._can_place(world, name) for _, name in puzzles):
+                held = when.get('has_item', ())
+                self._goals.append((puzzles, (held,) if isinstance(held, str) else tuple(held)))
+
+        needed = {name for puzzles, held in self._goals for name in (*(name for _, name in puzzles), *held)}
+        self._per_turn = max(1, max((self._most_given(game, location_id, needed) for location_id in world.locations),
+                                    default=0))
+
+    def __call__(self, game: AdventureGame) -> float:
+        """Return the estimate for the given game's current state."""
+        best = inf
+        flags = game.state.flags
+        for puzzles, held in self._goals:
+            unsolved = [name for bit, name in puzzles if not flags & bit]
+            missing = sum(1 for name in {*unsolved, *held} if not game.inventory.has_item(name))
+            best = min(best, len(unsolved) - (-missing // self._per_turn))
+        return best
+
+    @staticmethod
+    def _can_place(world: World, name: str) -> bool:
+        """Return whether the puzzle with the given name can be solved in the given world."""
+        if name not in world.items:
+            return False
+        target = world.items[name].get_target_position()
+        return target in world.locations and world.locations[target].pedestal
+
+    @staticmethod
+    def _most_given(game: AdventureGame, location_id: int, needed: set[str]) -> int:
+        """Return the most of the needed items that a single turn at the given location can give: those given by
+        the trigger set off by every command there, and by the command's own trigger or else picked up from its
+        result.
+        """
+        triggers = [trigger for trigger in game.world.triggers if trigger['location'] == location_id]
+        commands = dict(game.world.locations[location_id].available_commands)
+        for trigger in triggers:
+            for effect in _all_effects(trigger['effects']):
+                commands.update(effect.get('set_commands', {}))
+
+        def given(trigger: dict) -> int:
+            return sum(1 for effect in _all_effects(trigger['effects'])
+                       if effect.get('give_item') in needed
+                       or isinstance(effect.get('fight'), dict) and effect['fight'].get('reward') in needed)
+
+        own = {trigger.get('command'): given(trigger) for trigger in triggers}
+        most = 0
+        for command, result in commands.items():
+            if command in own:
+                most = max(most, own[command])
+            elif isinstance(result, str):
+                most = max(most, len(needed.intersection(game.keyword_matcher.find_all(result))))
+        return own.get(None, 0) + most
+
+
+class Explorer:
+    """A game that can be moved to the state at the end of any path from the start, and asked which states
+    every possible turn from there leads to.
+
+    Moving between paths only undoes and replays the turns the paths don't share, so exploring the paths of a
+    search in order replays each turn once.
+
+    Instance Attributes:
+        - game: the game being explored
+        - path: the turns played in the game so far
+        - estimate: a lower bound on the number of moves it takes to win the game from a state
+    """
+    # Private Instance Attributes:
+    #   - _io: the IO answering the game's prompts
+    game: AdventureGame
+    path: Path
+    estimate: Estimate
+    _io: SolverIO
+
+    def __init__(self, game_data_file: str, initial_location_id: int) -> None:
+        self._io = SolverIO()
+        self.game = AdventureGame(game_data_file, initial_location_id, self._io)
+        self.path = ()
+        self.estimate = Estimate(self.game)
+
+    def goto(self, path: Path) -> None:
+        """Move the game to the end of the given path.
+
+        Preconditions:
+        - every turn in path can be played from the turns before it
+        """
+        common = 0
+        while common < min(len(path), len(self.path)) and path[common] == self.path[common]:
+            common += 1
+
+        self.game.journal.undo(len(self.path) - common)
+        for turn in path[common:]:
+            self._io.reset(turn[1:])
+            run_sync(self.game.take_turn(turn[0]))
+        self.path = path
+
+    def _play(self, command: str, item: str = '', answer: str = 'yes') -> Optional[tuple[Turn, bool]]:
+        """Play a turn with the given command, answering its prompts with the given item and dialogue answer,
+        and return the lines it read and whether the player won, or None if it crashed the game.
+        """
+        self._io.reset((), item, answer)
+        try:
+            won = run_sync(self.game.take_turn(command))
+        except Exception:  # a turn that crashes the game leads nowhere
+            self.game.journal.abort_turn()
+            return None
+        return (command, *self._io.lines), won
+
+    def _turns(self) -> Iterator[tuple[str, str]]:
+        """Yield (command, item) for every turn worth trying from the current state: every command at the
+        location, and using every item in the inventory that heals, or that belongs on a pedestal here. Using any
+        other item, and the other menu commands, never change the game's state.
+        """
+        for command in list(self.game.get_location().available_commands):
+            if command not in MENU:
+                yield command, ''
+        for name in self.game.inventory.snapshot():
+            item = self.game.inventory.get_item(name)
+            if item.heal > 0 or (item.get_target_position() == self.game.state.location_id
+                                 and is_pedestal_item(self.game, name.lower())):
+                yield "use", name.lower()
+
+    def expand(self, path: Path) -> list[tuple[Turn, Hashable, bool, float]]:
+        """Return (turn, state key, won, estimate) for every turn worth trying at the end of the given path, except
+        turns after which the player has been knocked out.
+        """
+        self.goto(path)
+        children = []
+        for command, item in self._turns():
+            for answer in ('yes', 'no'):
+                result = self._play(command, item, answer)
+                if result is None:
+                    break
+                turn, won = result
+                if won or self.game.state.health > 0:
+                    children.append((turn, self.game.state_key(), won, 0 if won else self.estimate(self.game)))
+                asked = self._io.asked
+                self.game.journal.undo()
+                if not asked:  # only try the other answer if there was a question
+                    break
+        return children
+
+
+class Dominance:
+    """The states a search has taken up to expand so far, kept so that states that are no better than one of them
+    can be skipped.
+
+    A state is no better than another if they are at the same location with the same puzzles, score and
+    inventory, and it has no more health, no more money, and no commands at any location that the other doesn't.
+    Whatever wins from it also wins from the other, in as many moves: more health only helps in combat, more money
+    only lets more purchases succeed, and commands that are still available don't change what any other command
+    does. States with the same location, puzzles and inventory have the same Estimate, so solve takes them up in
+    order of the moves they took, and a state is only skipped for one reached in no more moves.
+    """
+    # Private Instance Attributes:
+    #   - _world: the world being searched, for the commands at locations a state hasn't changed
+    #   - _seen: the keys of every state taken up so far
+    #   - _best: for the rest of each state's key, the (health, money, commands) of each state taken up so far
+    #       that was not already known to be no better than another
+    _world: World
+    _seen: set[Hashable]
+    _best: dict[tuple, list[tuple[float, int, dict[int, frozenset]]]]
+
+    def __init__(self, world: World) -> None:
+        self._world = world
+        self._seen = set()
+        self._best = {}
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, key: tuple) -> bool:
+        """Record that the state with the given AdventureGame.state_key has been taken up, and return whether it
+        is worth expanding: that is, whether it is better than every state taken up before it in some way.
+        """
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+
+        *rest, health, money, commands = key
+        rest = tuple(rest)
+        commands = dict(commands)
+        best = self._best.setdefault(rest, [])
+        if any(health <= other_health and money <= other_money and self._fewer_commands(commands, other_commands)
+               for other_health, other_money, other_commands in best):
+            return False
+        best.append((health, money, commands))
+        return True
+
+    def _fewer_commands(self, commands: dict[int, frozenset], others: dict[int, frozenset]) -> bool:
+        """Return whether every command available in a state whose changed commands are given by commands is also
+        available in one whose changed commands are given by others.
+        """
+        for location_id in commands.keys() | others.keys():
+            base = self._world.locations[location_id].available_commands.items()
+            if not commands.get(location_id, base) <= others.get(location_id, base):
+                return False
+        return True
+
+
+@dataclass
+class Solution:
+    """The result of a search for the shortest way to win.
+
+    Instance Attributes:
+        - turns: the turns of a shortest winning walkthrough, or None if the game can't be won in time
+        - states: the number of distinct states the search took up, including the ones it skipped
+        - frontier_sizes: the number of states the search expanded at each depth
+    """
+    turns: Optional[list[Turn]]
+    states: int
+    frontier_sizes: list[int] = field(default_factory=list)
+
+    @property
+    def moves(self) -> Optional[int]:
+        """The number of moves the walkthrough takes, or None if there isn't one."""
+        return None if self.turns is None else len(self.turns)
+
+    def commands(self) -> list[str]:
+        """Return the walkthrough as the lines a player would type, or an empty list if there isn't one."""
+        return [line for turn in self.turns or [] for line in turn]
+
+
+_explorer: Optional[Explorer] = None
+
+
+def _start_worker(game_data_file: str, initial_location_id: int) -> None:
+    """Create the explorer used by this worker process."""
+    global _explorer
+    _explorer = Explorer(game_data_file, initial_location_id)
+
+
+def _expand_chunk(paths: list[Path]) -> list[list[tuple[Turn, Hashable, bool, float]]]:
+    """Expand every path in a chunk of the frontier with this worker's explorer."""
+    return [_explorer.expand(path) for path in paths]
+
+
+def _chunks(frontier: list[Path], count: int) -> list[list[Path]]:
+    """Split the frontier into about count chunks of paths that are next to each other, so that the paths in a
+    chunk share as many turns as possible.
+    """
+    size = max(1, -(-len(frontier) // count))
+    return [frontier[i:i + size] for i in range(0, len(frontier), size)]
+
+
+def solve(game_data_file: str, initial_location_id: int = 1, max_moves: int = MOVE_LIMIT,
+          processes: Optional[int] = 1) -> Solution:
+    """Return a shortest way to win the game in at most max_moves moves, found by an A* search of its states.
+
+    Paths are expanded in order of the moves they take plus the Estimate of the moves left after them, and of the
+    moves they take among equals, so that the first win found is a shortest one. States are compared by
+    AdventureGame.state_key, so each state is only expanded the first time it is reached in the fewest moves, and
+    states that are no better than one already expanded are not expanded at all (see Dominance).
+    The paths with the same moves and estimate are expanded together, across processes worker processes, or in
+    this process if processes is 1. If processes is None, one worker is used for each core.
+    """
+    start = Explorer(game_data_file, initial_location_id)
+    seen = Dominance(start.game.world)
+    # the (path, state key) of each path not expanded yet, by (moves plus estimate, moves)
+    unexpanded: dict[tuple[float, int], list[tuple[Path, Hashable]]] = {
+        (start.estimate(start.game), 0): [((), start.game.state_key())]}
+    frontier_sizes = []
+
+    workers = processes or os.cpu_count() or 1
+    pool = None if workers == 1 else Pool(workers, _start_worker, (game_data_file, initial_location_id))
+    try:
+        while unexpanded:
+            bound, moves = min(unexpanded)
+            if bound > max_moves:
+                break
+            frontier = sorted(path for path, key in unexpanded.pop((bound, moves)) if seen.add(key))
+            frontier_sizes.extend([0] * (moves + 1 - len(frontier_sizes)))
+            frontier_sizes[moves] += len(frontier)
+            if pool is None:
+                expanded = [start.expand(path) for path in frontier]
+            else:
+                chunks = _chunks(frontier, workers * 4)
+                expanded = [children for chunk in pool.imap(_expand_chunk, chunks) for children in chunk]
+
+            for path, children in zip(frontier, expanded):
+                for turn, key, won, estimate in children:
+                    if won:  # nothing left unexpanded can win in fewer moves
+                        return Solution(list(path + (turn,)), len(seen), frontier_sizes)
+                    if moves + 1 + estimate <= max_moves:
+                        unexpanded.setdefault((moves + 1 + estimate, moves + 1), []).append((path + (turn,), key))
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return Solution(None, len(seen), frontier_sizes)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Solve a game from the command line, and print its shortest walkthrough and the expected log of location
+    IDs a simulation of it produces.
+    """
+    from proj1_batch_simulation import run_script
+
+    parser = argparse.ArgumentParser(description="Find the shortest winning walkthrough of the adventure game.")
+    parser.add_argument("--world", default="game_data.json", help="the game data file")
+    parser.add_argument("--start", type=int, default=1, help="the starting location ID")
+    parser.add_argument("--max-moves", type=int, default=MOVE_LIMIT, help="the most moves to search")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    solution = solve(args.world, args.start, args.max_moves, args.processes)
+    print(f"Searched {solution.states} states")
+    if solution.turns is None:
+        print(f"The game can't be won in {args.max_moves} moves.")
+        return
+
+    print(f"Shortest walkthrough ({solution.moves} moves):")
+    print(solution.commands())
+    print("Expected log:")
+    print(run_script("solution", solution.commands(), args.world, args.start).id_log)
+
+
+if __name__ == "__main__":
+    main()
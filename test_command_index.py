@@ -0,0 +1,141 @@
+"""Tests for resolving and correcting what a player types with command_index."""
+from __future__ import annotations
+import itertools
+import random
+
+import pytest
+
+from command_index import BKTree, CommandIndex, CommandTrie, edit_distance
+
+COMMANDS = ["check clothes", "check box", "check papers", "go east", "go west", "talk to the person studying"]
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("", "", 0),
+    ("", "look", 4),
+    ("look", "look", 0),
+    ("go east", "go eats", 2),
+    ("go east", "go west", 2),
+    ("check box", "chek box", 1),
+    ("inventory", "inventroy", 2),
+])
+def test_edit_distance(a: str, b: str, distance: int) -> None:
+    """The edit distance is the fewest insertions, deletions and substitutions, whichever way round it is taken."""
+    assert edit_distance(a, b) == distance
+    assert edit_distance(b, a) == distance
+
+
+def test_edit_distance_limit() -> None:
+    """With a limit, distances up to it are exact, and any distance over it is at least limit + 1."""
+    words = ["", "go", "look", "go east", "go west", "inventory", "check box", "check papers"]
+    for a, b in itertools.product(words, repeat=2):
+        distance = edit_distance(a, b)
+        for limit in range(4):
+            limited = edit_distance(a, b, limit)
+            assert limited == distance if distance <= limit else limited > limit
+
+
+def test_trie_unique_and_ambiguous_prefixes() -> None:
+    """A prefix that starts exactly one command completes to it; one that starts several or none completes to
+    nothing.
+    """
+    trie = CommandTrie(COMMANDS)
+    assert trie.count("") == len(COMMANDS) and trie.count("check") == 3 and trie.count("sing") == 0
+    assert trie.complete("check b") == "check box"
+    assert trie.complete("t") == "talk to the person studying"
+    assert trie.complete("check") is None
+    assert trie.complete("go") is None
+    assert trie.complete("sing") is None
+    assert trie.completions("check", 2) == ["check box", "check clothes"]
+
+
+def test_trie_command_that_prefixes_another() -> None:
+    """A prefix that is a command completes to it, even when longer commands start with it."""
+    trie = CommandTrie(["use", "use sword"])
+    assert trie.complete("use") == "use"
+    assert trie.complete("use s") == "use sword"
+    trie.remove("use")
+    assert "use" not in trie and trie.complete("us") == "use sword"
+
+
+def test_trie_remove_and_add_again() -> None:
+    """Removing a command makes a prefix it shared unique, and adding it back makes the prefix ambiguous again."""
+    trie = CommandTrie(COMMANDS)
+    trie.remove("check box")
+    trie.remove("check box")  # removing a command that isn't there changes nothing
+    assert "check box" not in trie and trie.count("check") == 2 and trie.complete("check b") is None
+    trie.remove("check clothes")
+    assert trie.complete("check") == "check papers"
+    trie.add("check box")
+    trie.add("check box")
+    assert trie.count("check") == 2 and trie.complete("check") is None and trie.complete("check b") == "check box"
+
+
+def test_bk_tree_matches_brute_force() -> None:
+    """The tree finds exactly the commands within the edit distance that comparing with every command does, as
+    commands are removed, including once enough are removed that the tree is rebuilt, and added back.
+    """
+    rng = random.Random(0)
+    words = ["go", "look", "take", "use", "talk", "check", "east", "west", "box", "sword", "tea"]
+    commands = sorted({" ".join(rng.choices(words, k=rng.randint(1, 3))) for _ in range(200)})
+    tree, present = BKTree(commands), set(commands)
+
+    def check() -> None:
+        for text in rng.sample(commands, 8) + ["lok", "go eats", "chek box", ""]:
+            for max_distance in range(3):
+                expected = sorted((edit_distance(text, command), command) for command in present
+                                  if edit_distance(text, command) <= max_distance)
+                assert tree.search(text, max_distance) == expected
+
+    check()
+    for command in rng.sample(commands, len(commands) * 3 // 4):
+        tree.remove(command)
+        present.discard(command)
+    check()
+    for command in rng.sample(commands, len(commands) // 2):
+        tree.add(command)
+        present.add(command)
+    check()
+
+
+def test_index_suggestions() -> None:
+    """Suggestions are the commands a line starts, then the commands close to it, kept up to date as commands are
+    added and removed after the first suggestion.
+    """
+    index = CommandIndex(COMMANDS)
+    assert index.complete("") is None
+    assert index.suggest("check") == [(0, "check box"), (0, "check clothes"), (0, "check papers")]
+    assert index.suggest("chek box") == [(1, "check box")]
+    assert index.suggest("go eat") == [(1, "go east"), (2, "go west")]
+    index.remove("check box")
+    assert index.suggest("chek box") == []
+    index.add("check box")
+    assert index.suggest("chek box") == [(1, "check box")]
+
+
+def test_game_resolves_unique_prefixes(new_game) -> None:
+    """A game takes a prefix of exactly one command at the player's location or in the menu as that command, but
+    not an ambiguous prefix, and never a prefix of quit.
+    """
+    game = new_game()
+    assert game.resolve_choice("check b") == "check box"
+    assert game.resolve_choice("inv") == "inventory"
+    assert game.resolve_choice("go east") == "go east"
+    assert game.resolve_choice("check") is None
+    assert game.resolve_choice("") is None
+    assert game.resolve_choice("q") is None and game.resolve_choice("qui") is None
+    assert game.resolve_choice("quit") == "quit"
+
+
+def test_game_suggestions_follow_undo(new_game, play) -> None:
+    """Suggestions and prefixes follow the commands at the player's location as a turn removes one, and undoing
+    and redoing the turn puts it back and takes it away again.
+    """
+    game = new_game()
+    assert game.suggest_choices("chek box") == ["check box"]
+    play(game, "check box")
+    assert game.suggest_choices("chek box") == [] and game.resolve_choice("check b") is None
+    play(game, "undo")
+    assert game.suggest_choices("chek box") == ["check box"] and game.resolve_choice("check b") == "check box"
+    play(game, "redo")
+    assert game.suggest_choices("chek box") == [] and game.resolve_choice("check b") is None
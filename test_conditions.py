@@ -0,0 +1,51 @@
+"""Tests for the error messages of the condition validators in conditions."""
+from __future__ import annotations
+from typing import Any
+
+import pytest
+
+from conditions import validate_clauses, validate_conditions
+
+LOCATION_IDS = {1, 2}
+ITEM_NAMES = {"hat", "scarf"}
+
+
+@pytest.mark.parametrize("when, problems", [
+    ({"has_item": "hat", "lacks_item": ["scarf"], "at": [1], "not_at": [1, 2], "puzzles_solved": ["book"],
+      "moves": 3}, []),
+    ([], ["'when' must be an object"]),
+    ({"has_item": []}, ["'has_item' must be an item name or a list of them"]),
+    ({"lacks_item": 3}, ["'lacks_item' must be an item name or a list of them"]),
+    ({"has_item": ["hat", "boots", 7]}, ["unknown item 'boots'", "unknown item 7"]),
+    ({"at": 1}, ["'at' must be a list of location ids"]),
+    ({"not_at": [1, 3]}, ["'not_at' must be a list of location ids"]),
+    ({"at": [True]}, ["'at' must be a list of location ids"]),
+    ({"puzzles_solved": ["book", "sock"]},
+     ["'puzzles_solved' must be a list of puzzles out of ('book', 'orange', 'torch', 'shield')"]),
+    ({"moves": "3"}, ["'moves' must be a number of moves"]),
+    ({"moves": False}, ["'moves' must be a number of moves"]),
+    ({"weather": "rain", "has_item": "boots"}, ["unknown clause 'weather'", "unknown item 'boots'"]),
+])
+def test_validate_clauses(when: Any, problems: list[str]) -> None:
+    """Each thing wrong with a "when" object is described, in order."""
+    assert validate_clauses(when, LOCATION_IDS, ITEM_NAMES) == problems
+
+
+@pytest.mark.parametrize("conditions, problems", [
+    ([{"when": {"moves": 60}, "outcome": "lose"},
+      {"when": {"has_item": "hat"}, "message": "Nice hat.", "unlock": {"go up": 2}}], []),
+    ({"when": {"moves": 60}}, ["conditions must be a list"]),
+    (["moves"], ["condition #0 must be an object with a 'when' object"]),
+    ([{"when": {"moves": 1}}, {"message": "Hi"}], ["condition #1 must be an object with a 'when' object"]),
+    ([{"when": {"has_item": "boots"}}], ["condition #0: unknown item 'boots'"]),
+    ([{"when": {}, "message": 5}], ["condition #0: 'message' must be some text"]),
+    ([{"when": {}, "unlock": {"go up": 3}}], ["condition #0: 'unlock' must map commands to location ids"]),
+    ([{"when": {}, "unlock": ["go up"]}], ["condition #0: 'unlock' must map commands to location ids"]),
+    ([{"when": {}, "outcome": "draw"}], ["condition #0: unknown outcome 'draw'"]),
+    ([{"when": {"at": 2, "moves": None}, "message": [], "outcome": "tie"}],
+     ["condition #0: 'at' must be a list of location ids", "condition #0: 'moves' must be a number of moves",
+      "condition #0: 'message' must be some text", "condition #0: unknown outcome 'tie'"]),
+])
+def test_validate_conditions(conditions: Any, problems: list[str]) -> None:
+    """Each thing wrong with the conditions is described, with the condition it is in."""
+    assert validate_conditions(conditions, LOCATION_IDS, ITEM_NAMES) == problems
@@ -0,0 +1,54 @@
+"""Tests for logging events to a file with event_store."""
+from __future__ import annotations
+import random
+
+from event_store import INDEX_EVERY, StreamingEventList, read_id_log
+from proj1_event_logger import Event, EventList
+
+
+def _add_events(game, event_lists: list[EventList], count: int, rng: random.Random) -> None:
+    """Add the same count of new events at random locations to each of the given event lists."""
+    for _ in range(count):
+        id_num, command = rng.randint(1, 20), rng.choice(["go east", "go west", "look", None])
+        for events in event_lists:
+            events.add_event(Event(id_num, game), command if not events.is_empty() else None)
+
+
+def test_streaming_event_list_matches_event_list(tmp_path, new_game) -> None:
+    """A streaming event list logs the same events as an event list kept in memory, as more events are added than
+    it keeps in memory and than are between the entries of its index, and as events are removed, including ones
+    it no longer keeps in memory.
+    """
+    game, rng = new_game(), random.Random(0)
+    filename = str(tmp_path / "events.log")
+    memory, streaming = EventList(), StreamingEventList(filename)
+    _add_events(game, [memory, streaming], streaming.window + 2 * INDEX_EVERY + 3, rng)
+
+    memory.remove_last_event()
+    streaming.remove_last_event()
+    assert read_id_log(filename) == streaming.get_id_log() == memory.get_id_log()
+    assert list(streaming.entries()) == list(memory.entries())
+
+    for _ in range(streaming.window):  # down past every event the streaming list kept in memory
+        memory.remove_last_event()
+        streaming.remove_last_event()
+    assert read_id_log(filename) == memory.get_id_log()
+    for start in (0, INDEX_EVERY - 1, INDEX_EVERY, INDEX_EVERY + 1, len(memory.get_id_log()) - 1):
+        assert list(streaming.entries(start)) == list(memory.entries(start))
+
+    _add_events(game, [memory, streaming], 5, rng)
+    streaming.close()
+    assert read_id_log(filename) == memory.get_id_log()
+    assert list(streaming.entries()) == list(memory.entries())
+
+
+def test_streaming_event_list_remove_everything(tmp_path, new_game) -> None:
+    """Removing every event from a streaming event list, even with a window of one event, leaves its log empty."""
+    game, rng = new_game(), random.Random(1)
+    filename = str(tmp_path / "events.log")
+    streaming = StreamingEventList(filename, window=1)
+    _add_events(game, [streaming], INDEX_EVERY + 1, rng)
+    while not streaming.is_empty():
+        streaming.remove_last_event()
+    streaming.remove_last_event()  # removing from an empty list does nothing
+    assert read_id_log(filename) == [] and list(streaming.entries()) == []
@@ -0,0 +1,222 @@
+"""Tests for undoing, redoing and aborting turns with journal and the undo and redo menu commands."""
+from __future__ import annotations
+
+from game_updates import update_game_state, update_player_state
+from journal import Journal, MISSING
+from world import CommandOverlay
+
+
+def _record_dict(journal: Journal, values: dict, key: str, value: object) -> None:
+    """Set values[key] to value, recording the change in the journal, or delete it if value is MISSING."""
+    def restore(k: str, v: object) -> None:
+        if v is MISSING:
+            values.pop(k, None)
+        else:
+            values[k] = v
+
+    journal.record(restore, key, values.get(key, MISSING), value)
+    restore(key, value)
+
+
+def test_journal_undo_redo() -> None:
+    """Turns are undone most recent first, and redone least recently undone first."""
+    journal, values = Journal(), {}
+    for turn in range(3):
+        journal.begin_turn()
+        _record_dict(journal, values, "turn", turn)
+        _record_dict(journal, values, f"key {turn}", turn)
+        journal.end_turn()
+
+    assert journal.undo(2) == 2
+    assert values == {"turn": 0, "key 0": 0}
+    assert journal.redo() == 1
+    assert values == {"turn": 1, "key 0": 0, "key 1": 1}
+    assert journal.undo(10) == 2
+    assert values == {} and not journal.can_undo()
+    assert journal.redo(10) == 3
+    assert values == {"turn": 2, "key 0": 0, "key 1": 1, "key 2": 2} and not journal.can_redo()
+
+
+def test_journal_new_turn_forgets_redo() -> None:
+    """Once a turn that changes something is played, the turns undone before it can't be redone."""
+    journal, values = Journal(), {}
+    for value in (1, 2):
+        journal.begin_turn()
+        _record_dict(journal, values, "x", value)
+        journal.end_turn()
+    journal.undo()
+
+    journal.begin_turn()
+    journal.end_turn()  # a turn that changed nothing isn't recorded, so the undone turn can still be redone
+    assert journal.can_redo()
+
+    journal.begin_turn()
+    _record_dict(journal, values, "x", 3)
+    journal.end_turn()
+    assert not journal.can_redo() and journal.redo() == 0
+    assert journal.undo() == 1 and values == {"x": 1}
+
+
+def test_journal_max_turns() -> None:
+    """Only the most recent max_turns turns can be undone."""
+    journal, values = Journal(max_turns=2), {}
+    for value in range(5):
+        journal.begin_turn()
+        _record_dict(journal, values, "x", value)
+        journal.end_turn()
+    assert journal.undo(5) == 2
+    assert values == {"x": 2}
+
+
+def test_journal_abort_turn() -> None:
+    """Aborting a turn puts back everything it changed so far, and it can't be redone."""
+    journal, values = Journal(), {"x": 0}
+    journal.begin_turn()
+    _record_dict(journal, values, "x", 1)
+    _record_dict(journal, values, "y", 2)
+    assert journal.is_recording()
+    journal.abort_turn()
+
+    assert values == {"x": 0}
+    assert not journal.is_recording() and not journal.can_undo() and not journal.can_redo()
+
+
+def test_journal_rewind_to_checkpoint() -> None:
+    """Rewinding to a checkpoint puts back the state and the turns that could be undone and redone then, even after
+    other turns were played from an earlier point.
+    """
+    journal, values = Journal(), {}
+    for value in (1, 2, 3):
+        journal.begin_turn()
+        _record_dict(journal, values, "x", value)
+        journal.end_turn()
+    journal.undo()
+    checkpoint = journal.checkpoint()
+
+    journal.undo()
+    journal.begin_turn()
+    _record_dict(journal, values, "y", 4)
+    journal.end_turn()
+    journal.rewind(checkpoint)
+    assert values == {"x": 2}
+    assert journal.redo() == 1 and values == {"x": 3}
+    assert journal.undo(10) == 3 and values == {}
+
+    journal.rewind(checkpoint)
+    assert values == {"x": 2}
+    journal.rewind()
+    assert values == {} and not journal.can_undo() and not journal.can_redo()
+
+
+def test_changes_outside_turns_are_not_recorded() -> None:
+    """Changes made outside a turn aren't recorded, so they can't be undone."""
+    journal, values = Journal(), {}
+    _record_dict(journal, values, "x", 1)
+    journal.begin_turn()
+    journal.end_turn()
+    assert not journal.can_undo()
+
+
+def test_undo_redo_moves(new_game, play, snapshot) -> None:
+    """Undoing moves puts the player back where they were, with the moves taken back too."""
+    game = new_game()
+    start = snapshot(game)
+    play(game, "go east", "go east")
+    after = snapshot(game)
+    assert game.state.location_id == 3 and game.state.moves == 2
+
+    play(game, "undo 2")
+    assert snapshot(game) == start
+    play(game, "redo 2")
+    assert snapshot(game) == after
+
+
+def test_undo_redo_inventory_money_and_commands(new_game, play, snapshot) -> None:
+    """Undoing a purchase puts back the money, the inventory and the commands the purchase changed."""
+    game = new_game()
+    play(game, "check box", "go east", "go east", "go north", "wait in line")
+    before = snapshot(game)
+    assert "order tea for lions" in game.get_location().available_commands
+
+    play(game, "order tea for lions")
+    after = snapshot(game)
+    assert game.inventory.has_item("tea for lions") and game.inventory.get_money() == before[4] - 3
+
+    play(game, "undo")
+    assert snapshot(game) == before and not game.inventory.has_item("tea for lions")
+    play(game, "redo")
+    assert snapshot(game) == after
+
+    play(game, "undo 3")
+    assert "order tea for lions" not in game.get_location().available_commands
+    play(game, "redo 3")
+    assert snapshot(game) == after
+
+
+def test_undo_commands_set_again(new_game, play, snapshot) -> None:
+    """Setting commands that are already there again, and undoing it, leaves them in the same order."""
+    game = new_game()
+    play(game, "check box", "go east", "go east", "go north", "wait in line", "order tea for lions")
+    commands = snapshot(game)[-2]
+    play(game, "wait in line")  # sets the same commands again, which must not change their order
+    assert snapshot(game)[-2] == commands
+    play(game, "undo")
+    assert snapshot(game)[-2] == commands
+
+
+def test_nothing_to_undo_or_redo(new_game, play, snapshot) -> None:
+    """Undo and redo say so when there is nothing to undo or redo, and don't use up a move."""
+    game = new_game()
+    play(game, "undo", "redo")
+    assert "No actions to undo." in game.io.getvalue()
+    assert "No actions to redo." in game.io.getvalue()
+    assert game.state.moves == 0
+
+
+def test_abort_turn_in_game(new_game, snapshot) -> None:
+    """Aborting a turn part of the way through puts back the state, inventory and commands it changed."""
+    game = new_game()
+    before = snapshot(game)
+    location = game.get_location()
+
+    game.journal.begin_turn()
+    update_game_state(game, moves=game.state.moves + 1, location_id=2)
+    update_player_state(game, health=game.state.health - 3)
+    game.inventory.add_item("sword", game._items, game.state.score)
+    location.available_commands["dance"] = "You dance."
+    del location.available_commands["check box"]
+    game.journal.abort_turn()
+
+    assert snapshot(game) == before
+    assert not game.journal.can_undo()
+
+
+def test_command_overlay_undo_keeps_order() -> None:
+    """Undoing the removal of a command added by a session puts it back where it was, before the commands added
+    after it.
+    """
+    journal = Journal()
+    overlay = CommandOverlay({"look": "You look.", "go east": 2}, journal)
+    turns = [
+        lambda: overlay.update({"a": 1, "b": 2, "c": 3}),
+        lambda: overlay.__delitem__("a"),
+        lambda: overlay.__delitem__("look"),
+        lambda: overlay.__setitem__("look", "You look again."),
+        overlay.clear,
+        lambda: overlay.__setitem__("d", 4),
+    ]
+    states = [list(overlay.items())]
+    for turn in turns:
+        journal.begin_turn()
+        turn()
+        journal.end_turn()
+        states.append(list(overlay.items()))
+
+    for state in reversed(states[:-1]):
+        journal.undo()
+        assert list(overlay.items()) == state
+        assert overlay.listing() == ''.join(f"- {command}\n" for command, _ in state)
+        assert all(overlay.index().count(command) >= 1 for command, _ in state)
+    for state in states[1:]:
+        journal.redo()
+        assert list(overlay.items()) == state
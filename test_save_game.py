@@ -0,0 +1,99 @@
+"""Tests for saving and loading games in save_game."""
+from __future__ import annotations
+import marshal
+
+import pytest
+
+from proj1_simulation import WALKTHROUGHS
+from save_game import AutoSaver, SaveError, SAVE_VERSION, _FRAME, _HEADER, _MAGIC, load, read_frames, save
+
+def test_save_then_load_round_trips(tmp_path, new_game, play, snapshot) -> None:
+    """A game loaded from a save has the same state, inventory, commands and event log as the game saved."""
+    filename = str(tmp_path / "game.sav")
+    game = new_game()
+    play(game, *WALKTHROUGHS["win"][:12])  # far enough to have bought tea, so money, items and commands have changed
+    save(game, filename)
+    loaded = new_game()
+    load(loaded, filename)
+
+    assert game._locations.changes() and len(game.event_log.get_id_log()) > 1
+    assert snapshot(loaded) == snapshot(game)
+    assert loaded.state.ongoing
+
+
+def test_resume_after_checkpoints(tmp_path, new_game, play, snapshot) -> None:
+    """A game resumed from an autosave carries on the same way as the game that was saved."""
+    script = WALKTHROUGHS["win"]
+    answers = {13, 15, 16}  # the lines that answer a turn: "yes" to the two people talked to, and the fight after
+    choices = [line for i, line in enumerate(script) if i not in answers]
+    filename = str(tmp_path / "game.sav")
+    game = new_game(*(script[i] for i in sorted(answers)))
+    saver = AutoSaver(filename)
+    for choice in choices[:20]:
+        play(game, choice)
+        saver.checkpoint(game)
+    saver.close()
+    assert len(read_frames(filename)) > 1
+
+    resumed = new_game()
+    assert AutoSaver(filename).resume(resumed)
+    assert snapshot(resumed) == snapshot(game)
+
+    play(game, *choices[20:25])
+    play(resumed, *choices[20:25])
+    assert snapshot(resumed) == snapshot(game)
+
+
+def test_resume_without_save_file(tmp_path, new_game, snapshot) -> None:
+    """Resuming from a save file that doesn't exist leaves the game as it started."""
+    game = new_game()
+    before = snapshot(game)
+    assert not AutoSaver(str(tmp_path / "missing.sav")).resume(game)
+    assert snapshot(game) == before
+
+
+@pytest.mark.parametrize("corrupt, message", [
+    # a different magic number
+    (lambda data: b"XXXX" + data[len(_MAGIC):], "is not a save file this version of the game can read"),
+    # the only frame torn off part of the way through
+    (lambda data: data[:-1], "holds no saved game"),
+    # the only frame's payload overwritten
+    (lambda data: data[:_HEADER.size + _FRAME.size] + b"\xff" * (len(data) - _HEADER.size - _FRAME.size),
+     "holds no saved game"),
+])
+def test_corrupt_save_raises(tmp_path, corrupt, message, new_game, play, snapshot) -> None:
+    """Loading a damaged save file raises SaveError, and leaves the game as it was."""
+    filename = str(tmp_path / "game.sav")
+    played = new_game()
+    play(played, *WALKTHROUGHS["win"][:6])
+    save(played, filename)
+    with open(filename, 'rb') as f:
+        data = f.read()
+    with open(filename, 'wb') as f:
+        f.write(corrupt(data))
+
+    game = new_game()
+    before = snapshot(game)
+    with pytest.raises(SaveError, match=message):
+        load(game, filename)
+    assert snapshot(game) == before
+
+
+def test_save_from_another_world_raises(tmp_path, new_game, play, snapshot) -> None:
+    """Loading a save whose inventory has an item the world doesn't raises SaveError, and leaves the game as it
+    was.
+    """
+    filename = str(tmp_path / "game.sav")
+    game = new_game()
+    play(game, *WALKTHROUGHS["win"][:3])
+    save(game, filename)
+    state, _, money, commands, events = read_frames(filename)[0]
+    payload = marshal.dumps((state, ("pencil", "flux capacitor"), money, commands, events))
+    with open(filename, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, SAVE_VERSION, marshal.version) + _FRAME.pack(len(payload)) + payload)
+
+    game = new_game()
+    before = snapshot(game)
+    with pytest.raises(SaveError, match="was saved in a different world, or is damaged"):
+        load(game, filename)
+    assert snapshot(game) == before
@@ -0,0 +1,108 @@
+"""Tests for the error messages of the trigger validator in triggers, and how game data reports them."""
+from __future__ import annotations
+import json
+from typing import Any
+
+import pytest
+
+from triggers import EFFECT_KINDS, validate_triggers
+from world_compiler import GameDataError, load_records
+
+LOCATIONS = {1: {"wave": "You wave.", "go east": 2}, 2: {"go west": 1}}
+ITEM_NAMES = {"hat", "sword"}
+
+
+def _trigger(*effects: dict, **fields: Any) -> dict:
+    """Return a trigger at location 1 for "wave" with the given effects and any other fields given."""
+    return {"location": 1, "command": "wave", "effects": list(effects), **fields}
+
+
+@pytest.mark.parametrize("effect, problem", [
+    ({"say": "You have ${money} {hat}"},
+     "'say' must be some text, with only {money} in braces: 'You have ${money} {hat}'"),
+    ({"say": 3}, "'say' must be some text, with only {money} in braces: 3"),
+    ({"pause": "1"}, "'pause' must be a number"),
+    ({"give_money": True}, "'give_money' must be a number"),
+    ({"pay": None, "then": []}, "'pay' must be a number"),
+    ({"give_item": "boots"}, "'give_item': unknown item 'boots'"),
+    ({"take_item": ["hat"]}, "'take_item': unknown item ['hat']"),
+    ({"fight": {"enemy": "troll", "health": 10}},
+     "'fight' must give an enemy, with its health and attack as whole numbers"),
+    ({"fight": {"enemy": "troll", "health": 10, "attack": 0.5}},
+     "'fight' must give an enemy, with its health and attack as whole numbers"),
+    ({"fight": {"enemy": "troll", "health": -1, "attack": 1}},
+     "'fight' must give an enemy, with its health and attack as whole numbers"),
+    ({"fight": {"enemy": 7, "health": 10, "attack": 1}},
+     "'fight' must give an enemy, with its health and attack as whole numbers"),
+    ({"fight": {"enemy": "troll", "health": 10, "attack": 1, "reward": "gold"}}, "'fight': unknown reward 'gold'"),
+    ({"set_commands": ["dance"]}, "'set_commands' must be an object of commands and their results"),
+    ({"set_commands": {"go north": 9}}, "'set_commands': 'go north' must give a location id or some text"),
+    ({"set_commands": {"dance": None}}, "'set_commands': 'dance' must give a location id or some text"),
+    ({"clear_commands": 1}, "'clear_commands' must be true"),
+    ({"if": {"has_item": "boots"}}, "unknown item 'boots'"),
+    ({"if": {"weather": "rain"}}, "unknown clause 'weather'"),
+    ({"say": "Hi", "then": []}, "only 'if' and 'pay' effects can have 'then' and 'else'"),
+    ({"shout": "Hi"}, f"an effect must be an object with exactly one of {', '.join(EFFECT_KINDS)}"),
+    ({"say": "Hi", "pause": 1}, f"an effect must be an object with exactly one of {', '.join(EFFECT_KINDS)}"),
+    ("say", f"an effect must be an object with exactly one of {', '.join(EFFECT_KINDS)}"),
+])
+def test_malformed_effect(effect: Any, problem: str) -> None:
+    """Each malformed effect is described, with the trigger it is in."""
+    assert validate_triggers([_trigger(effect)], LOCATIONS, ITEM_NAMES) == [f"trigger #0: {problem}"]
+
+
+def test_nested_effects() -> None:
+    """Effects in the branches of "if" and "pay" effects are checked too."""
+    effect = {"if": {"has_item": "hat"}, "then": [{"give_item": "boots"}],
+              "else": [{"pay": 5, "then": [{"pause": "x"}], "else": [{"clear_commands": False}]}]}
+    assert validate_triggers([_trigger(effect)], LOCATIONS, ITEM_NAMES) == [
+        "trigger #0: 'give_item': unknown item 'boots'",
+        "trigger #0: 'pause' must be a number",
+        "trigger #0: 'clear_commands' must be true",
+    ]
+
+
+@pytest.mark.parametrize("triggers, problems", [
+    ([_trigger({"say": "Hi"}), _trigger({"give_item": "hat"}, command="dance"), {"location": 2, "effects": []},
+      {"location": 1, "effects": [{"set_commands": {"dance": "You dance."}}]}], []),
+    ({"location": 1}, ["triggers must be a list"]),
+    ([3], ["trigger #0 must be an object with a location id, and a command if any"]),
+    ([{"location": "1", "effects": []}], ["trigger #0 must be an object with a location id, and a command if any"]),
+    ([{"location": 3, "effects": []}], ["trigger #0 must be an object with a location id, and a command if any"]),
+    ([_trigger(command=["wave"])], ["trigger #0 must be an object with a location id, and a command if any"]),
+    ([{"location": 1, "command": "wave"}], ["trigger #0: effects must be a list"]),
+    ([_trigger(), _trigger()], ["trigger #1: there is already a trigger for 'wave' at location 1"]),
+    ([{"location": 2, "effects": []}, {"location": 2, "effects": []}],
+     ["trigger #1: there is already a trigger for None at location 2"]),
+    ([_trigger(dialogue="yes")], ["trigger #0: 'dialogue' must be true or false"]),
+    ([_trigger(command="go east")], ["trigger #0: 'go east' is a move, so it can't set off a trigger"]),
+    ([_trigger(command="dance")], ["trigger #0: 'dance' is never available at location 1"]),
+    ([_trigger(command="wave", location=2)], ["trigger #0: 'wave' is never available at location 2"]),
+])
+def test_malformed_triggers(triggers: Any, problems: list[str]) -> None:
+    """Each malformed trigger is described, and commands set by a location's triggers can set off others there."""
+    assert validate_triggers(triggers, LOCATIONS, ITEM_NAMES) == problems
+
+
+def test_game_data_error_lists_problems(tmp_path) -> None:
+    """Loading game data with a malformed location, triggers and conditions raises GameDataError listing every
+    problem.
+    """
+    data = {
+        "locations": [{"id": 1, "name": "Room", "brief_description": "A room.", "long_description": "A room.",
+                       "available_commands": {"wave": "You wave."}, "items": [], "pedestal": "yes"}],
+        "items": [],
+        "conditions": [{"when": {"moves": "many"}, "outcome": "lose"}],
+        "triggers": [{"location": 1, "command": "wave", "effects": [{"fight": {"enemy": "troll"}}]}],
+    }
+    filename = tmp_path / "game_data.json"
+    filename.write_text(json.dumps(data))
+
+    with pytest.raises(GameDataError) as error:
+        load_records(str(filename))
+    assert error.value.problems == [
+        "location 1: 'pedestal' must be true or false",
+        "condition #0: 'moves' must be a number of moves",
+        "trigger #0: 'fight' must give an enemy, with its health and attack as whole numbers",
+    ]
+    assert str(error.value).startswith(f"{filename} has 3 problem(s):\n")
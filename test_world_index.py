@@ -0,0 +1,73 @@
+"""Tests for reading worlds from the indexed world files written by world_index."""
+from __future__ import annotations
+import json
+
+from game_entities import Item, Location
+from world import CACHE_SIZE, WORLD_CACHE_SIZE, IndexedWorld, World, load_game_data
+from world_generator import generate_world
+from world_index import build_index
+
+ITEM_FIELDS = ("name", "description", "start_position", "target_position", "target_points", "damage", "heal",
+               "damage_bonus", "use_message", "item_id")
+
+
+def _location_data(location: Location) -> tuple:
+    """Return everything about the given location that is read from game data."""
+    return (location.location_id, location.name, location.brief_description, location.long_description,
+            dict(location.available_commands), [item.name for item in location.items], location.pedestal)
+
+
+def _item_data(item: Item) -> tuple:
+    """Return everything about the given item that is read from game data."""
+    return tuple(getattr(item, field) for field in ITEM_FIELDS)
+
+
+def _write_world(path, num_locations: int, num_items: int, seed: int = 0) -> str:
+    """Write a random world with the given number of locations and items to the given path, and return it."""
+    with open(path, 'w') as f:
+        json.dump(generate_world(num_locations, num_items, seed=seed), f)
+    return str(path)
+
+
+def test_indexed_world_reloads_evicted_entries(tmp_path) -> None:
+    """Once more than CACHE_SIZE locations and items of an indexed world are used, the least recently used ones
+    are read from the index again when they are asked for, with the same data as when the whole world is read.
+    """
+    filename = _write_world(tmp_path / "world.json", CACHE_SIZE + 50, CACHE_SIZE + 50)
+    locations, items = load_game_data(filename)
+    build_index(filename)
+    world = World.load(filename)
+    assert isinstance(world, IndexedWorld)
+    assert sorted(world.locations) == sorted(locations) and len(world.locations) == len(locations)
+    assert list(world.items) == list(items) and len(world.items) == len(items)
+
+    first_location, first_item = world.locations[min(locations)], world.items[next(iter(items))]
+    for location_id in sorted(locations):
+        assert _location_data(world.locations[location_id]) == _location_data(locations[location_id])
+    for name in items:
+        assert _item_data(world.items[name]) == _item_data(items[name])
+
+    reloaded_location, reloaded_item = world.locations[min(locations)], world.items[next(iter(items))]
+    assert reloaded_location is not first_location and reloaded_item is not first_item
+    assert _location_data(reloaded_location) == _location_data(locations[min(locations)])
+    assert _item_data(reloaded_item) == _item_data(items[next(iter(items))])
+
+
+def test_evicted_world_reloads(tmp_path) -> None:
+    """Once more than WORLD_CACHE_SIZE other game data files are loaded, an indexed world is opened again when it
+    is loaded, with the same data.
+    """
+    filename = _write_world(tmp_path / "world.json", 30, 20)
+    build_index(filename)
+    world = World.load(filename)
+    assert World.load(filename) is world
+
+    for i in range(WORLD_CACHE_SIZE):
+        World.load(_write_world(tmp_path / f"other{i}.json", 5, 3, seed=i))
+    reloaded = World.load(filename)
+    assert isinstance(reloaded, IndexedWorld) and reloaded is not world
+    assert (reloaded.conditions, reloaded.triggers) == (world.conditions, world.triggers)
+    for location_id in world.locations:
+        assert _location_data(reloaded.locations[location_id]) == _location_data(world.locations[location_id])
+    for name in world.items:
+        assert _item_data(reloaded.items[name]) == _item_data(world.items[name])
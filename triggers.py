@@ -0,0 +1,212 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Union
+
+from conditions import Clause, compile_clauses, validate_clauses
+
+# What each kind of effect in game data is given:
+#   - "say": some text to show, where "{money}" is replaced by the money in the wallet
+#   - "pause": the number of seconds to pause for
+#   - "give_money": the amount of money to give the player
+#   - "give_item", "take_item": the name of the item to add to or remove from the inventory
+#   - "fight": the enemy to fight, as {"enemy": name, "health": ..., "attack": ..., "reward": item name (optional)}
+#   - "set_commands": the commands to add or change at the player's location, with their results
+#   - "clear_commands": true, to remove every command at the player's location
+#   - "if": what must be true (see conditions.validate_clauses), with the effects to carry out if it is, in "then",
+#       and otherwise, in "else"
+#   - "pay": a price, with the effects to carry out if the player could pay it, in "then", and otherwise, in "else"
+EFFECT_KINDS = ("say", "pause", "give_money", "give_item", "take_item", "fight", "set_commands", "clear_commands",
+                "if", "pay")
+
+# A command's result: the id of the location it leads to, or some text
+Command = Union[str, int]
+
+
+@dataclass
+class Effect:
+    """One thing a trigger does.
+
+    Instance Attributes:
+        - kind: the kind of effect, out of EFFECT_KINDS
+        - value: what the effect is given in the game data, such as the text to say or the item to give
+        - clauses: for "if" effects, what must be true for the effects in then to be carried out
+        - then: for "if" and "pay" effects, what is carried out if the test passes
+        - otherwise: for "if" and "pay" effects, what is carried out if the test fails
+    """
+    kind: str
+    value: Any
+    clauses: tuple[Clause, ...] = ()
+    then: tuple[Effect, ...] = ()
+    otherwise: tuple[Effect, ...] = ()
+
+
+def compile_effects(effects: Iterable[dict]) -> tuple[Effect, ...]:
+    """Return the given valid effects from game data, compiled."""
+    compiled = []
+    for effect in effects:
+        kind = next(kind for kind in effect if kind in EFFECT_KINDS)
+        compiled.append(Effect(kind, effect[kind], compile_clauses(effect[kind]) if kind == "if" else (),
+                               compile_effects(effect.get('then', [])), compile_effects(effect.get('else', []))))
+    return tuple(compiled)
+
+
+class Trigger:
+    """Something that happens when a command is carried out at a location, declared in game data.
+
+    Instance Attributes:
+        - location_id: the location the trigger is at
+        - command: the command that sets it off, or None if every command at the location that isn't a move does,
+            before the command's own trigger
+        - dialogue: whether the player is asked yes or no first, in which case the effects are only carried out
+            if they answer yes
+        - effects: what the trigger does, in order
+    """
+    location_id: int
+    command: Optional[str]
+    dialogue: bool
+    effects: tuple[Effect, ...]
+
+    def __init__(self, declaration: dict) -> None:
+        """Compile the given valid trigger from game data."""
+        self.location_id = declaration['location']
+        self.command = declaration.get('command')
+        self.dialogue = declaration.get('dialogue', False)
+        self.effects = compile_effects(declaration['effects'])
+
+
+class TriggerTable:
+    """A world's triggers, compiled into a table by the location and command that set them off."""
+    # Private Instance Attributes:
+    #   - _triggers: the trigger for each (location id, command), where the command is None for a trigger set off
+    #       by every command at the location
+    _triggers: dict[tuple[int, Optional[str]], Trigger]
+
+    def __init__(self, declarations: Iterable[dict]) -> None:
+        """Compile the given valid triggers from game data."""
+        self._triggers = {}
+        for declaration in declarations:
+            trigger = Trigger(declaration)
+            self._triggers[(trigger.location_id, trigger.command)] = trigger
+
+    def get(self, location_id: int, command: Optional[str]) -> Optional[Trigger]:
+        """Return the trigger set off by the given command at the given location, or if the command is None, by
+        every command there, or None if there isn't one.
+        """
+        return self._triggers.get((location_id, command))
+
+
+def _is_id(value: Any) -> bool:
+    """Return whether the given JSON value is an integer, and not a boolean."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    """Return whether the given JSON value is a number, and not a boolean."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_whole(value: Any) -> bool:
+    """Return whether the given JSON value is a whole number of at least 0, as health and damage are."""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _validate_effects(effects: Any, location_ids: set[int], item_names: set[str],
+                      commands: dict[str, Command]) -> list[str]:
+    """Return a description of everything wrong with the given effects from game data, whose world has the given
+    location ids and item names. Every command the effects set is added to commands.
+    """
+    if not isinstance(effects, list):
+        return ["effects must be a list"]
+
+    problems = []
+    for effect in effects:
+        kinds = [kind for kind in effect if kind in EFFECT_KINDS] if isinstance(effect, dict) else []
+        if len(kinds) != 1:
+            problems.append(f"an effect must be an object with exactly one of {', '.join(EFFECT_KINDS)}")
+            continue
+        kind = kinds[0]
+        value = effect[kind]
+        if kind == "say":
+            try:
+                value.format(money=0)
+            except (AttributeError, IndexError, KeyError, ValueError):
+                problems.append(f"'say' must be some text, with only {{money}} in braces: {value!r}")
+        elif kind in ("pause", "give_money", "pay") and not _is_number(value):
+            problems.append(f"{kind!r} must be a number")
+        elif kind in ("give_item", "take_item") and (not isinstance(value, str) or value not in item_names):
+            problems.append(f"{kind!r}: unknown item {value!r}")
+        elif kind == "fight":
+            if not isinstance(value, dict) or not isinstance(value.get('enemy'), str) \
+                    or not _is_whole(value.get('health')) or not _is_whole(value.get('attack')):
+                problems.append("'fight' must give an enemy, with its health and attack as whole numbers")
+            elif 'reward' in value and value['reward'] not in item_names:
+                problems.append(f"'fight': unknown reward {value['reward']!r}")
+        elif kind == "set_commands":
+            if not isinstance(value, dict):
+                problems.append("'set_commands' must be an object of commands and their results")
+            else:
+                for command, result in value.items():
+                    if not isinstance(result, str) and not (_is_id(result) and result in location_ids):
+                        problems.append(f"'set_commands': {command!r} must give a location id or some text")
+                commands.update(value)
+        elif kind == "clear_commands" and value is not True:
+            problems.append("'clear_commands' must be true")
+        elif kind == "if":
+            problems.extend(validate_clauses(value, location_ids, item_names))
+
+        if kind in ("if", "pay"):
+            for branch in ('then', 'else'):
+                problems.extend(_validate_effects(effect.get(branch, []), location_ids, item_names, commands))
+        elif 'then' in effect or 'else' in effect:
+            problems.append("only 'if' and 'pay' effects can have 'then' and 'else'")
+    return problems
+
+
+def validate_triggers(triggers: Any, locations: dict[int, dict[str, Command]], item_names: set[str]) -> list[str]:
+    """Return a description of everything wrong with the given triggers from game data, whose world has the given
+    commands at each location id and the given item names, or an empty list if there is nothing wrong with them.
+
+    Each trigger is an object with:
+        - "location": the id of the location it is at
+        - "command" (optional): the command that sets it off. Without one, it is set off by every command at the
+            location that isn't a move, before the command's own trigger. The command must be available at the
+            location, or be set there by one of the location's triggers.
+        - "dialogue" (optional): true if the player is asked yes or no first, and the effects only carried out if
+            they answer yes
+        - "effects": what the trigger does, in order (see EFFECT_KINDS)
+    There can only be one trigger for each location and command.
+
+    >>> validate_triggers([{"location": 1, "command": "wave", "effects": [{"say": "Hi!"}]}], {1: {"wave": "Hi"}}, set())
+    []
+    >>> validate_triggers([{"location": 1, "command": "go east", "effects": [{"give_item": "hat"}]}], {1: {}}, set())
+    ["trigger #0: 'give_item': unknown item 'hat'", "trigger #0: 'go east' is a move, so it can't set off a trigger"]
+    """
+    if not isinstance(triggers, list):
+        return ["triggers must be a list"]
+
+    problems = []
+    seen = set()
+    available = {location_id: dict(commands) for location_id, commands in locations.items()}
+    for i, trigger in enumerate(triggers):
+        if not isinstance(trigger, dict) or not _is_id(trigger.get('location')) \
+                or trigger['location'] not in locations or not isinstance(trigger.get('command', ''), str):
+            problems.append(f"trigger #{i} must be an object with a location id, and a command if any")
+            continue
+        key = (trigger['location'], trigger.get('command'))
+        if key in seen:
+            problems.append(f"trigger #{i}: there is already a trigger for {key[1]!r} at location {key[0]}")
+        seen.add(key)
+        if not isinstance(trigger.get('dialogue', False), bool):
+            problems.append(f"trigger #{i}: 'dialogue' must be true or false")
+        problems.extend(f"trigger #{i}: {problem}" for problem in _validate_effects(
+            trigger.get('effects'), set(locations), item_names, available[trigger['location']]))
+
+    for i, trigger in enumerate(triggers):
+        if not isinstance(trigger, dict) or not _is_id(trigger.get('location')) or trigger['location'] not in locations:
+            continue
+        command = trigger.get('command')
+        if isinstance(command, str) and "go" in command:
+            problems.append(f"trigger #{i}: {command!r} is a move, so it can't set off a trigger")
+        elif isinstance(command, str) and command not in available[trigger['location']]:
+            problems.append(f"trigger #{i}: {command!r} is never available at location {trigger['location']}")
+    return problems
@@ -0,0 +1,590 @@
+from __future__ import annotations
+import os
+from collections import OrderedDict
+from itertools import dropwhile
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping, MutableMapping, Optional, Union
+
+from command_index import CommandIndex
+from conditions import ConditionSet, DEFAULT_CONDITIONS
+from triggers import TriggerTable
+from game_entities import Location, Item
+from journal import Journal, MISSING
+from keyword_matcher import KeywordMatcher, LookupKeywordMatcher
+from world_compiler import ConditionRecord, ItemRecord, LocationRecord, TriggerRecord, load_records
+from world_index import IndexedLocationRecord, WorldIndex
+
+Command = Union[str, int]
+
+CACHE_SIZE = 1024  # the most locations, and the most items, an indexed world keeps in memory
+WORLD_CACHE_SIZE = 8  # the most game data files whose worlds are kept in memory
+
+
+def load_game_data(filename: str) -> tuple[dict[int, Location], dict[str, Item]]:
+    """Load locations and items from a JSON file with the given filename and
+    return a tuple consisting of (1) a dictionary of locations mapping each game location's ID to a Location object,
+    and (2) a dictionary of all Item objects mapping item names to Item objects.
+
+    If the file has been compiled with world_compiler and hasn't changed since, the compiled world is loaded
+    instead, which is much faster.
+
+    Raise GameDataError if the game data can't be played.
+    """
+    item_records, location_records, _, _ = load_records(filename)
+    return _build_game_data(item_records, location_records)
+
+
+def _build_game_data(item_records: tuple[ItemRecord, ...],
+                     location_records: tuple[LocationRecord, ...]) -> tuple[dict[int, Location], dict[str, Item]]:
+    """Return the locations and items in the given records, like load_game_data."""
+    items = {record[0]: Item(*record, item_id=i) for i, record in enumerate(item_records)}
+
+    locations = {}
+    for loc_id, name, brief, long, commands, item_names, pedestal in location_records:
+        item_objects = [items[item_name] for item_name in item_names]
+        locations[loc_id] = Location(loc_id, name, brief, long, commands, item_objects, pedestal)
+
+    return locations, items
+
+
+class World:
+    """A loaded game world: the locations and items every game session starts from.
+
+    A World is a template shared by all the sessions played in it, so it must never be changed. Each session
+    keeps its own changes in a SessionLocations overlay instead.
+
+    Instance Attributes:
+        - locations: a read-only mapping from location id to Location, whose available_commands are read-only
+        - items: a read-only mapping from item name to Item
+        - conditions: what unlocks along the way and what ends the game, as declared in the game data
+        - triggers: what happens when commands are carried out at locations, as declared in the game data
+
+    Representation Invariants:
+        - all(location_id == self.locations[location_id].location_id for location_id in self.locations)
+    """
+    # Private Instance Attributes:
+    #   - _matchers: the keyword matchers compiled for this world so far, by the keywords they were given
+    #   - _condition_set: self.conditions compiled, or None if they haven't been compiled yet
+    #   - _trigger_table: self.triggers compiled, or None if they haven't been compiled yet
+    locations: Mapping[int, Location]
+    items: Mapping[str, Item]
+    conditions: tuple[ConditionRecord, ...]
+    triggers: tuple[TriggerRecord, ...]
+    _matchers: dict[tuple[str, ...], KeywordMatcher]
+    _condition_set: Optional[ConditionSet]
+    _trigger_table: Optional[TriggerTable]
+
+    def __init__(self, locations: dict[int, Location], items: dict[str, Item],
+                 conditions: tuple[ConditionRecord, ...] = DEFAULT_CONDITIONS,
+                 triggers: tuple[TriggerRecord, ...] = ()) -> None:
+        """Freeze the given locations, items, conditions and triggers into a new world template."""
+        for location in locations.values():
+            location.available_commands = MappingProxyType(dict(location.available_commands))
+            location.items = tuple(location.items)
+
+        self.locations = MappingProxyType(locations)
+        self.items = MappingProxyType(items)
+        self.conditions = conditions
+        self.triggers = triggers
+        self._matchers = {}
+        self._condition_set = None
+        self._trigger_table = None
+
+    @staticmethod
+    def load(filename: str) -> World:
+        """Return the world in the given game data file, only reading the file again if it has changed since
+        it was last loaded.
+
+        If the game data file has an up-to-date index (see world_index), an IndexedWorld is returned, which only
+        reads the parts of the world that are played.
+        Only the latest version of each file is kept, for the WORLD_CACHE_SIZE most recently loaded files.
+        """
+        stat = os.stat(filename)
+        path, version = os.path.abspath(filename), (stat.st_mtime_ns, stat.st_size)
+        if path in _WORLDS and _WORLDS[path][0] == version:
+            _WORLDS.move_to_end(path)
+            return _WORLDS[path][1]
+
+        index = WorldIndex.open(filename)
+        if index is None:
+            item_records, location_records, conditions, triggers = load_records(filename)
+            world = World(*_build_game_data(item_records, location_records), conditions, triggers)
+        else:
+            world = IndexedWorld(index)
+        _WORLDS[path] = (version, world)
+        _WORLDS.move_to_end(path)
+        if len(_WORLDS) > WORLD_CACHE_SIZE:
+            _WORLDS.popitem(last=False)
+        return world
+
+    def get_matcher(self, keywords: tuple[str, ...]) -> Union[KeywordMatcher, LookupKeywordMatcher]:
+        """Return a keyword matcher for the given keywords followed by every item name in this world.
+        The matcher is only compiled the first time it is asked for.
+        """
+        if keywords not in self._matchers:
+            self._matchers[keywords] = KeywordMatcher([*keywords, *self.items])
+        return self._matchers[keywords]
+
+    def get_conditions(self) -> ConditionSet:
+        """Return this world's conditions, compiled the first time they are asked for."""
+        if self._condition_set is None:
+            self._condition_set = ConditionSet(self.conditions)
+        return self._condition_set
+
+    def get_triggers(self) -> TriggerTable:
+        """Return this world's triggers, compiled the first time they are asked for."""
+        if self._trigger_table is None:
+            self._trigger_table = TriggerTable(self.triggers)
+        return self._trigger_table
+
+
+# The worlds loaded from each game data file, with the (modification time, size) of the version they were loaded
+# from, least recently loaded first
+_WORLDS: OrderedDict[str, tuple[tuple[int, int], World]] = OrderedDict()
+
+
+class IndexedLocation(Location):
+    """A location in an indexed world, whose descriptions are only read from the index when they are used."""
+    # Private Instance Attributes:
+    #   - _index: the index the location was read from
+    #   - _brief: where the brief description is in the index
+    #   - _long: where the long description is in the index
+    _index: WorldIndex
+    _brief: tuple[int, int]
+    _long: tuple[int, int]
+
+    def __init__(self, record: IndexedLocationRecord, items: tuple[Item, ...], index: WorldIndex) -> None:
+        """Initialize a location from its record in the given index, with the given items."""
+        self.location_id, self.name, self._brief, self._long, commands, _, self.pedestal = record
+        self.available_commands = MappingProxyType(commands)
+        self.items = items
+        self.visited = False
+        self._index = index
+
+    @property
+    def brief_description(self) -> str:
+        return self._index.text(self._brief)
+
+    @property
+    def long_description(self) -> str:
+        return self._index.text(self._long)
+
+
+class IndexedItems(Mapping[str, Item]):
+    """The items of an indexed world, read from the index when they are asked for. The most recently used
+    items are kept in memory.
+    """
+    # Private Instance Attributes:
+    #   - _index: the index the items are read from
+    #   - _cache: the most recently used items by name, least recently used first
+    #   - _cache_size: the most items kept in _cache
+    _index: WorldIndex
+    _cache: OrderedDict[str, Item]
+    _cache_size: int
+
+    def __init__(self, index: WorldIndex, cache_size: int = CACHE_SIZE) -> None:
+        self._index = index
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def __getitem__(self, name: str) -> Item:
+        item = self._cache.get(name)
+        if item is not None:
+            self._cache.move_to_end(name)
+            return item
+
+        for position in self._index.find_items(name.lower()):
+            record = self._index.item_record(position)
+            if record[0] == name:
+                item = self._cache[name] = Item(*record, item_id=position)
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+                return item
+        raise KeyError(name)
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self._index.num_items):
+            yield self._index.item_record(position)[0]
+
+    def __len__(self) -> int:
+        return self._index.num_items
+
+    def lookup(self, phrase: str) -> Optional[list[tuple[int, str]]]:
+        """Return (position in the game data, name) for every item whose name is the given lowercased phrase,
+        ignoring case, or None if no item's name starts with the phrase (see WorldIndex.has_prefix).
+        """
+        if not self._index.has_prefix(phrase):
+            return None
+        return [(position, self._index.item_record(position)[0]) for position in self._index.find_items(phrase)]
+
+
+class IndexedLocations(Mapping[int, Location]):
+    """The locations of an indexed world, read from the index when they are asked for. The most recently used
+    locations are kept in memory.
+    """
+    # Private Instance Attributes:
+    #   - _index: the index the locations are read from
+    #   - _items: the world's items, for the items at each location
+    #   - _cache: the most recently used locations by id, least recently used first
+    #   - _cache_size: the most locations kept in _cache
+    _index: WorldIndex
+    _items: IndexedItems
+    _cache: OrderedDict[int, Location]
+    _cache_size: int
+
+    def __init__(self, index: WorldIndex, items: IndexedItems, cache_size: int = CACHE_SIZE) -> None:
+        self._index = index
+        self._items = items
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def __getitem__(self, location_id: int) -> Location:
+        location = self._cache.get(location_id)
+        if location is not None:
+            self._cache.move_to_end(location_id)
+            return location
+
+        record = self._index.location_record(location_id)
+        location = IndexedLocation(record, tuple(self._items[name] for name in record[5]), self._index)
+        self._cache[location_id] = location
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return location
+
+    def __contains__(self, location_id: object) -> bool:
+        return isinstance(location_id, int) and self._index.has_location(location_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return self._index.location_ids()
+
+    def __len__(self) -> int:
+        return self._index.num_locations
+
+
+class IndexedWorld(World):
+    """A world read from an indexed world file as it is played, so that it loads in the same time and uses about
+    the same memory however big it is.
+
+    Its locations and items are read from the index the first time they are asked for, and only the most
+    recently used CACHE_SIZE of each are kept in memory. Item names in event results are looked up in the
+    index's hash table of names, instead of being matched against every name in the world.
+
+    Instance Attributes:
+        - index: the indexed world file this world is read from
+    """
+    index: WorldIndex
+
+    def __init__(self, index: WorldIndex, cache_size: int = CACHE_SIZE) -> None:
+        """Open a world from the given index."""
+        self.index = index
+        self.items = IndexedItems(index, cache_size)
+        self.locations = IndexedLocations(index, self.items, cache_size)
+        self.conditions = index.conditions
+        self.triggers = index.triggers
+        self._matchers = {}
+        self._condition_set = None
+        self._trigger_table = None
+
+    def get_matcher(self, keywords: tuple[str, ...]) -> LookupKeywordMatcher:
+        """Return a keyword matcher for the given keywords followed by every item name in this world, in the order
+        the items are in the game data. The matcher is only created the first time it is asked for.
+        """
+        if keywords not in self._matchers:
+            self._matchers[keywords] = LookupKeywordMatcher(keywords, self.items.lookup, self.index.max_tokens)
+        return self._matchers[keywords]
+
+
+class CommandOverlay(MutableMapping[str, Command]):
+    """One session's available commands at a location, layered over the location's commands in the world.
+
+    Reads fall through to the world's commands, while additions, changes and removals are kept here, so the
+    memory used is proportional to what this session changed. Commands are ordered the way a dict changed in
+    the same way would be: commands keep their position when their value changes, and are moved to the end
+    when they are removed and added again.
+
+    If the overlay has a journal, every change is recorded there, as what the changed command was before and
+    after, so recording a change doesn't copy the rest of the overlay.
+    An index of the commands for resolving what a player types is only built once it is asked for, and is then
+    kept up to date as commands are added and removed. So is the list of commands shown to the player, which is
+    kept until a command is added or removed.
+    """
+    # Private Instance Attributes:
+    #   - _base: the world's commands at this location
+    #   - _changed: new values for commands in _base, which keep their position
+    #   - _removed: commands in _base that this session has removed
+    #   - _added: commands this session added at the end, in order (these may have been removed from _base)
+    #   - _journal: the journal to record changes in, if any
+    #   - _fingerprint: the result of fingerprint, or MISSING if the commands have changed since it was last worked out
+    #   - _index: the index of the commands, or None if it hasn't been built since they were last cleared or restored
+    #   - _listing: the result of listing, or None if a command has been added or removed since it was last made
+    _base: Mapping[str, Command]
+    _changed: dict[str, Command]
+    _removed: set[str]
+    _added: dict[str, Command]
+    _journal: Optional[Journal]
+    _fingerprint: Any
+    _index: Optional[CommandIndex]
+    _listing: Optional[str]
+
+    __slots__ = ('_base', '_changed', '_removed', '_added', '_journal', '_fingerprint', '_index', '_listing')
+
+    def __init__(self, base: Mapping[str, Command], journal: Optional[Journal] = None) -> None:
+        self._base = base
+        self._changed = {}
+        self._removed = set()
+        self._added = {}
+        self._journal = journal
+        self._fingerprint = None
+        self._index = None
+        self._listing = None
+
+    def __getitem__(self, command: str) -> Command:
+        if command in self._added:
+            return self._added[command]
+        if command in self._base and command not in self._removed:
+            return self._changed.get(command, self._base[command])
+        raise KeyError(command)
+
+    def __setitem__(self, command: str, result: Command) -> None:
+        old = self._record(command)
+        if command in self._base and command not in self._removed:
+            self._changed[command] = result
+        else:
+            if command not in self._added:
+                if self._index is not None:
+                    self._index.add(command)
+                self._listing = None
+            self._added[command] = result
+        self._recorded(command, old)
+
+    def __delitem__(self, command: str) -> None:
+        old = self._record(command)
+        if command in self._added:
+            del self._added[command]
+        elif command in self._base and command not in self._removed:
+            self._removed.add(command)
+            self._changed.pop(command, None)
+        else:
+            raise KeyError(command)
+        if self._index is not None:
+            self._index.remove(command)
+        self._listing = None
+        self._recorded(command, old)
+
+    def __contains__(self, command: object) -> bool:
+        return command in self._added or (command in self._base and command not in self._removed)
+
+    def __iter__(self) -> Iterator[str]:
+        for command in self._base:
+            if command not in self._removed:
+                yield command
+        yield from self._added
+
+    def __len__(self) -> int:
+        return len(self._base) - len(self._removed) + len(self._added)
+
+    def clear(self) -> None:
+        old = (dict(self._changed), set(self._removed), dict(self._added)) if self._is_recording() else None
+        self._removed = set(self._base)
+        self._changed.clear()
+        self._added.clear()
+        self._index = self._listing = None
+        self._fingerprint = MISSING
+        if old is not None:
+            self._journal.record(self._restore, None, old, ({}, set(self._removed), {}))
+
+    def fingerprint(self) -> Optional[frozenset[tuple[str, Command]]]:
+        """Return this session's commands and their results as a set, or None if they are the same as the world's,
+        ignoring their order.
+        """
+        if self._fingerprint is MISSING:
+            commands = frozenset(self.items())
+            self._fingerprint = None if commands == frozenset(self._base.items()) else commands
+        return self._fingerprint
+
+    def index(self) -> CommandIndex:
+        """Return the index of these commands, for resolving what a player types into one of them."""
+        if self._index is None:
+            self._index = CommandIndex(self)
+        return self._index
+
+    def listing(self) -> str:
+        """Return these commands as they are shown to the player: one line for each, starting with "- "."""
+        if self._listing is None:
+            self._listing = ''.join(f"- {command}\n" for command in self)
+        return self._listing
+
+    def changes(self) -> Optional[tuple[dict, set, dict]]:
+        """Return a copy of how this session has changed the world's commands, as (changed results, removed
+        commands, added commands), or None if it hasn't changed them at all.
+        """
+        if not (self._changed or self._removed or self._added):
+            return None
+        return dict(self._changed), set(self._removed), dict(self._added)
+
+    def load_changes(self, changes: tuple[dict, set, dict]) -> None:
+        """Silently replace how this session has changed the world's commands with the given changes, as returned
+        by changes.
+        """
+        self._restore(None, changes)
+
+    def _is_recording(self) -> bool:
+        """Return whether changes to this overlay should be recorded in its journal."""
+        return self._journal is not None and self._journal.is_recording()
+
+    def _entry(self, command: str) -> tuple[Any, bool, Any, tuple[str, ...]]:
+        """Return how this session has changed the given command, as (changed result, whether it was removed,
+        added result, the commands added after it), where a result is MISSING if there isn't one.
+        """
+        if command not in self._added:
+            return self._changed.get(command, MISSING), command in self._removed, MISSING, ()
+        after = tuple(dropwhile(lambda added: added != command, self._added))[1:]
+        return self._changed.get(command, MISSING), command in self._removed, self._added[command], after
+
+    def _record(self, command: str) -> Optional[tuple[Any, bool, Any, tuple[str, ...]]]:
+        """Return how this session has changed the given command if it is about to change in a way the journal
+        should record, otherwise None.
+        """
+        return self._entry(command) if self._is_recording() else None
+
+    def _recorded(self, command: str, old: Optional[tuple[Any, bool, Any, tuple[str, ...]]]) -> None:
+        """Record in the journal that how this session has changed the given command went from old to what it
+        is now.
+        """
+        self._fingerprint = MISSING
+        if old is not None:
+            self._journal.record(self._restore_command, command, old, self._entry(command))
+
+    def _restore_command(self, command: str, entry: tuple[Any, bool, Any, tuple[str, ...]]) -> None:
+        """Silently put how this session has changed the given command back to an entry recorded in the journal.
+
+        Since the journal undoes changes in the reverse order they were made, a command added back is moved in
+        front of the commands that were added after it.
+        """
+        changed, removed, added, after = entry
+        was_present = command in self
+        if changed is MISSING:
+            self._changed.pop(command, None)
+        else:
+            self._changed[command] = changed
+        if removed:
+            self._removed.add(command)
+        else:
+            self._removed.discard(command)
+        if added is MISSING:
+            self._added.pop(command, None)
+        elif command in self._added:
+            self._added[command] = added
+        else:
+            self._added[command] = added
+            for later in after:
+                self._added[later] = self._added.pop(later)
+        self._fingerprint = MISSING
+        if after:
+            self._index = self._listing = None
+        elif was_present and command not in self:
+            if self._index is not None:
+                self._index.remove(command)
+            self._listing = None
+        elif not was_present and command in self:
+            if self._index is not None:
+                self._index.add(command)
+            self._listing = None
+
+    def _restore(self, _: None, changes: tuple[dict, set, dict]) -> None:
+        """Silently put this overlay's changes back to a copy recorded in the journal."""
+        changed, removed, added = changes
+        self._changed, self._removed, self._added = dict(changed), set(removed), dict(added)
+        self._fingerprint = MISSING
+        self._index = self._listing = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class SessionLocation:
+    """One session's view of a Location in the world.
+
+    Every attribute of the world's Location can be read from this view, but available_commands and visited
+    belong to this session only.
+
+    Instance Attributes:
+        - template: the world's Location
+        - available_commands: this session's commands at the location
+        - visited: whether this session has visited the location
+    """
+    template: Location
+    available_commands: CommandOverlay
+    visited: bool
+
+    __slots__ = ('template', '_available_commands', 'visited')
+
+    def __init__(self, template: Location, journal: Optional[Journal] = None) -> None:
+        self.template = template
+        self._available_commands = CommandOverlay(template.available_commands, journal)
+        self.visited = template.visited
+
+    @property
+    def available_commands(self) -> CommandOverlay:
+        return self._available_commands
+
+    @available_commands.setter
+    def available_commands(self, commands: Mapping[str, Command]) -> None:
+        self._available_commands.clear()
+        self._available_commands.update(commands)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.template, name)
+
+
+class SessionLocations(Mapping[int, SessionLocation]):
+    """One session's locations, created from the world the first time the session asks for each of them,
+    so that starting a session takes constant time.
+    """
+    # Private Instance Attributes:
+    #   - _world: the world this session is played in
+    #   - _touched: the locations this session has asked for so far
+    #   - _journal: the journal the session records its changes to commands in, if any
+    _world: World
+    _touched: dict[int, SessionLocation]
+    _journal: Optional[Journal]
+
+    def __init__(self, world: World, journal: Optional[Journal] = None) -> None:
+        self._world = world
+        self._touched = {}
+        self._journal = journal
+
+    def __getitem__(self, location_id: int) -> SessionLocation:
+        location = self._touched.get(location_id)
+        if location is None:
+            location = SessionLocation(self._world.locations[location_id], self._journal)
+            self._touched[location_id] = location
+        return location
+
+    def fingerprint(self) -> frozenset[tuple[int, frozenset[tuple[str, Command]]]]:
+        """Return a hashable summary of how this session has changed the commands at every location, which is
+        equal for two sessions exactly when they have the same commands everywhere, in any order.
+        """
+        return frozenset((location_id, location.available_commands.fingerprint())
+                         for location_id, location in self._touched.items()
+                         if location.available_commands.fingerprint() is not None)
+
+    def changes(self) -> dict[int, tuple[dict, set, dict]]:
+        """Return how this session has changed the commands at each location where it has changed them (see
+        CommandOverlay.changes).
+        """
+        changes = {}
+        for location_id, location in self._touched.items():
+            location_changes = location.available_commands.changes()
+            if location_changes is not None:
+                changes[location_id] = location_changes
+        return changes
+
+    def __contains__(self, location_id: object) -> bool:
+        return location_id in self._world.locations
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._world.locations)
+
+    def __len__(self) -> int:
+        return len(self._world.locations)
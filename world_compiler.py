@@ -0,0 +1,257 @@
+from __future__ import annotations
+import argparse
+import json
+import marshal
+import os
+import re
+import struct
+from typing import Any, Optional, Union
+
+from conditions import DEFAULT_CONDITIONS, validate_conditions
+from triggers import validate_triggers
+
+FORMAT_VERSION = 4
+
+# The header of a compiled world: a magic number, the format version, the marshal version it was written with,
+# and the modification time and size of the game data file it was compiled from.
+_HEADER = struct.Struct('<4sHHqq')
+_MAGIC = b'TAGW'
+
+_DAMAGE_TEXT = re.compile(r"(\d+)\s*damage")
+
+# An item as (name, description, start_position, target_position, target_points, damage, heal, damage_bonus,
+# use_message), in the order Item takes them.
+ItemRecord = tuple[str, str, int, int, int, int, int, int, str]
+# A location as (id, name, brief_description, long_description, available_commands, item names, pedestal), in the
+# order Location takes them.
+LocationRecord = tuple[int, str, str, str, dict[str, Union[str, int]], tuple[str, ...], bool]
+# A condition as it is declared in game data (see conditions.validate_conditions)
+ConditionRecord = dict[str, Any]
+# A trigger as it is declared in game data (see triggers.validate_triggers)
+TriggerRecord = dict[str, Any]
+Records = tuple[tuple[ItemRecord, ...], tuple[LocationRecord, ...], tuple[ConditionRecord, ...],
+                tuple[TriggerRecord, ...]]
+
+_LOCATION_FIELDS = ('id', 'name', 'brief_description', 'long_description', 'available_commands', 'items')
+_ITEM_FIELDS = ('name', 'description', 'start_position', 'target_position')
+
+
+class GameDataError(ValueError):
+    """Raised when game data describes a world that can't be played.
+
+    Instance Attributes:
+        - problems: a description of everything wrong with the game data
+    """
+    problems: list[str]
+
+    def __init__(self, filename: str, problems: list[str]) -> None:
+        super().__init__(f"{filename} has {len(problems)} problem(s):\n" + '\n'.join(f"  - {p}" for p in problems))
+        self.problems = problems
+
+
+def damage_from_description(description: str) -> int:
+    """Return the damage an item's description says it does, or 0 if it doesn't say.
+
+    This is how weapons were recognized before items had a damage stat, and is only used for items whose game
+    data doesn't give one.
+
+    >>> damage_from_description("A sword. Does 50 damage.")
+    50
+    >>> damage_from_description("A small orange.")
+    0
+    """
+    match = _DAMAGE_TEXT.search(description.lower())
+    return int(match.group(1)) if match else 0
+
+
+def _is_id(value: Any) -> bool:
+    """Return whether the given JSON value is an integer, and not a boolean."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_game_data(data: Any) -> list[str]:
+    """Return a description of everything wrong with the given parsed game data, or an empty list if the world
+    it describes can be played.
+
+    >>> validate_game_data({'locations': [], 'items': []})
+    []
+    >>> validate_game_data({'locations': [{'id': 1, 'name': 'Room', 'brief_description': '',
+    ...     'long_description': '', 'available_commands': {'go east': 2}, 'items': ['hat']}], 'items': []})
+    ["location 1: 'go east' leads to location 2, which doesn't exist", "location 1: unknown item 'hat'"]
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('locations'), list) \
+            or not isinstance(data.get('items'), list):
+        return ["game data must be an object with a list of 'locations' and a list of 'items'"]
+
+    problems = []
+    location_ids = set()
+    for i, loc in enumerate(data['locations']):
+        missing = [field for field in _LOCATION_FIELDS if not isinstance(loc, dict) or field not in loc]
+        if missing:
+            problems.append(f"location #{i} is missing {', '.join(missing)}")
+        elif not _is_id(loc['id']):
+            problems.append(f"location #{i} has a non-integer id {loc['id']!r}")
+        elif loc['id'] in location_ids:
+            problems.append(f"location id {loc['id']} is used more than once")
+        else:
+            location_ids.add(loc['id'])
+
+    item_names = set()
+    for i, item in enumerate(data['items']):
+        missing = [field for field in _ITEM_FIELDS if not isinstance(item, dict) or field not in item]
+        if missing:
+            problems.append(f"item #{i} is missing {', '.join(missing)}")
+            continue
+        if item['name'] in item_names:
+            problems.append(f"item name {item['name']!r} is used more than once")
+        item_names.add(item['name'])
+        for field in ('start_position', 'target_position'):
+            if item[field] != 0 and item[field] not in location_ids:
+                problems.append(f"item {item['name']!r}: {field} {item[field]!r} is not a location")
+        for field in ('damage', 'heal', 'damage_bonus'):
+            if field in item and not (_is_id(item[field]) and item[field] >= 0):
+                problems.append(f"item {item['name']!r}: {field} must be a whole number of at least 0")
+
+    for loc in data['locations']:
+        if not isinstance(loc, dict) or any(field not in loc for field in _LOCATION_FIELDS):
+            continue
+        if not isinstance(loc['available_commands'], dict):
+            problems.append(f"location {loc['id']}: available_commands must be an object")
+        else:
+            for command, result in loc['available_commands'].items():
+                if _is_id(result) and result not in location_ids:
+                    problems.append(f"location {loc['id']}: {command!r} leads to location {result}, "
+                                    f"which doesn't exist")
+                elif not _is_id(result) and not isinstance(result, str):
+                    problems.append(f"location {loc['id']}: {command!r} must give a location id or some text")
+        for name in loc['items']:
+            if name not in item_names:
+                problems.append(f"location {loc['id']}: unknown item {name!r}")
+        if not isinstance(loc.get('pedestal', False), bool):
+            problems.append(f"location {loc['id']}: 'pedestal' must be true or false")
+
+    if 'conditions' in data:
+        problems.extend(validate_conditions(data['conditions'], location_ids, item_names))
+    if 'triggers' in data:
+        commands = {loc['id']: loc['available_commands'] for loc in data['locations']
+                    if isinstance(loc, dict) and _is_id(loc.get('id'))
+                    and isinstance(loc.get('available_commands'), dict)}
+        problems.extend(validate_triggers(data['triggers'], commands, item_names))
+
+    return problems
+
+
+def to_records(data: dict) -> Records:
+    """Return the given valid game data as records, with every default filled in. Game data that doesn't declare
+    any conditions gets DEFAULT_CONDITIONS, and game data that doesn't declare any triggers has none.
+    """
+    items = tuple(
+        (item['name'], item['description'], item['start_position'], item['target_position'],
+         item.get('target_points', 0),
+         item['damage'] if 'damage' in item else damage_from_description(item['description']),
+         item.get('heal', 0), item.get('damage_bonus', 0), item.get('use_message', ''))
+        for item in data['items']
+    )
+    locations = tuple(
+        (loc['id'], loc['name'], loc['brief_description'], loc['long_description'],
+         loc['available_commands'], tuple(loc['items']), loc.get('pedestal', False))
+        for loc in data['locations']
+    )
+    return items, locations, tuple(data.get('conditions', DEFAULT_CONDITIONS)), tuple(data.get('triggers', ()))
+
+
+def read_json(filename: str) -> Records:
+    """Read, validate and return the records in the given JSON game data file.
+
+    Raise GameDataError if the game data can't be played.
+    """
+    with open(filename, 'r') as f:
+        data = json.load(f)
+
+    problems = validate_game_data(data)
+    if problems:
+        raise GameDataError(filename, problems)
+    return to_records(data)
+
+
+def compiled_path(filename: str) -> str:
+    """Return where the given game data file is compiled to."""
+    return os.path.splitext(filename)[0] + '.world'
+
+
+def compile_game_data(filename: str, output: Optional[str] = None) -> str:
+    """Validate the given JSON game data file and compile it into a world file, and return the world file's path.
+
+    Raise GameDataError, without writing anything, if the game data can't be played.
+    """
+    output = output or compiled_path(filename)
+    stat = os.stat(filename)
+    records = read_json(filename)
+
+    temp = f"{output}.{os.getpid()}.tmp"
+    with open(temp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, FORMAT_VERSION, marshal.version, stat.st_mtime_ns, stat.st_size))
+        marshal.dump(records, f)
+    os.replace(temp, output)  # so a game starting up never reads a half-written file
+    return output
+
+
+def read_compiled(filename: str, compiled: Optional[str] = None) -> Optional[Records]:
+    """Return the records in the world file compiled from the given game data file, or None if there isn't one,
+    or it was compiled from an older version of the game data or by an incompatible compiler.
+    """
+    compiled = compiled or compiled_path(filename)
+    try:
+        stat = os.stat(filename)
+        with open(compiled, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size or _HEADER.unpack_from(data) != (_MAGIC, FORMAT_VERSION, marshal.version,
+                                                                     stat.st_mtime_ns, stat.st_size):
+            return None
+        return marshal.loads(memoryview(data)[_HEADER.size:])
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def load_records(filename: str) -> Records:
+    """Return the records in the given game data file, from its world file if that is up to date, or from the
+    JSON otherwise.
+
+    Raise GameDataError if the game data can't be played.
+    """
+    records = read_compiled(filename)
+    if records is None:
+        records = read_json(filename)
+    return records
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Compile game data files from the command line."""
+    from world_index import build_index
+
+    parser = argparse.ArgumentParser(description="Validate game data and compile it into a fast-loading world file.")
+    parser.add_argument("files", nargs="*", default=["game_data.json"], help="the game data files to compile")
+    parser.add_argument("--check", action="store_true", help="only validate the game data")
+    parser.add_argument("--index", action="store_true",
+                        help="also write an indexed world file, which games read from as they are played")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for filename in args.files:
+        try:
+            if args.check:
+                read_json(filename)
+                print(f"{filename}: ok")
+            else:
+                print(f"{filename} -> {compile_game_data(filename)}")
+                if args.index:
+                    print(f"{filename} -> {build_index(filename)}")
+        except GameDataError as e:
+            print(e)
+            failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import argparse
+import json
+import math
+import random
+from typing import Optional
+
+from world_compiler import GameDataError, compile_game_data, validate_game_data
+from world_index import build_index
+
+# Words for generated names. None of them contain "go" or any of the engine's event keywords, so generated
+# commands are removed once used and generated text never sets off one of the hand-written events.
+ADJECTIVES = ["brass", "dusty", "silver", "cracked", "tiny", "wooden", "shiny", "faded", "heavy", "paper",
+              "velvet", "iron", "glass", "woolen", "crimson", "quiet"]
+NOUNS = ["lantern", "key", "compass", "ribbon", "coin", "spoon", "whistle", "map", "button", "feather",
+         "thimble", "marble", "candle", "bottle", "pebble", "scarf"]
+SNACKS = ["cookie", "apple", "muffin", "pretzel"]
+WEAPONS = ["ruler", "umbrella", "stapler", "broom"]
+PLACES = ["Hallway", "Library", "Courtyard", "Office", "Lounge", "Atrium", "Stairwell", "Lab", "Cafe", "Studio"]
+COLOURS = ["Blue", "Yellow", "Purple", "Green"]
+
+# The doors out of each of the four rooms of a pedestal puzzle, in the same layout as the rooms in the
+# original world: (direction, index of the room it leads to)
+_PUZZLE_DOORS = [
+    [("go east", 1), ("go north", 3)],
+    [("go west", 0), ("go north", 2)],
+    [("go west", 3), ("go south", 1)],
+    [("go east", 2), ("go south", 0)],
+]
+
+
+def _location(loc_id: int, name: str, description: str) -> dict:
+    """Return game data for a location with no commands or items yet."""
+    return {"id": loc_id, "name": name, "brief_description": f"You are in the {name}. {description}",
+            "long_description": f"You look around. You are in the {name}. {description}",
+            "available_commands": {}, "items": []}
+
+
+def _item(name: str, kind: str, loc_id: int, target: int = 0, points: int = 0) -> dict:
+    """Return game data for an item of the given kind ("puzzle", "snack", "weapon" or anything else) at the
+    given location.
+    """
+    item = {"name": name, "description": f"A {name}.", "start_position": loc_id, "target_position": target,
+            "target_points": points}
+    if kind == "snack":
+        item["heal"] = 5
+        item["description"] = f"A {name}. Eating it restores 5 HP."
+    elif kind == "weapon":
+        item["damage"] = 10
+        item["description"] = f"A {name}. Does 10 damage."
+    return item
+
+
+def _place(location: dict, item: dict) -> None:
+    """Put the item in the location, where it can be picked up by inspecting it."""
+    location["items"].append(item["name"])
+    location["available_commands"][f"inspect {item['name']}"] = f"You pick up the {item['name']}."
+    location["long_description"] += f" There is a {item['name']} here."
+
+
+def generate_world(num_locations: int, num_items: int, num_puzzles: int = 1, seed: int = 0) -> dict:
+    """Return game data for a random world with the given number of locations and items, including
+    num_puzzles pedestal puzzles like the one in rooms 11 to 14 of the original world.
+
+    Every location outside the puzzles is on a grid of rooms joined by doors to the north, south, east and west,
+    and each puzzle is a square of four rooms reached by a door from a random room on the grid. Each puzzle
+    room has a pedestal and an item that belongs on the pedestal of another room in the square. The rest of the
+    items are scattered over the grid, and some of them can be eaten or used as weapons. The same arguments
+    always give the same world.
+
+    Preconditions:
+    - num_puzzles >= 0
+    - num_locations > 4 * num_puzzles
+    - num_items >= 4 * num_puzzles
+    """
+    rng = random.Random(seed)
+    grid_size = num_locations - 4 * num_puzzles
+    width = math.ceil(math.sqrt(grid_size))
+
+    locations = []
+    for loc_id in range(1, grid_size + 1):
+        location = _location(loc_id, f"{rng.choice(PLACES)} {loc_id}", "There are doors in every direction.")
+        row, column = divmod(loc_id - 1, width)
+        for command, neighbour, exists in (("go north", loc_id - width, row > 0),
+                                           ("go south", loc_id + width, loc_id + width <= grid_size),
+                                           ("go west", loc_id - 1, column > 0),
+                                           ("go east", loc_id + 1, column < width - 1 and loc_id < grid_size)):
+            if exists:
+                location["available_commands"][command] = neighbour
+        locations.append(location)
+
+    items = []
+    for puzzle in range(num_puzzles):
+        first = grid_size + 4 * puzzle + 1
+        entrance = locations[rng.randrange(grid_size)]
+        entrance["available_commands"][f"go through puzzle door {puzzle + 1}"] = first
+
+        rooms = [_location(first + i, f"{colour} Room {puzzle + 1}",
+                           "There is a pedestal in the middle of the room.")
+                 for i, colour in enumerate(COLOURS)]
+        for i, room in enumerate(rooms):
+            for command, other in _PUZZLE_DOORS[i]:
+                room["available_commands"][command] = first + other
+            room["available_commands"]["inspect pedestal"] = \
+                "The pedestal is empty. It seems you can USE an item on it to place it."
+            room["pedestal"] = True
+            item = _item(f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {len(items) + 1}", "puzzle", first + i,
+                         first + (i - 1) % 4, 25)
+            _place(room, item)
+            items.append(item)
+        rooms[0]["available_commands"]["go back out"] = entrance["id"]
+        locations.extend(rooms)
+
+    while len(items) < num_items:
+        location = locations[rng.randrange(grid_size)]
+        kind = rng.choice(["snack", "weapon", "thing", "thing"])
+        noun = rng.choice({"snack": SNACKS, "weapon": WEAPONS}.get(kind, NOUNS))
+        item = _item(f"{rng.choice(ADJECTIVES)} {noun} {len(items) + 1}", kind, location["id"])
+        _place(location, item)
+        items.append(item)
+
+    return {"locations": locations, "items": items}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Generate a world from the command line, and write its game data to a file."""
+    parser = argparse.ArgumentParser(description="Generate a random game world of any size.")
+    parser.add_argument("--locations", type=int, default=100, help="the number of locations")
+    parser.add_argument("--items", type=int, default=100, help="the number of items")
+    parser.add_argument("--puzzles", type=int, default=1, help="the number of pedestal puzzles")
+    parser.add_argument("--seed", type=int, default=0, help="the random seed")
+    parser.add_argument("--output", default="generated_world.json", help="the game data file to write")
+    parser.add_argument("--compile", action="store_true", help="also compile the world file")
+    parser.add_argument("--index", action="store_true", help="also write the indexed world file")
+    args = parser.parse_args(argv)
+
+    data = generate_world(args.locations, args.items, args.puzzles, args.seed)
+    problems = validate_game_data(data)
+    if problems:
+        raise GameDataError(args.output, problems)
+
+    with open(args.output, 'w') as f:
+        json.dump(data, f)
+    print(f"Wrote {len(data['locations'])} locations and {len(data['items'])} items to {args.output}")
+    if args.compile:
+        print(f"{args.output} -> {compile_game_data(args.output)}")
+    if args.index:
+        print(f"{args.output} -> {build_index(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
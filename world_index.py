@@ -0,0 +1,257 @@
+from __future__ import annotations
+import marshal
+import mmap
+import os
+import re
+import struct
+import zlib
+from bisect import bisect_left
+from typing import Iterator, Optional
+
+from world_compiler import ConditionRecord, ItemRecord, TriggerRecord, read_json
+
+INDEX_VERSION = 4
+
+# The header of an indexed world: a magic number, the format version, the marshal version it was written with,
+# the modification time and size of the game data file it was built from, the number of locations, items and item
+# name prefixes, the number of slots in the hash tables of item names and of their prefixes, the most tokens in
+# any item name, and where the world's conditions and triggers are.
+_HEADER = struct.Struct('<4sHHqqqqqqqqqq')
+_MAGIC = b'TAGI'
+
+_TOKEN = re.compile(r'\w+|.', re.DOTALL)
+
+# A piece of text in an indexed world, as (offset, length) of its UTF-8 bytes
+Span = tuple[int, int]
+# A location as (id, name, brief description, long description, available_commands, item names, pedestal)
+IndexedLocationRecord = tuple[int, str, Span, Span, dict, tuple[str, ...], bool]
+
+
+def index_path(filename: str) -> str:
+    """Return where the index of the given game data file is written."""
+    return os.path.splitext(filename)[0] + '.worldidx'
+
+
+def _hash_table(keys: list[bytes]) -> list[int]:
+    """Return a hash table of the given keys, with linear probing, where each slot holds the position of a key
+    plus 1, or 0 if it is empty. The number of slots is a power of two, and at least half of them are empty.
+    """
+    num_slots = 2
+    while num_slots < 2 * len(keys):
+        num_slots *= 2
+
+    slots = [0] * num_slots
+    for i, key in enumerate(keys):
+        slot = zlib.crc32(key) & (num_slots - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (num_slots - 1)
+        slots[slot] = i + 1
+    return slots
+
+
+def _prefixes(key: bytes) -> Iterator[bytes]:
+    """Yield every prefix of the given lowercased item name that ends at the end of a token, including the name."""
+    tokens = _TOKEN.findall(key.decode())
+    for i in range(1, len(tokens) + 1):
+        yield ''.join(tokens[:i]).encode()
+
+
+def build_index(filename: str, output: Optional[str] = None) -> str:
+    """Validate the given JSON game data file and write an indexed world file from it, and return the indexed
+    world file's path.
+
+    An indexed world lets each location and item be read on its own, so a game can start in a huge world
+    without reading all of it. It holds, after the header:
+        - the location ids, in increasing order, and where each location's record starts
+        - where each item's record and lowercased name start
+        - where each distinct prefix of the lowercased item names that ends at the end of a token starts
+        - hash tables, by linear probing, from the lowercased item names to their position in the game data, and
+          from the prefixes to their position in the prefixes
+        - the records, names, prefixes and descriptions themselves, and the world's conditions and triggers
+    Descriptions are kept apart from their location's record, so they are only read when they are shown.
+
+    Raise GameDataError, without writing anything, if the game data can't be played.
+    """
+    output = output or index_path(filename)
+    stat = os.stat(filename)
+    items, locations, conditions, triggers = read_json(filename)
+    locations = sorted(locations, key=lambda location: location[0])
+    keys = [item[0].lower().encode() for item in items]
+    prefixes = sorted({prefix for key in keys for prefix in _prefixes(key)})
+    item_slots, prefix_slots = _hash_table(keys), _hash_table(prefixes)
+
+    max_tokens = max((len(_TOKEN.findall(key.decode())) for key in keys), default=0)
+    header_fields = (_MAGIC, INDEX_VERSION, marshal.version, stat.st_mtime_ns, stat.st_size, len(locations),
+                     len(items), len(prefixes), len(item_slots), len(prefix_slots), max_tokens)
+    data_start = _HEADER.size + 8 * (2 * len(locations) + 1 + 2 * (len(items) + 1) + len(prefixes) + 1) \
+        + 4 * (len(item_slots) + len(prefix_slots))
+
+    temp = f"{output}.{os.getpid()}.tmp"
+    with open(temp, 'wb') as f:
+        f.seek(data_start)
+        location_offsets, item_offsets, key_offsets, prefix_offsets = [], [], [], []
+        for loc_id, name, brief, long, commands, item_names, pedestal in locations:
+            spans = []
+            for text in (brief, long):
+                data = text.encode()
+                spans.append((f.tell(), len(data)))
+                f.write(data)
+            location_offsets.append(f.tell())
+            f.write(marshal.dumps((loc_id, name, spans[0], spans[1], commands, item_names, pedestal)))
+        location_offsets.append(f.tell())
+        for item in items:
+            item_offsets.append(f.tell())
+            f.write(marshal.dumps(item))
+        item_offsets.append(f.tell())
+        for key in keys:
+            key_offsets.append(f.tell())
+            f.write(key)
+        key_offsets.append(f.tell())
+        for prefix in prefixes:
+            prefix_offsets.append(f.tell())
+            f.write(prefix)
+        prefix_offsets.append(f.tell())
+        rules_span = (f.tell(), f.write(marshal.dumps((conditions, triggers))))
+
+        f.seek(0)
+        f.write(_HEADER.pack(*header_fields, *rules_span))
+        f.write(struct.pack(f'<{len(locations)}q', *(location[0] for location in locations)))
+        f.write(struct.pack(f'<{len(location_offsets)}Q', *location_offsets))
+        f.write(struct.pack(f'<{len(item_offsets)}Q', *item_offsets))
+        f.write(struct.pack(f'<{len(key_offsets)}Q', *key_offsets))
+        f.write(struct.pack(f'<{len(prefix_offsets)}Q', *prefix_offsets))
+        f.write(struct.pack(f'<{len(item_slots)}I', *item_slots))
+        f.write(struct.pack(f'<{len(prefix_slots)}I', *prefix_slots))
+    os.replace(temp, output)  # so a game starting up never reads a half-written file
+    return output
+
+
+class WorldIndex:
+    """An open indexed world file, whose locations and items are read from it one at a time.
+
+    Opening one takes the same time however big the world is, since the file is mapped into memory and only
+    the parts that are asked for are ever read.
+
+    Instance Attributes:
+        - num_locations: the number of locations in the world
+        - num_items: the number of items in the world
+        - max_tokens: the most tokens (runs of word characters, or other single characters) in any item name
+        - conditions: the world's conditions
+        - triggers: the world's triggers
+    """
+    # Private Instance Attributes:
+    #   - _map: the whole file, mapped into memory
+    #   - _ids: the location ids, in increasing order
+    #   - _location_offsets, _item_offsets, _key_offsets, _prefix_offsets: where each location record, item
+    #       record, lowercased item name and item name prefix starts, followed by where the last one ends
+    #   - _item_slots, _prefix_slots: the hash tables of lowercased item names and of their prefixes, where each
+    #       slot holds the position of a name or prefix plus 1, or 0 if it is empty
+    num_locations: int
+    num_items: int
+    max_tokens: int
+    conditions: tuple[ConditionRecord, ...]
+    triggers: tuple[TriggerRecord, ...]
+    _map: mmap.mmap
+    _ids: memoryview
+    _location_offsets: memoryview
+    _item_offsets: memoryview
+    _key_offsets: memoryview
+    _prefix_offsets: memoryview
+    _item_slots: memoryview
+    _prefix_slots: memoryview
+
+    def __init__(self, indexed: str) -> None:
+        """Open the given indexed world file.
+
+        Raise ValueError if it isn't an indexed world file this version of the game can read.
+        """
+        with open(indexed, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, 'MADV_RANDOM'):  # reads jump around the file, so reading ahead only wastes memory
+            self._map.madvise(mmap.MADV_RANDOM)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{indexed} is not an indexed world file")
+        magic, version, marshal_version, _, _, self.num_locations, self.num_items, num_prefixes, num_item_slots, \
+            num_prefix_slots, self.max_tokens, rules_offset, rules_length = _HEADER.unpack_from(self._map)
+        if (magic, version, marshal_version) != (_MAGIC, INDEX_VERSION, marshal.version):
+            raise ValueError(f"{indexed} is not an indexed world file this version of the game can read")
+
+        view = memoryview(self._map)
+        start = _HEADER.size
+        sections = []
+        for item_format, count in (('q', self.num_locations), ('Q', self.num_locations + 1),
+                                   ('Q', self.num_items + 1), ('Q', self.num_items + 1), ('Q', num_prefixes + 1),
+                                   ('I', num_item_slots), ('I', num_prefix_slots)):
+            end = start + struct.calcsize(item_format) * count
+            sections.append(view[start:end].cast(item_format))
+            start = end
+        (self._ids, self._location_offsets, self._item_offsets, self._key_offsets, self._prefix_offsets,
+         self._item_slots, self._prefix_slots) = sections
+        self.conditions, self.triggers = marshal.loads(self._map[rules_offset:rules_offset + rules_length])
+
+    @staticmethod
+    def open(filename: str) -> Optional[WorldIndex]:
+        """Return the index of the given game data file, or None if there isn't one, or it was built from an
+        older version of the game data or by an incompatible version of the game.
+        """
+        indexed = index_path(filename)
+        try:
+            stat = os.stat(filename)
+            with open(indexed, 'rb') as f:
+                header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size or _HEADER.unpack(header)[:5] != (_MAGIC, INDEX_VERSION, marshal.version,
+                                                                          stat.st_mtime_ns, stat.st_size):
+                return None
+            return WorldIndex(indexed)
+        except (OSError, ValueError):
+            return None
+
+    def location_ids(self) -> Iterator[int]:
+        """Yield the id of every location, in increasing order."""
+        return iter(self._ids)
+
+    def has_location(self, location_id: int) -> bool:
+        """Return whether there is a location with the given id."""
+        i = bisect_left(self._ids, location_id)
+        return i < self.num_locations and self._ids[i] == location_id
+
+    def location_record(self, location_id: int) -> IndexedLocationRecord:
+        """Return the record of the location with the given id.
+
+        Raise KeyError if there isn't one.
+        """
+        i = bisect_left(self._ids, location_id)
+        if i == self.num_locations or self._ids[i] != location_id:
+            raise KeyError(location_id)
+        return marshal.loads(self._map[self._location_offsets[i]:self._location_offsets[i + 1]])
+
+    def text(self, span: Span) -> str:
+        """Return the piece of text at the given span."""
+        offset, length = span
+        return self._map[offset:offset + length].decode()
+
+    def item_record(self, position: int) -> ItemRecord:
+        """Return the record of the item at the given position in the game data."""
+        return marshal.loads(self._map[self._item_offsets[position]:self._item_offsets[position + 1]])
+
+    def find_items(self, key: str) -> list[int]:
+        """Return the position in the game data of every item whose lowercased name is the given key, in order."""
+        return sorted(self._probe(self._item_slots, self._key_offsets, key.encode()))
+
+    def has_prefix(self, key: str) -> bool:
+        """Return whether any lowercased item name starts with the given key, followed by the end of the name or
+        the start of another token.
+        """
+        return any(True for _ in self._probe(self._prefix_slots, self._prefix_offsets, key.encode()))
+
+    def _probe(self, slots: memoryview, offsets: memoryview, key: bytes) -> Iterator[int]:
+        """Yield the position of every occurrence of the given key in the hash table with the given slots, whose
+        keys start at the given offsets.
+        """
+        mask = len(slots) - 1
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            position = slots[slot] - 1
+            if self._map[offsets[position]:offsets[position + 1]] == key:
+                yield position
+            slot = (slot + 1) & mask